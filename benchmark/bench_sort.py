@@ -0,0 +1,411 @@
+"""Benchmarks of the pytest-sort pipeline on synthetic test suites.
+
+Builds collection trees of nested packages, modules, classes and parametrized functions with a share of sort
+and order markers, a datafile with recorded run times for every test, and a coverage data file with test contexts.
+Each stage is timed separately, and reported with items per second and peak memory.
+
+Results are compared with the baseline file when it exists, and the run fails when any stage is slower than the
+baseline by more than the tolerance. Baselines depend on the machine, so save them where they are compared.
+
+    python benchmark/bench_sort.py --items 10000 50000 200000
+    python benchmark/bench_sort.py --items 10000 --save
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import closing
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from coverage.numbits import nums_to_numbits
+from coverage.sqldata import CoverageData
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from pytest_sort import core, database, database_sqlite, diffcov, durations, impact
+from pytest_sort.config import SortConfig
+from pytest_sort.prefix import PrefixIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+default_baseline = Path(__file__).with_name("baseline.json")
+
+# Shape of the synthetic collection tree
+PACKAGE_DEPTH = 3
+PACKAGE_BRANCHES = 4
+MODULES_PER_PACKAGE = 8
+CLASSES_PER_MODULE = 3
+FUNCTIONS_PER_SCOPE = 5
+PARAMS_PER_FUNCTION = 8
+
+# Shape of the synthetic coverage data
+LINES_PER_FILE = 400
+FILES_PER_TEST = 3
+LINES_PER_TEST = 40
+CHANGED_FILES = 20
+CHANGED_LINES_PER_FILE = 25
+
+
+def new_node(node_type: type, nodeid: str, parent: Any, own_markers: list | None = None) -> Any:  # noqa: ANN401
+    """Create a pytest node without a session, with only the attributes pytest-sort reads."""
+    node = object.__new__(node_type)
+    node._nodeid = nodeid
+    node.parent = parent
+    node.own_markers = own_markers or []
+    return node
+
+
+def random_markers(rng: random.Random, density: float) -> list[pytest.Mark]:
+    """Markers for one node, with density as the share of nodes that have one.
+
+    Only modes with numeric sort keys are used, as md5 keys can not be compared with order marker keys.
+    """
+    if rng.random() >= density:
+        return []
+    return [
+        rng.choice(
+            [
+                pytest.mark.order(rng.randint(-100, 100)).mark,
+                pytest.mark.sort("random").mark,
+                pytest.mark.sort("reverse", "module").mark,
+                pytest.mark.sort("ordered", "self").mark,
+            ]
+        )
+    ]
+
+
+def build_items(count: int, marker_density: float, seed: int = 0) -> list[pytest.Item]:
+    """Build a collection tree and return its first count items, in collection order."""
+    rng = random.Random(seed)
+    session = new_node(pytest.Session, "", None)
+    packages: dict[str, Any] = {}
+    items: list[pytest.Item] = []
+
+    package_index = 0
+    while len(items) < count:
+        parent = session
+        parts = []
+        for level in reversed(range(PACKAGE_DEPTH)):
+            parts.append(f"pkg{package_index // PACKAGE_BRANCHES**level % PACKAGE_BRANCHES}")
+            path = "/".join(parts)
+            if path not in packages:
+                packages[path] = new_node(pytest.Package, path, parent, random_markers(rng, marker_density))
+            parent = packages[path]
+        package_index += 1
+
+        for module_index in range(MODULES_PER_PACKAGE):
+            module_id = f"{path}/test_mod{module_index}.py"
+            module = new_node(pytest.Module, module_id, parent, random_markers(rng, marker_density))
+            scopes = [module]
+            for class_index in range(CLASSES_PER_MODULE):
+                class_id = f"{module_id}::TestClass{class_index}"
+                scopes.append(new_node(pytest.Class, class_id, module, random_markers(rng, marker_density)))
+            for scope in scopes:
+                for function_index in range(FUNCTIONS_PER_SCOPE):
+                    for param in range(PARAMS_PER_FUNCTION):
+                        nodeid = f"{scope.nodeid}::test_func{function_index}[{param}]"
+                        items.append(new_node(pytest.Function, nodeid, scope, random_markers(rng, marker_density)))
+
+    return items[:count]
+
+
+def build_records(nodeids: list[str], seed: int = 0) -> dict:
+    """Build datafile records with a full set of recent samples for each nodeid."""
+    rng = random.Random(seed)
+    records = {}
+    for nodeid in nodeids:
+        samples = [rng.randint(1_000, 50_000_000) for _ in range(durations.sample_size)]
+        setup = rng.randint(1_000, 1_000_000)
+        teardown = rng.randint(1_000, 1_000_000)
+        call = max(samples) - setup - teardown
+        records[nodeid] = {
+            "setup": setup,
+            "call": max(call, 0),
+            "teardown": teardown,
+            "total": setup + max(call, 0) + teardown,
+            "count": durations.sample_size,
+            "ewma": sum(samples) // len(samples),
+            "samples": samples,
+        }
+    return records
+
+
+def build_recorded_times(nodeids: list[str], seed: int = 1) -> dict:
+    """Build the run times recorded by one session running all nodeids."""
+    rng = random.Random(seed)
+    return {
+        nodeid: {"setup": rng.randint(1_000, 1_000_000), "call": rng.randint(1_000, 50_000_000), "teardown": 1_000}
+        for nodeid in nodeids
+    }
+
+
+def write_coverage(coverage_file: Path, source_folder: Path, nodeids: list[str], seed: int = 0) -> dict[Path, set[int]]:
+    """Write a coverage data file with run phase contexts for each nodeid.
+
+    Rows are inserted into the coverage.py tables directly, as writing them one context at a time is too slow.
+    Return changed lines of some of the covered files, as from a diff.
+    """
+    rng = random.Random(seed)
+    source_files = [source_folder / f"module{index}.py" for index in range(max(len(nodeids) // 100, CHANGED_FILES))]
+
+    cov = CoverageData(basename=str(coverage_file))
+    cov.add_lines({})
+    cov.write()
+
+    with closing(sqlite3.connect(coverage_file)) as con, con:
+        con.executemany("INSERT INTO file (id, path) VALUES (?, ?)", enumerate(map(str, source_files), start=1))
+        con.executemany(
+            "INSERT INTO context (id, context) VALUES (?, ?)",
+            ((index, f"{nodeid}|run") for (index, nodeid) in enumerate(nodeids, start=1)),
+        )
+        rows = []
+        for context_id in range(1, len(nodeids) + 1):
+            # Tests in the same module cover the same few source files
+            first_file = context_id // 200 % len(source_files)
+            for offset in range(FILES_PER_TEST):
+                file_id = (first_file + offset) % len(source_files) + 1
+                lines = rng.sample(range(1, LINES_PER_FILE + 1), LINES_PER_TEST)
+                rows.append((file_id, context_id, nums_to_numbits(lines)))
+        con.executemany("INSERT INTO line_bits (file_id, context_id, numbits) VALUES (?, ?, ?)", rows)
+
+    changed_files = rng.sample(source_files, CHANGED_FILES)
+    return {
+        path.resolve(): set(rng.sample(range(1, LINES_PER_FILE + 1), CHANGED_LINES_PER_FILE)) for path in changed_files
+    }
+
+
+def reset_sort_config() -> None:
+    """Clear the state sort_items leaves in SortConfig and the database cache between runs."""
+    SortConfig.node_marker_settings = {}
+    SortConfig.node_bucket_ids = {}
+    SortConfig.item_sort_keys = {}
+    SortConfig.item_bucket_id = {}
+    SortConfig.bucket_sort_keys = {}
+    SortConfig.bucket_item_keys = {}
+    SortConfig.bucket_index_range = {}
+    SortConfig.loading = {}
+    database._sort_data = {}  # noqa: SLF001
+    database_sqlite.close()
+
+
+def measure(count: int, setup: Callable[[], Any], run: Callable[[Any], Any], repeat: int) -> dict[str, float]:
+    """Time run on the result of a fresh setup, and keep the fastest time.
+
+    Peak memory is measured in a separate run, as tracing allocations slows down the run.
+    """
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+
+    state = setup()
+    tracemalloc.start()
+    try:
+        run(state)
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = min(times)
+    return {"seconds": seconds, "items_per_second": count / seconds if seconds else 0.0, "peak_mib": peak / 2**20}
+
+
+Benchmark = tuple[int, "Callable[[], Any]", "Callable[[Any], Any]"]
+
+
+def get_benchmarks(items: list[pytest.Item], folder: Path, coverage_tests: int) -> dict[str, Benchmark]:
+    """Build the item count, and setup and run functions of each benchmark stage.
+
+    Only the first coverage_tests items are in the coverage data, as building the index of larger suites takes minutes.
+    """
+    nodeids = [item.nodeid for item in items]
+    covered_nodeids = nodeids[:coverage_tests]
+    records = build_records(nodeids)
+    recorded_times = build_recorded_times(nodeids)
+
+    json_file = folder / "pytest_sort_data.json"
+    json_file.write_text(json.dumps(records) + "\n", "utf-8")
+    sqlite_file = folder / "pytest_sort_data.sqlite"
+    database_sqlite.save_records(sqlite_file, records)
+    database_sqlite.close()
+
+    coverage_file = folder / ".coverage"
+    changed_lines = write_coverage(coverage_file, folder / "src", covered_nodeids)
+
+    def use_datafile(source: Path) -> Callable[[], None]:
+        def setup() -> None:
+            reset_sort_config()
+            database.database_file = folder / f"datafile{source.suffix}"
+            shutil.copyfile(source, database.database_file)
+
+        return setup
+
+    def sort_setup(mode: str, bucket: str = "parent") -> Callable[[], None]:
+        def setup() -> None:
+            use_datafile(json_file)()
+            SortConfig.mode = mode
+            SortConfig.bucket_mode = mode
+            SortConfig.bucket = bucket
+
+        return setup
+
+    def prepared_items() -> None:
+        sort_setup("fastest")()
+        SortConfig.item_totals = database.get_all_totals()
+        SortConfig.item_totals_index = PrefixIndex(SortConfig.item_totals)
+        for item in items:
+            core.create_item_bucket_id(item)
+        for idx, item in enumerate(items):
+            core.create_item_sort_keys(item, idx, len(items))
+
+    def run_marker_settings(_: None) -> None:
+        for item in items:
+            core.get_marker_settings(item)
+
+    def run_bucket_ids(_: None) -> None:
+        for item in items:
+            core.create_item_bucket_id(item)
+
+    def impact_setup() -> None:
+        reset_sort_config()
+        impact.get_index_file().unlink(missing_ok=True)
+
+    def impact_warm_setup() -> None:
+        reset_sort_config()
+        diffcov.get_current_index_file()
+
+    count = len(items)
+    covered = len(covered_nodeids)
+    return {
+        "get_marker_settings": (count, sort_setup("ordered"), run_marker_settings),
+        "create_item_bucket_id": (count, sort_setup("ordered", "class"), run_bucket_ids),
+        "create_bucket_sort_keys[fastest]": (count, prepared_items, lambda _: core.create_bucket_sort_keys(count)),
+        "sort_items[ordered]": (count, sort_setup("ordered"), lambda _: core.sort_items(list(items))),
+        "sort_items[random]": (count, sort_setup("random"), lambda _: core.sort_items(list(items))),
+        "sort_items[fastest]": (count, sort_setup("fastest"), lambda _: core.sort_items(list(items))),
+        "update_test_cases[json]": (
+            count,
+            use_datafile(json_file),
+            lambda _: database.update_test_cases(recorded_times),
+        ),
+        "update_test_cases[sqlite]": (
+            count,
+            use_datafile(sqlite_file),
+            lambda _: database.update_test_cases(recorded_times),
+        ),
+        "get_test_scores[coverage]": (covered, reset_sort_config, lambda _: diffcov.get_test_scores(changed_lines)),
+        "get_test_scores[index build]": (
+            covered,
+            impact_setup,
+            lambda _: diffcov.get_changed_test_scores(changed_lines),
+        ),
+        "get_test_scores[index]": (
+            covered,
+            impact_warm_setup,
+            lambda _: diffcov.get_changed_test_scores(changed_lines),
+        ),
+    }
+
+
+def run_benchmarks(
+    counts: list[int],
+    marker_density: float,
+    coverage_tests: int,
+    repeat: int,
+    selected: list[str],
+) -> dict[str, dict]:
+    """Run the benchmarks for each item count in a temporary folder. Return map of 'stage@count' to results."""
+    results = {}
+    cwd = Path.cwd()
+    with tempfile.TemporaryDirectory(prefix="pytest-sort-bench-") as temp_name:
+        folder = Path(temp_name).resolve()
+        # coverage.py reads .coverage from the current folder
+        os.chdir(folder)
+        try:
+            for count in counts:
+                items = build_items(count, marker_density)
+                for name, (stage_count, setup, run) in get_benchmarks(items, folder, coverage_tests).items():
+                    if selected and not any(pattern in name for pattern in selected):
+                        continue
+                    key = f"{name}@{count}"
+                    results[key] = measure(stage_count, setup, run, repeat)
+                    print_result(key, results[key])
+                    reset_sort_config()
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def print_result(key: str, result: dict[str, float], baseline: dict[str, float] | None = None) -> None:
+    """Print one line of results, with the ratio to the baseline time when available."""
+    line = (
+        f"{key:<45} {result['seconds'] * 1000:>10.1f} ms {result['items_per_second']:>14,.0f} items/s"
+        f" {result['peak_mib']:>9.1f} MiB"
+    )
+    if baseline:
+        line += f" {result['seconds'] / baseline['seconds']:>7.2f}x baseline"
+    print(line)
+
+
+def compare(results: dict[str, dict], baselines: dict[str, dict], tolerance: float) -> list[str]:
+    """Print results compared with baselines. Return the stages slower than the baseline by more than tolerance."""
+    regressions = []
+    print("\nCompared with baseline:")
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        print_result(key, result, baseline)
+        if baseline and result["seconds"] > baseline["seconds"] * (1 + tolerance):
+            regressions.append(key)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmarks, then save or compare with the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[10_000], help="Item counts of the synthetic suites.")
+    parser.add_argument("--marker-density", type=float, default=0.01, help="Share of nodes with a marker.")
+    parser.add_argument("--coverage-tests", type=int, default=10_000, help="Most tests in the coverage data.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each stage, the fastest is kept.")
+    parser.add_argument("--only", nargs="*", default=[], help="Only run stages with names containing these.")
+    parser.add_argument("--baseline", type=Path, default=default_baseline, help="Baseline file.")
+    parser.add_argument("--save", action="store_true", help="Save results to the baseline file instead of comparing.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%).")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.items, args.marker_density, args.coverage_tests, args.repeat, args.only)
+
+    baselines = json.loads(args.baseline.read_text("utf-8")) if args.baseline.exists() else {}
+    if args.save:
+        baselines.update(results)
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n", "utf-8")
+        print(f"\nSaved {len(results)} results to {args.baseline}")
+        return 0
+
+    if not baselines:
+        return 0
+
+    regressions = compare(results, baselines, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} stages slower than baseline by more than {args.tolerance:.0%}:")
+        for key in regressions:
+            print(f"  {key}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,12 +6,15 @@ import random
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, ClassVar
 
-from pytest_sort import database
+from pytest_sort import database, diffcov, impact, profiling
+from pytest_sort.durations import statistics
+from pytest_sort.prefix import PrefixIndex
 
 if TYPE_CHECKING:
     import pytest
 
-modes = ["ordered", "reverse", "md5", "random", "fastest", "diffcov", "mutcov"]
+datafile_formats = ["json", "sqlite"]
+modes = ["ordered", "reverse", "md5", "random", "fastest", "diffcov", "mutcov", "failfirst"]
 bucket_types = ["session", "package", "module", "class", "function", "parent", "grandparent"]
 
 legacy_modes = {
@@ -31,6 +34,11 @@ class SortConfig:
     record: ClassVar[bool | None] = None  # pragma: no mutate
     reset: ClassVar[bool] = False
     report: ClassVar[bool] = False
+    dist: ClassVar[bool] = False
+    shard: ClassVar[tuple[int, int] | None] = None
+    cov_per_second: ClassVar[bool] = False
+    diffcov_select: ClassVar[bool] = False
+    diffcov_deselected: ClassVar[int] = 0
 
     seed: ClassVar[int] = random.randint(0, 1_000_000)
 
@@ -41,12 +49,27 @@ class SortConfig:
     item_sort_keys: ClassVar[dict] = {}
     item_bucket_id: ClassVar[dict] = {}
     bucket_sort_keys: ClassVar[dict] = {}
+    bucket_item_keys: ClassVar[dict] = {}
+    bucket_index_range: ClassVar[dict] = {}
     diff_cov_scores: ClassVar[dict] = {}
     mut_cov_scores: ClassVar[dict] = {}
+    fail_rates: ClassVar[dict] = {}
+    node_marker_settings: ClassVar[dict] = {}
+    node_bucket_ids: ClassVar[dict] = {}
+    item_totals_index: ClassVar[PrefixIndex] = PrefixIndex({})
+    diff_cov_index: ClassVar[PrefixIndex] = PrefixIndex({})
+    mut_cov_index: ClassVar[PrefixIndex] = PrefixIndex({})
+    fail_rate_index: ClassVar[PrefixIndex] = PrefixIndex({})
+    loading: ClassVar[dict] = {}
+    loaded: ClassVar[dict | None] = None
 
     @staticmethod
     def from_pytest(config: pytest.Config) -> None:
         """Extract pytest_sort settings from pytest's Config options and ini data."""
+        # Data loaded by an earlier session in the same process, such as with pytester, may be stale
+        SortConfig.loading = {}
+        SortConfig.loaded = None
+
         SortConfig._mode_from_pytest(config)
         SortConfig._bucket_from_pytest(config)
         SortConfig._bucket_mode_from_pytest(config)
@@ -54,9 +77,15 @@ class SortConfig:
 
         SortConfig.reset = config.getoption("sort_reset_times", default=False)
         SortConfig.report = config.getoption("sort_report_times", default=False)
+        SortConfig.dist = bool(config.getoption("sort_dist", default=False) or config.getini("sort_dist"))
 
         SortConfig._seed_from_pytest(config)
+        SortConfig._shard_from_pytest(config)
         SortConfig._database_file_from_pytest(config)
+        SortConfig._statistic_from_pytest(config)
+
+        SortConfig._cov_from_pytest(config)
+        SortConfig._profile_from_pytest(config)
 
         if config.getoption("sort_debug"):
             SortConfig.debug = True
@@ -98,10 +127,10 @@ class SortConfig:
             SortConfig.record = False
         else:
             SortConfig.record = config.getoption("sort_record") or config.getini("sort_record_times")
-        # getini returns [] when option not specified
+        # getini returns None (or [] in older pytest) when option not specified
         if not isinstance(SortConfig.record, bool):
             SortConfig.record = None
-        if SortConfig.mode == "fastest" and SortConfig.record is None:
+        if SortConfig.mode in ("fastest", "failfirst") and SortConfig.record is None:
             SortConfig.record = True
 
     @staticmethod
@@ -112,12 +141,69 @@ class SortConfig:
             raise ValueError(msg)
         SortConfig.seed = int(str(SortConfig.seed))
 
+    @staticmethod
+    def _shard_from_pytest(config: pytest.Config) -> None:
+        shard = config.getoption("sort_shard") or config.getini("sort_shard") or None
+        if shard is None:
+            SortConfig.shard = None
+            return
+
+        (index, _, count) = str(shard).partition("/")
+        if not (index.isdigit() and count.isdigit() and 1 <= int(index) <= int(count)):
+            msg = f"Invalid Value for sort-shard='{shard}' must be K/N with 1 <= K <= N"
+            raise ValueError(msg)
+        SortConfig.shard = (int(index), int(count))
+
     @staticmethod
     def _database_file_from_pytest(config: pytest.Config) -> None:
         database_file = config.getoption("sort_datafile") or config.getini("sort_datafile") or None
         if database_file:
             database.database_file = Path(database_file)
 
+        datafile_format = config.getini("sort_datafile_format") or None
+        if datafile_format and datafile_format not in datafile_formats:
+            msg = f"Invalid Value for sort_datafile_format='{datafile_format}'"
+            raise ValueError(msg)
+        database.datafile_format = datafile_format
+
+        impact.enabled = config.getini("sort_impact_index")
+
+    @staticmethod
+    def _cov_from_pytest(config: pytest.Config) -> None:
+        diffcov.diff_base = config.getoption("sort_diff_base") or config.getini("sort_diff_base") or None
+
+        cov_weights = config.getoption("sort_cov_weights") or config.getini("sort_cov_weights") or ""
+        weights = dict(impact.default_weights)
+        for weight in filter(None, cov_weights.split(",")):
+            (name, _, value) = (part.strip() for part in weight.partition("="))
+            if name not in weights or not value.isdigit():
+                msg = f"Invalid Value for sort-cov-weights='{cov_weights}' must be name=value for names {list(weights)}"
+                raise ValueError(msg)
+            weights[name] = int(value)
+        impact.weights = weights
+
+        per_second = config.getoption("sort_cov_per_second", default=False) or config.getini("sort_cov_per_second")
+        SortConfig.cov_per_second = bool(per_second)
+
+        diffcov_select = config.getoption("sort_diffcov_select", default=False) or config.getini("sort_diffcov_select")
+        SortConfig.diffcov_select = bool(diffcov_select)
+
+    @staticmethod
+    def _profile_from_pytest(config: pytest.Config) -> None:
+        json_file = config.getoption("sort_profile_json", default=None) or config.getini("sort_profile_json") or None
+        profiling.json_file = Path(json_file) if json_file else None
+
+        profile = config.getoption("sort_profile", default=False) or config.getini("sort_profile")
+        profiling.enabled = bool(profile or profiling.json_file)
+
+    @staticmethod
+    def _statistic_from_pytest(config: pytest.Config) -> None:
+        statistic = config.getoption("sort_statistic") or config.getini("sort_statistic") or "max"
+        if statistic not in statistics:
+            msg = f"Invalid Value for sort-statistic='{statistic}'"
+            raise ValueError(msg)
+        database.statistic = statistic
+
     @staticmethod
     def header_dict() -> dict:
         """Construct dict of pytest_sort configuration data for use in displaying header.
@@ -137,6 +223,48 @@ class SortConfig:
         if SortConfig.mode == "random":
             config["sort-seed"] = SortConfig.seed
 
+        config.update(SortConfig._cov_header_dict())
+        config.update(SortConfig._times_header_dict())
+
+        if SortConfig.dist:
+            config["sort-dist"] = True
+
+        if SortConfig.shard:
+            config["sort-shard"] = "/".join(str(value) for value in SortConfig.shard)
+
+        if profiling.enabled:
+            config["sort-profile"] = profiling.json_file or True
+
+        if SortConfig.debug:
+            config["sort-debug"] = True
+
+        return config
+
+    @staticmethod
+    def _cov_header_dict() -> dict:
+        config: dict[str, Any] = {}
+
+        if diffcov.diff_base:
+            config["sort-diff-base"] = diffcov.diff_base
+
+        if impact.weights != impact.default_weights:
+            config["sort-cov-weights"] = ",".join(f"{name}={value}" for (name, value) in impact.weights.items())
+
+        if SortConfig.cov_per_second:
+            config["sort-cov-per-second"] = True
+
+        if SortConfig.diffcov_select:
+            config["sort-diffcov-select"] = True
+
+        if not impact.enabled:
+            config["sort-impact-index"] = False
+
+        return config
+
+    @staticmethod
+    def _times_header_dict() -> dict:
+        config: dict[str, Any] = {}
+
         if SortConfig.reset:
             config["sort-reset-times"] = True
 
@@ -146,7 +274,7 @@ class SortConfig:
         if SortConfig.report:
             config["sort-report-times"] = True
 
-        if SortConfig.debug:
-            config["sort-debug"] = True
+        if database.statistic != "max":
+            config["sort-statistic"] = database.statistic
 
         return config
@@ -4,15 +4,24 @@ from __future__ import annotations
 
 import hashlib
 import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from functools import partial
+from statistics import median
 from typing import TYPE_CHECKING, Any, Callable
 
 import pytest
 from _pytest import nodes as pytest_nodes
 
 from pytest_sort.config import SortConfig
-from pytest_sort.database import get_all_totals, get_stats
-from pytest_sort.diffcov import get_diff_test_scores, get_mut_test_scores
+from pytest_sort.database import get_all_fail_rates, get_all_totals, get_stats
+from pytest_sort.diffcov import (
+    get_covered_tests,
+    get_diff_test_scores,
+    get_mut_test_scores,
+)
+from pytest_sort.prefix import PrefixIndex
+from pytest_sort.profiling import phase
 
 md5: Callable = partial(hashlib.md5, usedforsecurity=False)  # type: ignore[no-redef]
 
@@ -32,44 +41,55 @@ def create_bucket_id_from_node(node: pytest_nodes.Node | None) -> str:
     return ""
 
 
-def create_bucket_id_for_package(node: pytest_nodes.Node | None) -> str:
-    """Extract package name from pytest item."""
+def get_node_bucket_ids(node: pytest_nodes.Node | None) -> tuple[str, str, str]:
+    """Get the (package, module, class) bucket ids for node in one walk up the parent nodes.
+
+    Results are cached per node in SortConfig.node_bucket_ids, so sibling items share their parent's lookup.
+    """
+    if not isinstance(node, pytest_nodes.Node):
+        return ("", "", "")
+
+    if node in SortConfig.node_bucket_ids:
+        return SortConfig.node_bucket_ids[node]
+
     if isinstance(node, (pytest.Session, pytest.Package)):
-        return create_bucket_id_from_node(node)
+        node_bucket_id = create_bucket_id_from_node(node)
+        bucket_ids = (node_bucket_id, node_bucket_id, node_bucket_id)
+    else:
+        (package_id, module_id, class_id) = get_node_bucket_ids(node.parent)
+        if isinstance(node, pytest.Module):
+            node_bucket_id = create_bucket_id_from_node(node)
+            bucket_ids = (package_id, node_bucket_id, node_bucket_id)
+        elif isinstance(node, pytest.Class):
+            bucket_ids = (package_id, module_id, create_bucket_id_from_node(node))
+        else:
+            bucket_ids = (package_id, module_id, class_id)
 
-    if isinstance(node, (pytest_nodes.Node)):
-        return create_bucket_id_for_package(node.parent)
+    SortConfig.node_bucket_ids[node] = bucket_ids
+    return bucket_ids
 
-    return ""
+
+def create_bucket_id_for_package(node: pytest_nodes.Node | None) -> str:
+    """Extract package name from pytest item."""
+    return get_node_bucket_ids(node)[0]
 
 
 def create_bucket_id_for_module(node: pytest_nodes.Node | None) -> str:
     """Extract module name from pytest item."""
-    if isinstance(node, (pytest.Session, pytest.Package, pytest.Module)):
-        return create_bucket_id_from_node(node)
-
-    if isinstance(node, (pytest_nodes.Node)):
-        return create_bucket_id_for_module(node.parent)
-
-    return ""
+    return get_node_bucket_ids(node)[1]
 
 
 def create_bucket_id_for_class(node: pytest_nodes.Node | None) -> str:
     """Extract class or module name from pytest item."""
-    if isinstance(node, (pytest.Session, pytest.Package, pytest.Module, pytest.Class)):
-        return create_bucket_id_from_node(node)
-
-    if isinstance(node, (pytest_nodes.Node)):
-        return create_bucket_id_for_class(node.parent)
-
-    return ""
+    return get_node_bucket_ids(node)[2]
 
 
+# Items are never a Package, Module or Class, so lookups start at item.parent and are shared by siblings.
 create_bucket_id = {
     "session": lambda item: "",
-    "package": create_bucket_id_for_package,
-    "module": create_bucket_id_for_module,
-    "class": create_bucket_id_for_class,
+    "package": lambda item: create_bucket_id_for_package(item.parent),
+    "module": lambda item: create_bucket_id_for_module(item.parent),
+    "class": lambda item: create_bucket_id_for_class(item.parent),
     "function": lambda item: item.nodeid,
     "parent": lambda item: create_bucket_id_from_node(item.parent),
     "grandparent": lambda item: create_bucket_id_from_node(item.parent.parent),
@@ -83,22 +103,28 @@ create_item_key = {
     "fastest": lambda item, idx, count: SortConfig.item_totals.get(item.nodeid, 0),
     "diffcov": lambda item, idx, count: SortConfig.diff_cov_scores.get(item.nodeid, 0),
     "mutcov": lambda item, idx, count: SortConfig.mut_cov_scores.get(item.nodeid, 0),
+    "failfirst": lambda item, idx, count: -SortConfig.fail_rates.get(item.nodeid, 0),
 }
 
 
 def get_bucket_total(bucket_id: str) -> int:
     """Get all totals from nodes matching this bucket and return sum."""
-    return sum([total for nodeid, total in SortConfig.item_totals.items() if nodeid.startswith(bucket_id)])
+    return SortConfig.item_totals_index.sum(bucket_id)
 
 
 def get_bucket_score(bucket_id: str) -> int:
     """Get all scores from nodes matching this bucket and return min."""
-    return min([score for nodeid, score in SortConfig.diff_cov_scores.items() if nodeid.startswith(bucket_id)] + [0])
+    return SortConfig.diff_cov_index.min(bucket_id)
 
 
 def get_mut_bucket_score(bucket_id: str) -> int:
     """Get all scores from nodes matching this bucket and return min."""
-    return min([score for nodeid, score in SortConfig.mut_cov_scores.items() if nodeid.startswith(bucket_id)] + [0])
+    return SortConfig.mut_cov_index.min(bucket_id)
+
+
+def get_bucket_fail_score(bucket_id: str) -> float:
+    """Get the highest failure rate of nodes matching this bucket and return it negated."""
+    return SortConfig.fail_rate_index.min(bucket_id)
 
 
 create_bucket_key = {
@@ -109,6 +135,7 @@ create_bucket_key = {
     "fastest": lambda bucket_id, idx, count: get_bucket_total(bucket_id),
     "diffcov": lambda bucket_id, idx, count: get_bucket_score(bucket_id),
     "mutcov": lambda bucket_id, idx, count: get_mut_bucket_score(bucket_id),
+    "failfirst": lambda bucket_id, idx, count: get_bucket_fail_score(bucket_id),
 }
 
 
@@ -150,13 +177,22 @@ def validate_sort_marker(sort_marker: pytest.Mark, node_id: str) -> tuple:
     return (mode, bucket_temp)
 
 
+def get_own_markers(node: pytest_nodes.Node, name: str) -> list[pytest.Mark]:
+    """Get markers with this name applied directly to this node, excluding markers of parent nodes."""
+    return [mark for mark in node.own_markers if mark.name == name]
+
+
 def get_marker_settings(node: pytest_nodes.Node) -> tuple:
     """Retrieve and validate options on 'sort' and 'order' markers.
 
     Recursively calls with node.parent to get values from any level.
+    Results are cached per node in SortConfig.node_marker_settings, so each parent is only resolved once.
 
     Returns: (mode, bucket, bucket_id, bucket_sort_key, sort_key)
     """
+    if node in SortConfig.node_marker_settings:
+        return SortConfig.node_marker_settings[node]
+
     mode = None
     bucket = None
     bucket_id = None
@@ -168,7 +204,7 @@ def get_marker_settings(node: pytest_nodes.Node) -> tuple:
     if node.parent:
         (mode, bucket, bucket_id, bucket_sort_key, item_sort_key) = get_marker_settings(node.parent)
 
-    for order in node.iter_markers("order"):
+    for order in get_own_markers(node, "order"):
         sort_key = validate_order_marker(order, node_id)
         if isinstance(node, pytest.Function):
             item_sort_key = sort_key
@@ -176,7 +212,7 @@ def get_marker_settings(node: pytest_nodes.Node) -> tuple:
             bucket_sort_key = sort_key
             bucket_id = create_bucket_id_from_node(node)
 
-    for sort in node.iter_markers("sort"):
+    for sort in get_own_markers(node, "sort"):
         (mode, bucket_temp) = validate_sort_marker(sort, node_id)
 
         if bucket_temp == "self":
@@ -189,26 +225,58 @@ def get_marker_settings(node: pytest_nodes.Node) -> tuple:
             msg = f"Invalid Value for 'bucket' on 'sort' marker: {bucket_temp}. Target: {node_id}"
             raise ValueError(msg)
 
-    return (mode, bucket, bucket_id, bucket_sort_key, item_sort_key)
+    SortConfig.node_marker_settings[node] = (mode, bucket, bucket_id, bucket_sort_key, item_sort_key)
+    return SortConfig.node_marker_settings[node]
 
 
-def create_sort_keys(item: pytest.Item, idx: int, count: int) -> None:
-    """Create item and bucket sort keys.
+def create_item_bucket_id(item: pytest.Item) -> None:
+    """Create bucket id for item.
 
-    Store in SortConfig.item_sort_keys and SortConfig.bucket_sort_keys
+    Store in SortConfig.item_bucket_id
     """
-    (mode, bucket, bucket_id, bucket_sort_key, item_sort_key) = get_marker_settings(item)
+    (_, bucket, bucket_id, _, _) = get_marker_settings(item)
+    SortConfig.item_bucket_id[item.nodeid] = bucket_id or create_bucket_id[bucket or SortConfig.bucket](item)
+
+
+def create_item_sort_keys(item: pytest.Item, idx: int, count: int) -> None:
+    """Create item sort key.
+
+    Store in SortConfig.item_sort_keys, and collect the bucket data used by create_bucket_sort_keys.
+    Requires SortConfig.item_bucket_id from create_item_bucket_id.
+    """
+    (mode, _, _, bucket_sort_key, item_sort_key) = get_marker_settings(item)
 
     SortConfig.item_sort_keys[item.nodeid] = item_sort_key or create_item_key[mode or SortConfig.mode](item, idx, count)
 
-    bucket_id = bucket_id or create_bucket_id[bucket or SortConfig.bucket](item)
-    SortConfig.item_bucket_id[item.nodeid] = bucket_id
+    bucket_id = SortConfig.item_bucket_id[item.nodeid]
 
-    bucket_key = bucket_sort_key or create_bucket_key[SortConfig.bucket_mode](bucket_id, idx, count)
-    if bucket_id in SortConfig.bucket_sort_keys:
-        SortConfig.bucket_sort_keys[bucket_id] = min(SortConfig.bucket_sort_keys[bucket_id], bucket_key)
+    if bucket_sort_key or SortConfig.bucket_mode == "random":
+        # Random keys are drawn for each item in collection order, so a seed gives the same order as before
+        bucket_key = bucket_sort_key or create_bucket_key["random"](bucket_id, idx, count)
+        if bucket_id in SortConfig.bucket_item_keys:
+            SortConfig.bucket_item_keys[bucket_id] = min(SortConfig.bucket_item_keys[bucket_id], bucket_key)
+        else:
+            SortConfig.bucket_item_keys[bucket_id] = bucket_key
     else:
-        SortConfig.bucket_sort_keys[bucket_id] = bucket_key
+        (first_idx, _) = SortConfig.bucket_index_range.get(bucket_id, (idx, idx))
+        SortConfig.bucket_index_range[bucket_id] = (first_idx, idx)
+
+
+def create_bucket_sort_keys(count: int) -> None:
+    """Create one sort key for each bucket.
+
+    Store in SortConfig.bucket_sort_keys
+    """
+    for bucket_id, (first_idx, last_idx) in SortConfig.bucket_index_range.items():
+        # 'reverse' ranks a bucket by its last item, matching the lowest (count - idx) of its items.
+        idx = last_idx if SortConfig.bucket_mode == "reverse" else first_idx
+        SortConfig.bucket_sort_keys[bucket_id] = create_bucket_key[SortConfig.bucket_mode](bucket_id, idx, count)
+
+    for bucket_id, bucket_key in SortConfig.bucket_item_keys.items():
+        if bucket_id in SortConfig.bucket_sort_keys:
+            SortConfig.bucket_sort_keys[bucket_id] = min(SortConfig.bucket_sort_keys[bucket_id], bucket_key)
+        else:
+            SortConfig.bucket_sort_keys[bucket_id] = bucket_key
 
 
 def get_item_sort_key(item: pytest.Item) -> tuple:
@@ -218,29 +286,201 @@ def get_item_sort_key(item: pytest.Item) -> tuple:
     return (SortConfig.bucket_sort_keys[bucket_id], SortConfig.item_sort_keys[node_id])
 
 
+def get_loaders() -> list[Callable]:
+    """List the functions loading the recorded data and coverage scores needed by the configured modes."""
+    uses_diffcov = SortConfig.mode == "diffcov" or SortConfig.bucket_mode == "diffcov" or SortConfig.diffcov_select
+    uses_mutcov = SortConfig.mode == "mutcov" or SortConfig.bucket_mode == "mutcov"
+
+    loaders: list[Callable] = []
+    if uses_diffcov:
+        loaders.append(get_diff_test_scores)
+    if SortConfig.diffcov_select:
+        loaders.append(get_covered_tests)
+    if uses_mutcov:
+        loaders.append(get_mut_test_scores)
+    if SortConfig.mode == "failfirst" or SortConfig.bucket_mode == "failfirst":
+        loaders.append(get_all_fail_rates)
+    if (
+        SortConfig.mode == "fastest"
+        or SortConfig.bucket_mode == "fastest"
+        or (SortConfig.cov_per_second and (uses_diffcov or uses_mutcov))
+        or SortConfig.shard
+    ):
+        loaders.append(get_all_totals)
+    return loaders
+
+
+def start_loading() -> None:
+    """Start the loaders of the configured modes in a background thread, to overlap them with test collection.
+
+    The loaders run one at a time, as the datafile is cached in module state.
+    """
+    loaders = get_loaders()
+    if not loaders:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pytest-sort")
+    SortConfig.loading = {loader: executor.submit(loader) for loader in loaders}
+    executor.shutdown(wait=False)
+
+
+def load_all() -> dict[str, Any]:
+    """Run the loaders of the configured modes now. Return map of loader name to result."""
+    return {loader.__name__: loader() for loader in get_loaders()}
+
+
+def use_loaded(loaded: dict[str, Any]) -> None:
+    """Use the results of load_all from another process, such as the pytest-xdist controller, instead of loading."""
+    for loader in get_loaders():
+        if loader.__name__ in loaded:
+            future: Future = Future()
+            future.set_result(loaded[loader.__name__])
+            SortConfig.loading[loader] = future
+
+
+def load(loader: Callable) -> Any:  # noqa: ANN401
+    """Retrieve the result of loader started by start_loading, or call loader now if it was not started.
+
+    The result is kept, as sorting and sharding may both need it.
+    """
+    future = SortConfig.loading.get(loader)
+    if future is None:
+        return loader()
+    return future.result()
+
+
 def sort_items(items: list[pytest.Item]) -> None:
     """Reorder the items."""
+    SortConfig.node_marker_settings = {}
+    SortConfig.node_bucket_ids = {}
+
+    # Loaders share the datafile cache, so none may still be running when it is used here.
+    wait(SortConfig.loading.values())
+
     if SortConfig.mode == "random" or SortConfig.bucket_mode == "random":
         random.seed(SortConfig.seed)
 
-    if SortConfig.mode == "diffcov" or SortConfig.bucket_mode == "diffcov":
-        SortConfig.diff_cov_scores = get_diff_test_scores()
+    if SortConfig.mode == "diffcov" or SortConfig.bucket_mode == "diffcov" or SortConfig.diffcov_select:
+        with phase("coverage scoring"):
+            diff_test_scores = load(get_diff_test_scores)
+        SortConfig.diff_cov_scores = weigh_cov_scores(diff_test_scores)
+        SortConfig.diff_cov_index = PrefixIndex(SortConfig.diff_cov_scores)
 
     if SortConfig.mode == "mutcov" or SortConfig.bucket_mode == "mutcov":
-        SortConfig.mut_cov_scores = get_mut_test_scores()
+        with phase("coverage scoring"):
+            mut_test_scores = load(get_mut_test_scores)
+        SortConfig.mut_cov_scores = weigh_cov_scores(mut_test_scores)
+        SortConfig.mut_cov_index = PrefixIndex(SortConfig.mut_cov_scores)
+
+    if SortConfig.mode == "failfirst" or SortConfig.bucket_mode == "failfirst":
+        with phase("datafile load"):
+            SortConfig.fail_rates = load(get_all_fail_rates)
+        SortConfig.fail_rate_index = PrefixIndex({nodeid: -rate for (nodeid, rate) in SortConfig.fail_rates.items()})
 
     if SortConfig.mode == "fastest" or SortConfig.bucket_mode == "fastest":
-        SortConfig.item_totals = get_all_totals()
+        with phase("datafile load"):
+            SortConfig.item_totals = load(get_all_totals)
+        SortConfig.item_totals_index = PrefixIndex(SortConfig.item_totals)
+
+    with phase("marker resolution"):
+        for item in items:
+            get_marker_settings(item)
+
+    with phase("bucket ids"):
+        start = time.perf_counter_ns()
+        for item in items:
+            create_item_bucket_id(item)
+        bucket_id_ns = time.perf_counter_ns() - start
+
+    with phase("sort keys"):
+        for idx, item in enumerate(items):
+            create_item_sort_keys(item, idx, len(items))
 
-    for idx, item in enumerate(items):
-        create_sort_keys(item, idx, len(items))
+        create_bucket_sort_keys(len(items))
 
-    items.sort(key=get_item_sort_key)
+    with phase("sort"):
+        items.sort(key=get_item_sort_key)
+
+    SortConfig.node_marker_settings = {}
+    SortConfig.node_bucket_ids = {}
 
     if SortConfig.debug:
+        print(f"\npytest-sort: bucket ids for {len(items)} items derived in {bucket_id_ns / 1_000_000:.3f} ms")
         print_test_case_order(items)
 
 
+def estimate_totals(nodeids: list[str], totals: dict[str, int]) -> dict[str, int]:
+    """Retrieve the recorded total for each nodeid. Tests without a recorded total use the median of the others."""
+    recorded = [totals[nodeid] for nodeid in nodeids if nodeid in totals]
+    default = int(median(recorded)) if recorded else 1
+    return {nodeid: totals.get(nodeid, default) for nodeid in nodeids}
+
+
+def weigh_cov_scores(scores: dict[str, int]) -> dict[str, Any]:
+    """Divide coverage scores by recorded runtime in seconds when cov_per_second is set.
+
+    The most negative score per second runs first, so cheap tests covering many changed lines come before slow ones.
+    """
+    if not SortConfig.cov_per_second:
+        return scores
+    with phase("datafile load"):
+        all_totals = load(get_all_totals)
+    totals = estimate_totals(list(scores), all_totals)
+    return {nodeid: score * 1_000_000_000 / max(totals[nodeid], 1) for (nodeid, score) in scores.items()}
+
+
+def create_shards(units: dict[str, int], count: int) -> list[list[str]]:
+    """Split units into count shards with balanced totals, longest processing time first.
+
+    Ties are broken by unit id and shard number, so the result only depends on the units.
+    """
+    shards: list[list[str]] = [[] for _ in range(count)]
+    loads = [0] * count
+    for unit_id in sorted(units, key=lambda unit_id: (-units[unit_id], unit_id)):
+        shard = loads.index(min(loads))
+        shards[shard].append(unit_id)
+        loads[shard] += units[unit_id]
+    return shards
+
+
+def select_shard(items: list[pytest.Item], shard: tuple[int, int]) -> list[pytest.Item]:
+    """Keep only the items in shard K of N, and return the removed items.
+
+    Requires SortConfig.item_bucket_id from sort_items. Buckets are never split between shards,
+    except the session bucket, which is split by item.
+    """
+    (index, count) = shard
+    with phase("datafile load"):
+        all_totals = load(get_all_totals)
+    item_totals = estimate_totals([item.nodeid for item in items], all_totals)
+
+    item_unit = {item.nodeid: SortConfig.item_bucket_id[item.nodeid] or item.nodeid for item in items}
+    units: dict[str, int] = {}
+    for nodeid, unit_id in item_unit.items():
+        units[unit_id] = units.get(unit_id, 0) + item_totals[nodeid]
+
+    selected_units = set(create_shards(units, count)[index - 1])
+
+    deselected = [item for item in items if item_unit[item.nodeid] not in selected_units]
+    items[:] = [item for item in items if item_unit[item.nodeid] in selected_units]
+    return deselected
+
+
+def select_diffcov(items: list[pytest.Item]) -> list[pytest.Item]:
+    """Keep only the items with some coverage of the changes, and return the removed items.
+
+    Requires SortConfig.diff_cov_scores from sort_items.
+    Items missing from the coverage data, such as new tests, are always kept.
+    """
+    with phase("coverage scoring"):
+        covered_tests = load(get_covered_tests)
+    uncovered = covered_tests.difference(SortConfig.diff_cov_scores)
+    deselected = [item for item in items if item.nodeid in uncovered]
+    items[:] = [item for item in items if item.nodeid not in uncovered]
+    SortConfig.diffcov_deselected = len(deselected)
+    return deselected
+
+
 def print_recorded_times_report(terminal_reporter: TerminalReporter) -> None:
     """Print a summary report of maximum recorded times."""
     nodeids = list({rpt.nodeid for rpt in terminal_reporter.stats[""]})
@@ -1,71 +1,282 @@
-"""Manages datafile for pytest_sort plugin."""
+"""Manages datafile for pytest_sort plugin.
+
+The datafile starts with a JSON snapshot of all test case data.
+Each session appends one line with the durations it recorded, which are merged into the snapshot when loading.
+The line ends with the number of sessions appended since the snapshot, so saving only reads the end of the datafile.
+A partial last line, left by a session interrupted while appending, is skipped and dropped when the next session saves.
+
+Datafiles ending with .sqlite or .db are stored in SQLite instead. See pytest_sort.database_sqlite
+"""
 
 from __future__ import annotations
 
 import json
+import os
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pytest_sort import database_sqlite
+from pytest_sort.durations import add_sample, get_statistic
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
 
 database_file = Path.cwd() / ".pytest_sort_data"
 
+# "json" or "sqlite". When None, the format is chosen by the suffix of the datafile.
+datafile_format: str | None = None
+
+# Statistic used for the total of each test case, one of pytest_sort.durations.statistics
+statistic = "max"
+
+# Rewrite the datafile as a single snapshot once it holds this many appended sessions.
+compact_after = 20
+
+# Bytes read from the end of the datafile, enough for the session number ending the last line.
+_TAIL_SIZE = 32
+
 _sort_data: dict = {}
 
 
-def _load_data() -> None:
+def _skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _read_documents(text: str) -> Generator[dict, None, None]:
+    decoder = json.JSONDecoder()
+    end = _skip_whitespace(text, 0)
+    while end < len(text):
+        try:
+            (document, end) = decoder.raw_decode(text, end)
+        except json.JSONDecodeError:
+            newline = text.find("\n", end)
+            end = len(text) if newline == -1 else newline
+        else:
+            # Skip the session numbers ending the appended lines
+            if isinstance(document, dict):
+                yield document
+        end = _skip_whitespace(text, end)
+
+
+def _load_text(text: str) -> None:
     global _sort_data
+    documents = _read_documents(text)
+    _sort_data = next(documents, {})
+    for recorded_times in documents:
+        _merge_recorded_times(recorded_times)
+
+
+def _load_data() -> None:
     if not _sort_data and database_file.exists():
-        _sort_data = json.loads(database_file.read_text("utf-8"))
+        _load_text(database_file.read_text("utf-8"))
+
+
+def _get_file_mode(path: Path) -> int:
+    """Permission bits of path, or of a new file created with the current umask if path does not exist."""
+    try:
+        return path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@contextmanager
+def atomic_path(path: Path) -> Generator[Path, None, None]:
+    """Yield a temporary path next to path, which replaces path when the with block succeeds.
+
+    Readers never see a partial file. The temporary file is removed if the with block fails.
+    """
+    (fd, temp_name) = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    temp_path = Path(temp_name)
+    try:
+        yield temp_path
+        # mkstemp creates the file readable by the owner only, keep the mode path has or would get
+        temp_path.chmod(_get_file_mode(path))
+        temp_path.replace(path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """Write text to a temporary file, then replace path with it, so readers never see a partial file."""
+    with atomic_path(path) as temp_path:
+        temp_path.write_text(text, "utf-8")
 
 
 def _save_data() -> None:
-    database_file.write_text(json.dumps(_sort_data, indent=4), "utf-8")
+    write_atomic(database_file, json.dumps(_sort_data) + "\n")
+
+
+def _read_tail() -> bytes:
+    """Read the last _TAIL_SIZE bytes of the datafile. (b"" if there is no datafile)."""
+    if not database_file.exists():
+        return b""
+    with database_file.open("rb") as datafile:
+        size = datafile.seek(0, os.SEEK_END)
+        datafile.seek(max(size - _TAIL_SIZE, 0))
+        return datafile.read()
+
+
+def _append_data(recorded_times: dict) -> None:
+    """Append recorded_times to the datafile, or compact it once it holds compact_after appended sessions.
+
+    The number of appended sessions is read from the end of the last line, the datafile is only parsed when compacting.
+    Compacting reloads the datafile, so sessions appended since it was loaded are kept.
+    """
+    tail = _read_tail()
+    if not tail.strip():
+        (separator, number) = (b"{}\n", 0)
+    elif tail.endswith(b"\n"):
+        (_, _, last) = tail.rstrip().rpartition(b" ")
+        (separator, number) = (b"", int(last) if last.isdigit() else 0)
+    else:
+        # The last line is partial, compacting drops it
+        (separator, number) = (b"", compact_after)
+
+    if number + 1 >= compact_after:
+        _load_text(database_file.read_text("utf-8"))
+        _merge_recorded_times(recorded_times)
+        _save_data()
+        return
+
+    with database_file.open("ab") as datafile:
+        datafile.write(separator + f"{json.dumps(recorded_times)} {number + 1}\n".encode())
+
+
+def _use_sqlite(path: Path | None = None) -> bool:
+    if path is None:
+        if datafile_format:
+            return datafile_format == "sqlite"
+        path = database_file
+    return path.suffix in database_sqlite.suffixes
+
+
+def _merge_recorded_times(recorded_times: dict, sort_data: dict | None = None) -> None:
+    sort_data = _sort_data if sort_data is None else sort_data
+    for nodeid, recorded_node in recorded_times.items():
+        sort_data[nodeid] = add_sample(sort_data.get(nodeid, {}), recorded_node)
 
 
 def clear_db() -> None:
     """Clear Saved Data."""
     global _sort_data
+    if _use_sqlite():
+        database_sqlite.clear(database_file)
+        return
+
     _sort_data = {}
     _save_data()
 
 
 def update_test_cases(recorded_times: dict) -> None:
-    """Update Test Case Data with specfiied duration(s) and recalculate total(s)."""
-    _load_data()
+    """Update Test Case Data with specfiied duration(s) and recalculate total(s) and statistics.
 
-    for nodeid, recorded_node in recorded_times.items():
-        node_data = _sort_data.get(nodeid, {})
+    Appends only the recorded durations to the datafile, so saving does not parse the datafile.
+    If the data was already loaded this session, it is updated as well.
+    The datafile is compacted once it holds compact_after appended sessions, whether or not it was loaded.
 
-        node_data["setup"] = max(node_data.get("setup", 0), recorded_node.get("setup", 0))
-        node_data["call"] = max(node_data.get("call", 0), recorded_node.get("call", 0))
-        node_data["teardown"] = max(node_data.get("teardown", 0), recorded_node.get("teardown", 0))
+    With SQLite, only the records for the recorded nodeids are read and replaced.
+    """
+    if _use_sqlite():
+        records = database_sqlite.get_records(database_file, list(recorded_times))
+        _merge_recorded_times(recorded_times, records)
+        database_sqlite.save_records(database_file, records)
+        return
 
-        node_data["total"] = node_data["setup"] + node_data["call"] + node_data["teardown"]
+    if _sort_data:
+        _merge_recorded_times(recorded_times)
 
-        _sort_data[nodeid] = node_data
-
-    _save_data()
+    _append_data(recorded_times)
 
 
 def get_all_totals() -> dict:
-    """Retrieve all total durations for all nodeids."""
+    """Retrieve all total durations for all nodeids, using the selected statistic."""
+    if _use_sqlite():
+        return database_sqlite.get_all_totals(database_file, statistic)
+
     _load_data()
-    return {nodeid: _sort_data[nodeid]["total"] for nodeid in _sort_data}
+    return {nodeid: get_statistic(_sort_data[nodeid], statistic) for nodeid in _sort_data}
 
 
 def get_bucket_total(bucket_id: str) -> int:
     """Retrieve the total for all test nodeid that start with bucket_id. (0 if not found)."""
+    if _use_sqlite():
+        return database_sqlite.get_bucket_total(database_file, bucket_id, statistic)
+
+    _load_data()
+    return sum([get_statistic(_sort_data[nodeid], statistic) for nodeid in _sort_data if nodeid.startswith(bucket_id)])
+
+
+def get_all_fail_rates() -> dict:
+    """Retrieve the failure rate of all nodeids that failed in recent sessions."""
+    if _use_sqlite():
+        return database_sqlite.get_all_fail_rates(database_file)
+
     _load_data()
-    return sum([_sort_data[nodeid]["total"] for nodeid in _sort_data if nodeid.startswith(bucket_id)])
+    return {nodeid: record["fail_rate"] for nodeid, record in _sort_data.items() if record.get("fail_rate")}
 
 
 def get_stats(nodeid: str) -> dict:
     """Retrieve all stats for specified nodeid. (all zeroes if not found)."""
+    default = {
+        "setup": 0,
+        "call": 0,
+        "teardown": 0,
+        "total": 0,
+    }
+    if _use_sqlite():
+        return database_sqlite.get_record(database_file, nodeid) or default
+
     _load_data()
-    return _sort_data.get(
-        nodeid,
-        {
-            "setup": 0,
-            "call": 0,
-            "teardown": 0,
-            "total": 0,
-        },
-    )
+    return _sort_data.get(nodeid, default)
+
+
+def _read_all(path: Path) -> dict:
+    if _use_sqlite(path):
+        return database_sqlite.get_all_records(path)
+
+    sort_data: dict = {}
+    if path.exists():
+        documents = _read_documents(path.read_text("utf-8"))
+        sort_data = next(documents, {})
+        for recorded_times in documents:
+            _merge_recorded_times(recorded_times, sort_data)
+    return sort_data
+
+
+def import_data(source_file: Path) -> None:
+    """Replace all data in the datafile with the data from source_file.
+
+    Either file can be a JSON datafile or an SQLite datafile.
+    """
+    global _sort_data
+    sort_data = _read_all(Path(source_file))
+    if _use_sqlite():
+        database_sqlite.clear(database_file)
+        database_sqlite.save_records(database_file, sort_data)
+        return
+
+    _sort_data = sort_data
+    _save_data()
+
+
+def export_data(target_file: Path) -> None:
+    """Write all data in the datafile to target_file, replacing its contents.
+
+    Either file can be a JSON datafile or an SQLite datafile.
+    """
+    target_file = Path(target_file)
+    sort_data = _read_all(database_file)
+    if _use_sqlite(target_file):
+        database_sqlite.clear(target_file)
+        database_sqlite.save_records(target_file, sort_data)
+        return
+
+    write_atomic(target_file, json.dumps(sort_data) + "\n")
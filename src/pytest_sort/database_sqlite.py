@@ -0,0 +1,154 @@
+"""SQLite storage for pytest_sort data, used when the datafile name ends with .sqlite or .db."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from typing import TYPE_CHECKING, Any
+
+from pytest_sort.durations import get_statistic
+from pytest_sort.prefix import MAX_CHAR
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Sequence
+    from pathlib import Path
+
+suffixes = (".sqlite", ".db")
+
+# SQLite allows at most 999 parameters per statement in older versions.
+CHUNK_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS test_data (
+    nodeid TEXT PRIMARY KEY,
+    total INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    ewma INTEGER,
+    p50 INTEGER,
+    p95 INTEGER,
+    fail_rate REAL
+) WITHOUT ROWID
+"""
+
+# Column holding the total for each statistic. Columns other than total are NULL for rows saved before they existed.
+_STATISTIC_COLUMNS = {
+    "max": "total",
+    "ewma": "ewma",
+    "p50": "p50",
+    "p95": "p95",
+}
+
+# Columns added after the first release, and their types, added to existing databases.
+_ADDED_COLUMNS = {
+    "ewma": "INTEGER",
+    "p50": "INTEGER",
+    "p95": "INTEGER",
+    "fail_rate": "REAL",
+}
+
+_connection: sqlite3.Connection | None = None
+_connection_path: Path | None = None
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    global _connection, _connection_path
+    if _connection is None or _connection_path != path:
+        if _connection is not None:
+            _connection.close()
+        _connection = sqlite3.connect(path, check_same_thread=False)
+        _connection.execute(_SCHEMA)
+        columns = {row[1] for row in _connection.execute("PRAGMA table_info(test_data)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in columns:
+                _connection.execute(f"ALTER TABLE test_data ADD COLUMN {column} {column_type}")
+        _connection_path = path
+    return _connection
+
+
+def select_in(
+    con: sqlite3.Connection, query: str, values: Sequence, params: Sequence = ()
+) -> Generator[Any, None, None]:
+    """Run query for each chunk of values, and yield the rows.
+
+    The placeholders for the chunk replace {} in query, and are bound after params.
+    """
+    for start in range(0, len(values), CHUNK_SIZE):
+        chunk = values[start : start + CHUNK_SIZE]
+        yield from con.execute(query.format(",".join("?" * len(chunk))), (*params, *chunk))
+
+
+def close() -> None:
+    """Close the cached connection."""
+    global _connection, _connection_path
+    if _connection is not None:
+        _connection.close()
+    _connection = None
+    _connection_path = None
+
+
+def clear(path: Path) -> None:
+    """Delete all records."""
+    with _connect(path) as con:
+        con.execute("DELETE FROM test_data")
+
+
+def get_records(path: Path, nodeids: list[str]) -> dict:
+    """Retrieve the records for the specified nodeids. Nodeids without a record are left out."""
+    rows = select_in(_connect(path), "SELECT nodeid, record FROM test_data WHERE nodeid IN ({})", nodeids)
+    return {nodeid: json.loads(record) for (nodeid, record) in rows}
+
+
+def get_all_records(path: Path) -> dict:
+    """Retrieve all records."""
+    con = _connect(path)
+    return {nodeid: json.loads(record) for (nodeid, record) in con.execute("SELECT nodeid, record FROM test_data")}
+
+
+def save_records(path: Path, records: dict) -> None:
+    """Insert or replace the specified records."""
+    rows = [
+        (
+            nodeid,
+            record["total"],
+            json.dumps(record),
+            get_statistic(record, "ewma"),
+            get_statistic(record, "p50"),
+            get_statistic(record, "p95"),
+            record.get("fail_rate"),
+        )
+        for nodeid, record in records.items()
+    ]
+    with _connect(path) as con:
+        con.executemany(
+            "INSERT OR REPLACE INTO test_data (nodeid, total, record, ewma, p50, p95, fail_rate)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+def get_all_totals(path: Path, statistic: str = "max") -> dict:
+    """Retrieve all total durations for all nodeids."""
+    con = _connect(path)
+    column = _STATISTIC_COLUMNS[statistic]
+    return dict(con.execute(f"SELECT nodeid, COALESCE({column}, total) FROM test_data"))  # noqa: S608
+
+
+def get_bucket_total(path: Path, bucket_id: str, statistic: str = "max") -> int:
+    """Retrieve the total for all test nodeid that start with bucket_id, using the nodeid index."""
+    con = _connect(path)
+    column = _STATISTIC_COLUMNS[statistic]
+    query = f"SELECT COALESCE(SUM(COALESCE({column}, total)), 0) FROM test_data WHERE nodeid >= ? AND nodeid < ?"  # noqa: S608
+    return con.execute(query, (bucket_id, bucket_id + MAX_CHAR)).fetchone()[0]
+
+
+def get_all_fail_rates(path: Path) -> dict:
+    """Retrieve the failure rate of all nodeids that failed in recent sessions."""
+    con = _connect(path)
+    return dict(con.execute("SELECT nodeid, fail_rate FROM test_data WHERE fail_rate > 0"))
+
+
+def get_record(path: Path, nodeid: str) -> dict | None:
+    """Retrieve the record for specified nodeid. (None if not found)."""
+    con = _connect(path)
+    row = con.execute("SELECT record FROM test_data WHERE nodeid = ?", (nodeid,)).fetchone()
+    return json.loads(row[0]) if row else None
@@ -1,48 +1,289 @@
-"""Logic for prioritizing tests by coverage of changes."""
+"""Logic for prioritizing tests by coverage of changes.
+
+coverage.py is only imported once coverage data is read, so loading the plugin does not pay for it.
+"""
 
 from __future__ import annotations
 
+import bisect
+import hashlib
+import itertools
+import json
 import os
 import re
 import shlex
+import sqlite3
 import subprocess
+import tempfile
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
-import whatthepatch
-from coverage.sqldata import CoverageData
+from pytest_sort import database, impact
+from pytest_sort.database_sqlite import select_in
 
 if TYPE_CHECKING:
-    from collections.abc import Generator
+    from collections.abc import Generator, Iterable
 
 # pytest-cov populates test context as <nodeid>|(setup|run|teardown)
 PARSE_TEST_CONTEXT = re.compile(r"(?P<nodeid>.*)\|(?P<when>setup|run|teardown)")
 
+# Git ref to compare with, from the merge base of it and HEAD. Compare with the index when None.
+diff_base: str | None = None
+
+cache_name = ".pytest_sort_diff"
+
+# Only the line ranges of the hunk headers are needed from 'git diff -U0'
+PARSE_HUNK_HEADER = re.compile(r"@@ -(?P<old>\d+)(?:,(?P<old_count>\d+))? \+(?P<new>\d+)(?:,(?P<new_count>\d+))? @@")
+
 
 def get_git_toplevel_folder() -> str:
-    """Run Git rev-parse to get toplevel folder name."""
+    """Find the toplevel folder of the Git working tree containing the current folder.
+
+    Looks for .git in the current folder and its parents, and only runs Git rev-parse when it is not found,
+    or when the Git environment variables may point somewhere else.
+    """
+    if "GIT_DIR" not in os.environ and "GIT_WORK_TREE" not in os.environ:
+        cwd = Path.cwd()
+        for folder in (cwd, *cwd.parents):
+            if (folder / ".git").exists():
+                return str(folder)
+
     output = subprocess.run(shlex.split("git rev-parse --show-toplevel"), capture_output=True, check=True)  # noqa: S603
     return output.stdout.decode().strip()
 
 
-def get_git_diff_patch() -> str:
-    """Run Git Diff command and return result as string."""
-    output = subprocess.run(shlex.split("git diff -U0"), capture_output=True, check=True)  # noqa: S603
-    return output.stdout.decode()
+def _run_git(*args: str) -> str:
+    output = subprocess.run(["git", *args], capture_output=True, check=True)  # noqa: S603, S607
+    return output.stdout.decode(errors="replace")
+
+
+def get_git_merge_base(ref: str) -> str:
+    """Run Git merge-base to get the commit HEAD branched from ref."""
+    return _run_git("merge-base", ref, "HEAD").strip()
+
+
+def get_git_diff_lines(base: str | None = None) -> Generator[str, Any, None]:
+    """Run Git Diff command and yield the output one line at a time, as it is read from the pipe.
+
+    Compares the working tree with base commit when provided, otherwise with the index.
+    Errors are written to a temporary file, as Git could block on a full stderr pipe while stdout is read.
+    """
+    command = shlex.split("git diff -U0") + ([base] if base else [])
+    with tempfile.TemporaryFile() as stderr:
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr) as process:  # noqa: S603
+            for line in process.stdout or ():
+                yield line.decode(errors="replace")
+        if process.returncode:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr.read())
+
+
+# Number of fields before the path in each type of 'git status --porcelain=v2' entry
+_STATUS_FIELDS = {"1": 8, "2": 9, "u": 10}
+
+
+def get_git_state(git_folder: str) -> str | None:
+    """Hash of everything the changed lines depend on: commits of HEAD and diff_base, the index, and changed files.
+
+    Git status lists the changed files with the object ids of their staged contents.
+    The modified time and size of each changed file are included to detect further edits.
+    Return None if Git can not determine the state.
+    """
+    try:
+        status = _run_git("status", "--porcelain=v2", "-z", "--untracked-files=no")
+        commits = _run_git("rev-parse", "HEAD", *([diff_base] if diff_base else [])).split()
+    except subprocess.CalledProcessError:
+        return None
+
+    files = []
+    entries = iter(status.split("\0"))
+    for entry in entries:
+        if entry[:1] in _STATUS_FIELDS:
+            path = Path(git_folder, entry.split(" ", _STATUS_FIELDS[entry[0]])[-1])
+            files.append([entry, *(impact.get_file_stat(path).values() if path.exists() else [])])
+            if entry[0] == "2":
+                # Renamed or copied entries are followed by the original path
+                next(entries, None)
+
+    state = [diff_base, commits, files]
+    return hashlib.sha256(json.dumps(state).encode()).hexdigest()
+
+
+def get_cache_file() -> Path:
+    """Location of the changed lines cache, next to the datafile."""
+    return database.database_file.with_name(cache_name)
+
+
+def read_changed_lines_cache(state: str) -> dict[Path, set[int]] | None:
+    """Retrieve cached changed lines if they were saved for the same Git state."""
+    try:
+        cache = json.loads(get_cache_file().read_text("utf-8"))
+    except (OSError, ValueError):
+        return None
+    if cache.get("state") != state:
+        return None
+    return {Path(path): set(lines) for path, lines in cache["changed_lines"].items()}
 
 
-def get_diff_changed_lines(git_folder: str, git_diff_patch: str) -> dict[Path, set[int]]:
-    """Use whatthepatch to parse the patch string.
+def write_changed_lines_cache(state: str, changed_lines: dict[Path, set[int]]) -> None:
+    """Save changed lines for the Git state."""
+    cache = {
+        "state": state,
+        "changed_lines": {str(path): sorted(lines) for path, lines in changed_lines.items()},
+    }
+    database.write_atomic(get_cache_file(), json.dumps(cache) + "\n")
 
+
+def get_git_changed_lines() -> dict[Path, set[int]]:
+    """Determine changed lines from Git diff.
+
+    With diff_base, the changed lines are cached while the Git state has not changed, as the diff may span many commits.
+    Without it, the diff of the working tree costs less than determining the Git state.
     Return map of resolved path of file to set of inserted, updated, or deleted line numbers.
     """
+    git_folder = get_git_toplevel_folder()
+    if not diff_base:
+        return get_diff_changed_lines(git_folder, get_git_diff_lines())
+
+    state = get_git_state(git_folder)
+    changed_lines = read_changed_lines_cache(state) if state else None
+    if changed_lines is None:
+        changed_lines = get_diff_changed_lines(git_folder, get_git_diff_lines(get_git_merge_base(diff_base)))
+        if state:
+            write_changed_lines_cache(state, changed_lines)
+    return changed_lines
+
+
+# Escapes in paths Git quotes, besides octal bytes and escaped quotes and backslashes
+_GIT_ESCAPES = {"a": "\a", "b": "\b", "t": "\t", "n": "\n", "v": "\v", "f": "\f", "r": "\r"}
+
+
+def unquote_git_path(path: str) -> str:
+    """Undo the C-style quoting of paths with special or non-ASCII characters in Git output.
+
+    Octal escapes are the bytes of the UTF-8 encoded path.
+    """
+    if not (len(path) > 1 and path[0] == path[-1] == '"'):
+        return path
+    data = bytearray()
+    for idx, part in enumerate(re.split(r"\\([0-7]{3}|.)", path[1:-1])):
+        if idx % 2 == 0:
+            data += part.encode()
+        elif part.isdigit():
+            data.append(int(part, 8))
+        else:
+            data += _GIT_ESCAPES.get(part, part).encode()
+    return data.decode(errors="replace")
+
+
+def _get_diff_path(line: str) -> str | None:
+    path = unquote_git_path(line[4:].rstrip("\n").split("\t", 1)[0])
+    if path == "/dev/null":
+        return None
+    return path[2:] if path.startswith(("a/", "b/")) else path
+
+
+class LineOffsetMap:
+    """Translate line numbers of the old version of a file to the new version, using the hunks of a diff.
+
+    Each hunk is (old_start, old_count, new_start, new_count) as in its '@@ -a,b +c,d @@' header.
+    Lines between hunks move by the total change in line count of the hunks before them, found by bisect.
+    Lines replaced or deleted by a hunk, or followed by lines it inserted, translate to the first line of the hunk.
+    """
+
+    def __init__(self, hunks: Iterable[tuple[int, int, int, int]]) -> None:
+        """Create sorted arrays of hunk boundaries, with the cumulative line count delta after each hunk."""
+        self.old_starts: list[int] = []
+        self.old_ends: list[int] = []
+        self.new_starts: list[int] = []
+        self.new_ends: list[int] = []
+        self.deltas: list[int] = []
+        delta = 0
+        for old, old_count, new, new_count in sorted(hunks):
+            # Inserted lines follow old line old, at the top of the file they precede line 1
+            old_start = old if old_count else max(old, 1)
+            self.old_starts.append(old_start)
+            self.old_ends.append(old + old_count if old_count else old_start + 1)
+            self.new_starts.append(new if new_count else new + 1)
+            self.new_ends.append(new + new_count if new_count else new + 1)
+            delta += new_count - old_count
+            self.deltas.append(delta)
+
+    def translate(self, lineno: int) -> int:
+        """Translate a line number of the old version to its line number in the new version."""
+        index = bisect.bisect_right(self.old_ends, lineno)
+        if index < len(self.old_ends) and self.old_starts[index] <= lineno:
+            return self.first_line(index)
+        return lineno + (self.deltas[index - 1] if index else 0)
+
+    def first_line(self, index: int) -> int:
+        """Line number in the new version that the lines of hunk index translate to."""
+        return self.new_starts[index] if self.new_ends[index] > self.new_starts[index] else self.new_ends[index] - 1
+
+    def changed_lines(self) -> set[int]:
+        """Line numbers in the new version that were inserted or updated, or next to deleted lines."""
+        changed_lines: set[int] = set()
+        for index in range(len(self.new_starts)):
+            changed_lines.update(range(self.new_starts[index], self.new_ends[index]))
+            changed_lines.add(self.first_line(index))
+        return changed_lines
+
+    def original_lines(self, lines: set[int]) -> set[int]:
+        """Line numbers in the old version that translate to any of the lines of the new version."""
+        original_lines: set[int] = set()
+        for index in range(len(self.old_starts)):
+            if self.first_line(index) in lines:
+                original_lines.update(range(self.old_starts[index], self.old_ends[index]))
+        for lineno in lines:
+            # Unchanged lines move back by the delta of the hunks ending before them in the new version
+            index = bisect.bisect_right(self.new_ends, lineno)
+            original = lineno - (self.deltas[index - 1] if index else 0)
+            if original > 0 and self.translate(original) == lineno:
+                original_lines.add(original)
+        return original_lines
+
+
+def get_diff_hunks(git_folder: str, git_diff_lines: Iterable[str]) -> dict[Path, list[tuple[int, int, int, int]]]:
+    """Parse the file and hunk headers of 'git diff -U0' output, one line at a time.
+
+    Return map of resolved path of file to list of (old_start, old_count, new_start, new_count) for each hunk.
+    """
+    diff_hunks: dict[Path, list[tuple[int, int, int, int]]] = {}
+    in_header = False
+    path = None
+    hunks: list[tuple[int, int, int, int]] | None = None
+    for line in git_diff_lines:
+        if line.startswith("diff "):
+            (in_header, path, hunks) = (True, None, None)
+        elif in_header and line.startswith("--- "):
+            path = _get_diff_path(line)
+        elif in_header and line.startswith("+++ "):
+            # New files have no old path
+            path = path or _get_diff_path(line)
+        elif line.startswith("@@"):
+            in_header = False
+            match = PARSE_HUNK_HEADER.match(line)
+            if not match or not path:
+                continue
+            if hunks is None:
+                hunks = diff_hunks.setdefault(Path(git_folder).joinpath(path).resolve(), [])
+            (old, old_count, new, new_count) = match.group("old", "old_count", "new", "new_count")
+            hunks.append((int(old), int(old_count or 1), int(new), int(new_count or 1)))
+    return diff_hunks
+
+
+def get_diff_changed_lines(git_folder: str, git_diff_lines: Iterable[str]) -> dict[Path, set[int]]:
+    """Determine changed lines from 'git diff -U0' output.
+
+    Coverage data was recorded before the changes, so the changed lines of the new version are translated back
+    to the line numbers of the old version. Coverage of the old version can then be compared directly,
+    even when earlier hunks moved the changed lines.
+    Return map of resolved path of file to set of line numbers in the old version.
+    """
     changed_lines = {}
-    patch_data = whatthepatch.parse_patch(git_diff_patch)
-    for diff in patch_data:
-        if diff.header and diff.changes:
-            path = diff.header.old_path
-            rpath = Path(git_folder).joinpath(path).resolve()
-            changed_lines[rpath] = {change.old or change.new or 0 for change in diff.changes}
+    for rpath, hunks in get_diff_hunks(git_folder, git_diff_lines).items():
+        offset_map = LineOffsetMap(hunks)
+        changed_lines[rpath] = offset_map.original_lines(offset_map.changed_lines())
     return changed_lines
 
 
@@ -51,59 +292,226 @@ def get_mut_changed_lines() -> dict[Path, set[int]]:
 
     Return map of resolved path of file to set of inserted, updated, or deleted line numbers.
     """
-    changed_lines = {}
     mut_source_file = os.environ.get("MUT_SOURCE_FILE", None)
     mut_lineno = os.environ.get("MUT_LINENO", "0")
     mut_end_lineno = os.environ.get("MUT_END_LINENO", mut_lineno)
 
     if mut_source_file and int(mut_lineno):
-        rpath = Path(mut_source_file).resolve()
-        changed_lines[rpath] = set(range(int(mut_lineno), int(mut_end_lineno) + 1))
+        return get_mutant_lines(mut_source_file, int(mut_lineno), int(mut_end_lineno))
 
-    return changed_lines
+    return {}
+
+
+def get_mutant_lines(source_file: str | Path, lineno: int, end_lineno: int | None = None) -> dict[Path, set[int]]:
+    """Return map of resolved path of mutated file to set of mutated line numbers."""
+    return {Path(source_file).resolve(): set(range(lineno, (end_lineno or lineno) + 1))}
+
+
+class PathIndex:
+    """Index of the file paths stored in coverage data, for finding the stored path of resolved paths.
+
+    Paths are matched by their normalized absolute path, which does not access the file system.
+    Only stored paths with the same file name as an unmatched path are resolved, to follow symlinks.
+    """
+
+    def __init__(self, stored_paths: Iterable[str]) -> None:
+        """Normalize each stored path once."""
+        self.by_path: dict[str, str] = {}
+        self.by_name: dict[str, list[str]] = {}
+        for stored_path in stored_paths:
+            # abspath normalizes the path without the file system access of Path.resolve
+            self.by_path[os.path.normcase(os.path.abspath(stored_path))] = stored_path  # noqa: PTH100
+            self.by_name.setdefault(Path(stored_path).name, []).append(stored_path)
+
+    def lookup(self, rpaths: Iterable[Path]) -> dict[str, Path]:
+        """Map the stored path of each resolved path found in the index to the resolved path."""
+        found = {}
+        for rpath in rpaths:
+            stored_path = self.by_path.get(os.path.normcase(rpath))
+            if stored_path is not None:
+                found[stored_path] = rpath
+                continue
+            for candidate in self.by_name.get(rpath.name, []):
+                if Path(candidate).resolve() == rpath:
+                    found[candidate] = rpath
+        return found
+
+
+def get_coverage_file() -> Path:
+    """Location of the coverage.py data file."""
+    from coverage.sqldata import CoverageData  # noqa: PLC0415
+
+    return Path(CoverageData().data_filename()).absolute()
+
+
+def connect_coverage_data() -> sqlite3.Connection | None:
+    """Open the coverage.py data file read-only. (None if there is no data file)."""
+    data_file = get_coverage_file()
+    if not data_file.exists():
+        return None
+    return sqlite3.connect(f"{data_file.as_uri()}?mode=ro", uri=True)
+
+
+def get_changed_file_ids(con: sqlite3.Connection, changed_lines: dict[Path, set[int]]) -> dict[int, set[int]]:
+    """Map the id of each changed file in the coverage data to its changed lines."""
+    stored_ids = dict(con.execute("SELECT path, id FROM file"))
+    found = PathIndex(stored_ids).lookup(changed_lines)
+    return {stored_ids[stored_path]: changed_lines[rpath] for stored_path, rpath in found.items()}
+
+
+def get_test_contexts(con: sqlite3.Connection, context_ids: set[int]) -> dict[int, tuple[str, str]]:
+    """Parse each test context once. Return map of context id to (nodeid, when), skipping other contexts."""
+    test_contexts: dict[int, tuple[str, str]] = {}
+    for context_id, context in select_in(con, "SELECT id, context FROM context WHERE id IN ({})", list(context_ids)):
+        match = PARSE_TEST_CONTEXT.search(context)
+        if match:
+            (nodeid, when) = match.group("nodeid", "when")
+            test_contexts[context_id] = (nodeid, when)
+    return test_contexts
+
+
+def get_changed_line_hits(con: sqlite3.Connection, file_ids: dict[int, set[int]]) -> tuple[set[int], dict[int, int]]:
+    """Query the coverage of the changed files.
+
+    Return the ids of contexts that cover any line of a changed file,
+    and the number of changed lines covered by each context.
+    """
+    from coverage.numbits import nums_to_numbits  # noqa: PLC0415
+
+    file_contexts: set[int] = set()
+    line_hits: dict[int, int] = {}
+    for file_id, lines in file_ids.items():
+        # Numbits are intersected as integers, as bit n of the little-endian integer is line n
+        changed_bits = int.from_bytes(nums_to_numbits(lines), "little")
+        for context_id, numbits in con.execute(
+            "SELECT context_id, numbits FROM line_bits WHERE file_id = ?", (file_id,)
+        ):
+            file_contexts.add(context_id)
+            hits = bin(int.from_bytes(numbits, "little") & changed_bits).count("1")
+            line_hits[context_id] = line_hits.get(context_id, 0) + hits
+
+        arc_lines: set[tuple[int, int]] = set()
+        query = "SELECT context_id, fromno, tono FROM arc WHERE file_id = ?"
+        for context_id, fromno, tono in con.execute(query, (file_id,)):
+            file_contexts.add(context_id)
+            arc_lines.update((context_id, lineno) for lineno in (fromno, tono) if lineno in lines)
+        for context_id, _ in arc_lines:
+            line_hits[context_id] = line_hits.get(context_id, 0) + 1
+    return (file_contexts, line_hits)
 
 
-def get_line_coverage() -> Generator[tuple[Path, str, str, int], Any, None]:
-    """Retrieve coverage data from coverage.py.
+def get_coverage_numbits(con: sqlite3.Connection) -> Generator[tuple[Path, str, str, bytes], Any, None]:
+    """Read all coverage data, parsing each context once.
 
-    Return flattened data as (resolved_path, nodeid, when, line).
+    Return the lines covered as (resolved_path, nodeid, when, numbits) for each file and test context.
+    Arcs are read in order of file and context, so only the lines of one context are held in memory.
     """
-    cov = CoverageData()
-    cov.read()
-    for path in cov.measured_files():
-        rpath = Path(path).resolve()
-        for line, tests in cov.contexts_by_lineno(path).items():
-            for test in tests:
-                match = PARSE_TEST_CONTEXT.search(test)
-                if match:
-                    (nodeid, when) = match.group("nodeid", "when")
-                    yield rpath, nodeid, when, line
+    from coverage.numbits import nums_to_numbits  # noqa: PLC0415
+
+    paths = {file_id: Path(path).resolve() for file_id, path in con.execute("SELECT id, path FROM file")}
+    test_contexts = get_test_contexts(con, {context_id for (context_id,) in con.execute("SELECT id FROM context")})
+
+    for file_id, context_id, numbits in con.execute("SELECT file_id, context_id, numbits FROM line_bits"):
+        if context_id in test_contexts:
+            yield (paths[file_id], *test_contexts[context_id], numbits)
+
+    query = "SELECT file_id, context_id, fromno, tono FROM arc ORDER BY file_id, context_id"
+    for (file_id, context_id), arcs in itertools.groupby(con.execute(query), key=lambda arc: arc[:2]):
+        if context_id in test_contexts:
+            lines = {lineno for (_, _, fromno, tono) in arcs for lineno in (fromno, tono) if lineno > 0}
+            yield (paths[file_id], *test_contexts[context_id], nums_to_numbits(lines))
+
+
+def get_current_index_file() -> Path | None:
+    """Location of the impact index, rebuilt first if it is missing or outdated. (None if it is not used)."""
+    if not impact.enabled:
+        return None
+
+    coverage_file = get_coverage_file()
+    if not coverage_file.exists():
+        return None
+
+    index_file = impact.get_index_file()
+    if impact.is_current(index_file, coverage_file):
+        return index_file
+
+    con = connect_coverage_data()
+    if con is None:
+        return None
+    try:
+        impact.build_index(index_file, coverage_file, get_coverage_numbits(con))
+    finally:
+        con.close()
+    return index_file
 
 
 def get_test_scores(changed_lines: dict[Path, set[int]]) -> dict[str, int]:
-    """Genarate a 'score' for each test case that has some coverage of the changed lines."""
-    test_scores = {}
-    for rpath, nodeid, when, line in get_line_coverage():
-        if rpath in changed_lines:
+    """Genarate a 'score' for each test case that has some coverage of the changed lines.
+
+    Only the changed files are read from the coverage data, and each context is parsed once.
+    """
+    con = connect_coverage_data()
+    if con is None:
+        return {}
+
+    try:
+        (file_contexts, line_hits) = get_changed_line_hits(con, get_changed_file_ids(con, changed_lines))
+        test_contexts = get_test_contexts(con, file_contexts)
+    finally:
+        con.close()
+
+    test_scores: dict[str, int] = {}
+    for context_id in file_contexts:
+        if context_id in test_contexts:
+            (nodeid, when) = test_contexts[context_id]
             # If test coverage includes changed module
-            if nodeid not in test_scores:
-                test_scores[nodeid] = -1
-            # If test coverage includes changed line
-            if line in changed_lines[rpath]:
-                # Changed line covered in run phase
-                if when == "run":
-                    test_scores[nodeid] -= 5
-                # Changed line covered in setup or terminate phase
-                else:
-                    test_scores[nodeid] -= 1
+            test_scores.setdefault(nodeid, -impact.weights["file"])
+            # Changed lines covered in run phase, or in setup or terminate phase
+            weight = impact.weights["run"] if when == "run" else impact.weights["other"]
+            test_scores[nodeid] -= line_hits.get(context_id, 0) * weight
     return test_scores
 
 
+def get_changed_test_scores(changed_lines: dict[Path, set[int]]) -> dict[str, int]:
+    """Genarate a 'score' for each test case that has some coverage of the changed lines, using the impact index."""
+    index_file = get_current_index_file()
+    if index_file is None:
+        return get_test_scores(changed_lines)
+    return impact.get_test_scores(index_file, changed_lines)
+
+
+def get_covered_tests() -> set[str]:
+    """Retrieve nodeids of all test cases in the coverage data, using the impact index."""
+    index_file = get_current_index_file()
+    if index_file is not None:
+        return impact.get_nodeids(index_file)
+
+    con = connect_coverage_data()
+    if con is None:
+        return set()
+    try:
+        context_ids = {context_id for (context_id,) in con.execute("SELECT id FROM context")}
+        return {nodeid for (nodeid, _) in get_test_contexts(con, context_ids).values()}
+    finally:
+        con.close()
+
+
 def get_diff_test_scores() -> dict[str, int]:
     """Genarate a 'score' for each test case that has some coverage of the changed files."""
-    return get_test_scores(get_diff_changed_lines(get_git_toplevel_folder(), get_git_diff_patch()))
+    return get_changed_test_scores(get_git_changed_lines())
 
 
 def get_mut_test_scores() -> dict[str, int]:
     """Genarate a 'score' for each test case that has some coverage of the mutated lines."""
-    return get_test_scores(get_mut_changed_lines())
+    return get_changed_test_scores(get_mut_changed_lines())
+
+
+def get_mut_test_order(source_file: str | Path, lineno: int, end_lineno: int | None = None) -> list[str]:
+    """Retrieve nodeids of the test cases covering a mutant, the tests most likely to catch it first.
+
+    For mutation testing tools, to order or select tests without starting pytest.
+    Uses the coverage data file and datafile locations relative to the current directory, like pytest-sort.
+    Test cases that do not cover the mutated file are not included.
+    """
+    test_scores = get_changed_test_scores(get_mutant_lines(source_file, lineno, end_lineno))
+    return sorted(test_scores, key=lambda nodeid: (test_scores[nodeid], nodeid))
@@ -0,0 +1,85 @@
+"""Duration statistics kept in each test case record.
+
+Besides the maximum setup, call and teardown durations, each record keeps a sample count,
+an exponentially weighted moving average of the total duration,
+and the most recent totals for percentiles. Adding a sample is O(1).
+
+Records of tests that failed also keep the failure count, the time of the last failure,
+and a failure rate that decays with each passing run.
+"""
+
+from __future__ import annotations
+
+import math
+
+statistics = ["max", "ewma", "p50", "p95"]
+
+# Weight of the newest sample in the moving average.
+ewma_alpha = 0.2
+
+# Number of recent totals kept for percentiles.
+sample_size = 20
+
+# Weight of the newest outcome in the failure rate.
+fail_rate_alpha = 0.3
+
+
+def add_sample(record: dict, recorded_node: dict) -> dict:
+    """Update record in place with the durations recorded in one session.
+
+    A session that recorded no durations, such as a pytest-xdist worker that crashed, only adds its outcome.
+    """
+    record["setup"] = max(record.get("setup", 0), recorded_node.get("setup", 0))
+    record["call"] = max(record.get("call", 0), recorded_node.get("call", 0))
+    record["teardown"] = max(record.get("teardown", 0), recorded_node.get("teardown", 0))
+
+    record["total"] = record["setup"] + record["call"] + record["teardown"]
+
+    add_outcome(record, recorded_node.get("failed"))
+    if not any(when in recorded_node for when in ("setup", "call", "teardown")):
+        return record
+
+    sample = recorded_node.get("setup", 0) + recorded_node.get("call", 0) + recorded_node.get("teardown", 0)
+
+    count = record.get("count", 0)
+    if count:
+        record["ewma"] = round(record["ewma"] + ewma_alpha * (sample - record["ewma"]))
+    else:
+        record["ewma"] = sample
+    record["count"] = count + 1
+
+    record["samples"] = [*record.get("samples", [])[-(sample_size - 1) :], sample]
+    return record
+
+
+def add_outcome(record: dict, failed: int | None) -> dict:
+    """Update record in place with the outcome of one session. failed is the time of the failure, if it failed.
+
+    Tests that never failed get no failure fields, keeping their records small.
+    """
+    if failed:
+        record["failures"] = record.get("failures", 0) + 1
+        record["last_failed"] = failed
+    if failed or record.get("fail_rate"):
+        fail_rate = (1 - fail_rate_alpha) * record.get("fail_rate", 0) + (fail_rate_alpha if failed else 0)
+        record["fail_rate"] = round(fail_rate, 4)
+    return record
+
+
+def percentile(samples: list[int], percent: int) -> int:
+    """Nearest rank percentile of samples."""
+    ordered = sorted(samples)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def get_statistic(record: dict, statistic: str) -> int:
+    """Retrieve the total duration of record using the specified statistic.
+
+    Records saved before these statistics existed only have the maximum, which is used for all statistics.
+    """
+    if statistic == "ewma" and "ewma" in record:
+        return record["ewma"]
+    if statistic in ("p50", "p95") and record.get("samples"):
+        return percentile(record["samples"], int(statistic[1:]))
+    return record["total"]
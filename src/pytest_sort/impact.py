@@ -0,0 +1,189 @@
+"""Persistent test impact index built from coverage data.
+
+Stores the lines each test covered in each file and phase as a numbits blob, with the paths and nodeids resolved.
+The index is stored in SQLite next to the datafile, and rebuilt only when the coverage data file changes.
+Building it costs more than scoring from the coverage data once, so by default it is only built for mutcov,
+which scores the same coverage data once per mutant.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from contextlib import closing
+from typing import TYPE_CHECKING, Any
+
+from pytest_sort import database
+from pytest_sort.database_sqlite import select_in
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable
+    from pathlib import Path
+
+# When True, the index is always used. When False, diffcov and mutcov read the coverage data directly.
+# When None, a current index is used, but it is only built for mutcov.
+enabled: bool = True
+
+index_name = ".pytest_sort_impact"
+
+# Score of a test for covering a changed file, and each changed line in run phase, or in setup or teardown phase.
+default_weights = {"file": 1, "run": 5, "other": 1}
+weights = dict(default_weights)
+
+# Indexes built with another version are rebuilt.
+VERSION = "3"
+
+# Read the index through a memory map, instead of copying pages into the SQLite page cache.
+MMAP_SIZE = 1 << 28
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE test (id INTEGER PRIMARY KEY, nodeid TEXT NOT NULL);
+CREATE TABLE file (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);
+CREATE TABLE line_bits (
+    file_id INTEGER NOT NULL,
+    test_id INTEGER NOT NULL,
+    phase TEXT NOT NULL,
+    numbits BLOB NOT NULL,
+    PRIMARY KEY (file_id, test_id, phase)
+) WITHOUT ROWID;
+"""
+
+
+def get_index_file() -> Path:
+    """Location of the index, next to the datafile."""
+    return database.database_file.with_name(index_name)
+
+
+def get_file_hash(path: Path) -> str:
+    """Calculate sha256 of file contents."""
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_file_stat(path: Path) -> dict[str, str]:
+    """Retrieve the modified time and size of file, used to detect changes without reading it."""
+    stat = path.stat()
+    return {"mtime_ns": str(stat.st_mtime_ns), "size": str(stat.st_size)}
+
+
+def _connect_read_only(index_file: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(f"{index_file.absolute().as_uri()}?mode=ro", uri=True)
+    con.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    return con
+
+
+def _read_meta(index_file: Path) -> dict[str, str]:
+    try:
+        with closing(_connect_read_only(index_file)) as con:
+            return dict(con.execute("SELECT key, value FROM meta"))
+    except sqlite3.Error:
+        return {}
+
+
+def is_current(index_file: Path, coverage_file: Path) -> bool:
+    """Determine if the index was built from the current coverage data file.
+
+    The hash is only calculated when the modified time or size changed.
+    If only those changed, they are updated in the index so the next check is fast again.
+    """
+    if not index_file.exists():
+        return False
+
+    meta = _read_meta(index_file)
+    if meta.get("version") != VERSION or meta.get("coverage_file") != str(coverage_file):
+        return False
+
+    stat = get_file_stat(coverage_file)
+    if all(meta.get(key) == value for key, value in stat.items()):
+        return True
+
+    if meta.get("sha256") != get_file_hash(coverage_file):
+        return False
+
+    with closing(sqlite3.connect(index_file)) as con, con:
+        con.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", stat.items())
+    return True
+
+
+def build_index(
+    index_file: Path,
+    coverage_file: Path,
+    coverage_numbits: Iterable[tuple[Path, str, str, bytes]],
+) -> None:
+    """Build index from (resolved_path, nodeid, when, numbits) and replace index_file with it.
+
+    Rows are inserted as they are read, so only the ids of the files and tests are kept in memory.
+    The index is written to a temporary file first, so readers never see a partial index.
+    """
+    from coverage.numbits import register_sqlite_functions  # noqa: PLC0415
+
+    meta = {"version": VERSION, "coverage_file": str(coverage_file), **get_file_stat(coverage_file)}
+    meta["sha256"] = get_file_hash(coverage_file)
+
+    test_ids: dict[str, int] = {}
+    file_ids: dict[str, int] = {}
+
+    def line_bits() -> Generator[tuple[int, int, str, bytes], Any, None]:
+        for rpath, nodeid, when, numbits in coverage_numbits:
+            yield (
+                file_ids.setdefault(str(rpath), len(file_ids) + 1),
+                test_ids.setdefault(nodeid, len(test_ids) + 1),
+                when,
+                numbits,
+            )
+
+    with database.atomic_path(index_file) as temp_path, closing(sqlite3.connect(temp_path)) as con, con:
+        register_sqlite_functions(con)
+        con.executescript(_SCHEMA)
+        con.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+        # Paths stored in the coverage data that resolve to the same file are merged
+        con.executemany(
+            "INSERT INTO line_bits VALUES (?, ?, ?, ?) ON CONFLICT (file_id, test_id, phase) "
+            "DO UPDATE SET numbits = numbits_union(numbits, excluded.numbits)",
+            line_bits(),
+        )
+        con.executemany("INSERT INTO test VALUES (?, ?)", [(value, key) for key, value in test_ids.items()])
+        con.executemany("INSERT INTO file VALUES (?, ?)", [(value, key) for key, value in file_ids.items()])
+
+
+def get_test_scores(index_file: Path, changed_lines: dict[Path, set[int]]) -> dict[str, int]:
+    """Genarate a 'score' for each test case that has some coverage of the changed lines, using the index.
+
+    Only the rows of the changed files are read, so a lookup does not depend on the size of the coverage data.
+    """
+    from coverage.numbits import nums_to_numbits  # noqa: PLC0415
+
+    test_scores: dict[int, int] = {}
+    with closing(_connect_read_only(index_file)) as con:
+        for rpath, lines in changed_lines.items():
+            row = con.execute("SELECT id FROM file WHERE path = ?", (str(rpath),)).fetchone()
+            if row is None:
+                continue
+
+            # Numbits are intersected as integers, as bit n of the little-endian integer is line n
+            changed_bits = int.from_bytes(nums_to_numbits(lines), "little")
+            query = "SELECT test_id, phase, numbits FROM line_bits WHERE file_id = ?"
+            for test_id, phase, numbits in con.execute(query, (row[0],)):
+                # If test coverage includes changed module
+                test_scores.setdefault(test_id, -weights["file"])
+                # Changed lines covered in run phase, or in setup or terminate phase
+                weight = weights["run"] if phase == "run" else weights["other"]
+                hits = bin(int.from_bytes(numbits, "little") & changed_bits).count("1")
+                test_scores[test_id] -= hits * weight
+
+        nodeids = _get_nodeids(con, list(test_scores))
+    return {nodeids[test_id]: score for test_id, score in test_scores.items()}
+
+
+def get_nodeids(index_file: Path) -> set[str]:
+    """Retrieve nodeids of all test cases in the index."""
+    with closing(_connect_read_only(index_file)) as con:
+        return {nodeid for (nodeid,) in con.execute("SELECT nodeid FROM test")}
+
+
+def _get_nodeids(con: sqlite3.Connection, test_ids: list[int]) -> dict[int, str]:
+    return dict(select_in(con, "SELECT id, nodeid FROM test WHERE id IN ({})", test_ids))
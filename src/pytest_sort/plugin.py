@@ -3,13 +3,24 @@
 from __future__ import annotations
 
 import argparse
-from typing import TYPE_CHECKING
+import time
+from typing import TYPE_CHECKING, Any
 
 import pytest
 
-from pytest_sort.config import SortConfig, bucket_types, modes
-from pytest_sort.core import print_recorded_times_report, sort_items
+from pytest_sort import profiling
+from pytest_sort.config import SortConfig, bucket_types, datafile_formats, modes
+from pytest_sort.core import (
+    load_all,
+    print_recorded_times_report,
+    select_diffcov,
+    select_shard,
+    sort_items,
+    start_loading,
+    use_loaded,
+)
 from pytest_sort.database import clear_db, update_test_cases
+from pytest_sort.durations import statistics
 
 if TYPE_CHECKING:
     from collections.abc import Generator
@@ -41,12 +52,65 @@ def pytest_addoption(parser: pytest.Parser) -> None:
     group.addoption("--sort_seed", action="store", dest="sort_seed", help=argparse.SUPPRESS)
     parser.addini("sort_seed", help=help_text)
 
+    _addoption_cov(parser, group)
+    _addoption_times(parser, group)
+
+    help_text = "Distribute buckets to pytest-xdist workers by recorded runtimes, longest first."
+    group.addoption("--sort-dist", action="store_true", dest="sort_dist", help=help_text)
+    group.addoption("--sort_dist", action="store_true", dest="sort_dist", help=argparse.SUPPRESS)
+    parser.addini("sort_dist", help=help_text, type="bool")
+
+    help_text = "Run only shard K of N, with shards balanced by recorded runtimes."
+    group.addoption("--sort-shard", action="store", dest="sort_shard", metavar="K/N", help=help_text)
+    group.addoption("--sort_shard", action="store", dest="sort_shard", help=argparse.SUPPRESS)
+    parser.addini("sort_shard", help=help_text)
+
+    help_text = "Report the time and memory used by each phase of pytest-sort."
+    group.addoption("--sort-profile", action="store_true", dest="sort_profile", help=help_text)
+    group.addoption("--sort_profile", action="store_true", dest="sort_profile", help=argparse.SUPPRESS)
+    parser.addini("sort_profile", help=help_text, type="bool")
+
+    help_text = "Also write the time and memory used by each phase of pytest-sort to this JSON file."
+    group.addoption("--sort-profile-json", action="store", dest="sort_profile_json", metavar="PATH", help=help_text)
+    group.addoption("--sort_profile_json", action="store", dest="sort_profile_json", help=argparse.SUPPRESS)
+    parser.addini("sort_profile_json", help=help_text)
+
+    group.addoption("--sort-debug", action="store_true", dest="sort_debug", help=argparse.SUPPRESS)
+    group.addoption("--sort_debug", action="store_true", dest="sort_debug", help=argparse.SUPPRESS)
+
+
+def _addoption_cov(parser: pytest.Parser, group: pytest.OptionGroup) -> None:
+    help_text = "Git ref to compare with in diffcov mode, from where HEAD branched off it. (default: the index)"
+    group.addoption("--sort-diff-base", action="store", dest="sort_diff_base", metavar="REF", help=help_text)
+    group.addoption("--sort_diff_base", action="store", dest="sort_diff_base", help=argparse.SUPPRESS)
+    parser.addini("sort_diff_base", help=help_text)
+
+    help_text = "Weights of diffcov and mutcov scores. (default: file=1,run=5,other=1)"
+    group.addoption("--sort-cov-weights", action="store", dest="sort_cov_weights", help=help_text)
+    group.addoption("--sort_cov_weights", action="store", dest="sort_cov_weights", help=argparse.SUPPRESS)
+    parser.addini("sort_cov_weights", help=help_text)
+
+    help_text = "Divide diffcov and mutcov scores by recorded runtimes, to run cheap tests covering changes first."
+    group.addoption("--sort-cov-per-second", action="store_true", dest="sort_cov_per_second", help=help_text)
+    group.addoption("--sort_cov_per_second", action="store_true", dest="sort_cov_per_second", help=argparse.SUPPRESS)
+    parser.addini("sort_cov_per_second", help=help_text, type="bool")
+
+    help_text = "Deselect tests with no coverage of the diff. Tests missing from the coverage data still run."
+    group.addoption("--sort-diffcov-select", action="store_true", dest="sort_diffcov_select", help=help_text)
+    group.addoption("--sort_diffcov_select", action="store_true", dest="sort_diffcov_select", help=argparse.SUPPRESS)
+    parser.addini("sort_diffcov_select", help=help_text, type="bool")
+
+    help_text = "Keep an index of coverage data next to the datafile for diffcov and mutcov. (default: true)"
+    parser.addini("sort_impact_index", help=help_text, type="bool", default=True)
+
+
+def _addoption_times(parser: pytest.Parser, group: pytest.OptionGroup) -> None:
     help_text = "Records runtimes. Activated by default when sort-mode=fastest"
     group.addoption("--sort-record-times", action="store_true", dest="sort_record", help=help_text)
     group.addoption("--sort_record_times", action="store_true", dest="sort_record", help=argparse.SUPPRESS)
     group.addoption("--sort-no-record-times", action="store_true", dest="sort_no_record", help=help_text)
     group.addoption("--sort_no_record_times", action="store_true", dest="sort_no_record", help=argparse.SUPPRESS)
-    parser.addini("sort_record_times", help=help_text, type="bool")
+    parser.addini("sort_record_times", help=help_text, type="bool", default=None)
 
     help_text = "Clear the recorded runtimes before sorting."
     group.addoption("--sort-reset-times", action="store_true", dest="sort_reset_times", help=help_text)
@@ -61,8 +125,11 @@ def pytest_addoption(parser: pytest.Parser) -> None:
     group.addoption("--sort_datafile", action="store", dest="sort_datafile", help=argparse.SUPPRESS)
     parser.addini("sort_datafile", help=help_text)
 
-    group.addoption("--sort-debug", action="store_true", dest="sort_debug", help=argparse.SUPPRESS)
-    group.addoption("--sort_debug", action="store_true", dest="sort_debug", help=argparse.SUPPRESS)
+    parser.addini("sort_datafile_format", help=str(datafile_formats))
+
+    group.addoption("--sort-statistic", action="store", dest="sort_statistic", help=str(statistics))
+    group.addoption("--sort_statistic", action="store", dest="sort_statistic", help=argparse.SUPPRESS)
+    parser.addini("sort_statistic", help=str(statistics))
 
 
 @pytest.hookimpl
@@ -78,6 +145,25 @@ def pytest_configure(config: pytest.Config) -> None:
         "order(item_sort_key): Always use specified Sort Key for this test item or bucket.",
     )
     SortConfig.from_pytest(config)
+    if profiling.enabled:
+        profiling.start()
+
+
+@pytest.hookimpl
+def pytest_sessionstart(session: pytest.Session) -> None:
+    """pytest_sort: Start loading data for sorting in the background, while the tests are collected.
+
+    Skipped when the recorded times are reset before sorting, and on the pytest-xdist controller, which does not sort.
+    pytest-xdist workers use the data loaded by the controller instead.
+    With --sort-profile, the data is loaded while sorting, so the profile shows the full cost of loading it.
+    """
+    if SortConfig.reset or is_xdist_controller(session.config):
+        return
+    if is_xdist_worker(session.config) and "sort_loaded" in session.config.workerinput:  # type: ignore[attr-defined]
+        use_loaded(session.config.workerinput["sort_loaded"])  # type: ignore[attr-defined]
+        return
+    if not profiling.enabled:
+        start_loading()
 
 
 @pytest.hookimpl
@@ -94,39 +180,130 @@ def pytest_report_header(config: pytest.Config) -> str:  # noqa: ARG001
 @pytest.hookimpl
 def pytest_collection_modifyitems(
     session: pytest.Session,  # noqa: ARG001
-    config: pytest.Config,  # noqa: ARG001
+    config: pytest.Config,
     items: list[pytest.Item],
 ) -> None:
-    """pytest_sort: Modify item order."""
+    """pytest_sort: Modify item order, and deselect items without coverage of the diff or of other shards."""
     if SortConfig.reset:
         clear_db()
 
     sort_items(items)
 
+    if SortConfig.diffcov_select:
+        deselected = select_diffcov(items)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+
+    if SortConfig.shard:
+        deselected = select_shard(items, SortConfig.shard)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+
+
+@pytest.hookimpl
+def pytest_report_collectionfinish(config: pytest.Config) -> str | None:  # noqa: ARG001
+    """pytest_sort: Display the number of tests deselected by --sort-diffcov-select after collection."""
+    if not SortConfig.diffcov_select:
+        return None
+    return f"pytest-sort: deselected {SortConfig.diffcov_deselected} tests with no coverage of the diff"
+
 
 @pytest.hookimpl(hookwrapper=True)  # pragma: no mutate
 def pytest_runtest_makereport(item: pytest.Item, call: pytest.CallInfo) -> Generator:
     """pytest_sort: Record test runtimes in memory."""
     if SortConfig.record and call.when in ("setup", "call", "teardown"):
-        duration = int(call.duration * 1_000_000_000)  # convert to ns
+        with profiling.phase("recording"):
+            duration = int(call.duration * 1_000_000_000)  # convert to ns
 
-        if item.nodeid not in SortConfig.recorded_times:
-            SortConfig.recorded_times[item.nodeid] = {}
+            if item.nodeid not in SortConfig.recorded_times:
+                SortConfig.recorded_times[item.nodeid] = {}
 
-        SortConfig.recorded_times[item.nodeid][call.when] = duration
+            SortConfig.recorded_times[item.nodeid][call.when] = duration
 
     yield
 
 
+@pytest.hookimpl
+def pytest_runtest_logreport(report: pytest.TestReport) -> None:
+    """pytest_sort: Record test failures in memory, with the runtimes."""
+    if SortConfig.record and report.failed:
+        SortConfig.recorded_times.setdefault(report.nodeid, {})["failed"] = int(time.time())
+
+
+def is_xdist_worker(config: pytest.Config) -> bool:
+    """Determine if this process is a pytest-xdist worker."""
+    return hasattr(config, "workerinput")
+
+
+def is_xdist_controller(config: pytest.Config) -> bool:
+    """Determine if this process is distributing tests to pytest-xdist workers."""
+    return config.pluginmanager.has_plugin("dsession")
+
+
+@pytest.hookimpl
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    """pytest_sort: Send runtimes and profile recorded by a pytest-xdist worker to the controller."""
+    if is_xdist_worker(session.config) and SortConfig.recorded_times:
+        session.config.workeroutput["sort_recorded_times"] = SortConfig.recorded_times  # type: ignore[attr-defined]
+    if is_xdist_worker(session.config) and profiling.phases:
+        session.config.workeroutput["sort_profile"] = profiling.phases  # type: ignore[attr-defined]
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node: Any) -> None:  # noqa: ANN401
+    """pytest_sort: Load data for sorting once on the controller, and send it to each pytest-xdist worker.
+
+    Workers then do not each read the datafile, run Git, and read coverage data.
+    """
+    if SortConfig.reset:
+        return
+    if SortConfig.loaded is None:
+        with profiling.phase("load"):
+            SortConfig.loaded = load_all()
+    node.workerinput["sort_loaded"] = SortConfig.loaded
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node: Any, error: Any) -> None:  # noqa: ANN401, ARG001
+    """pytest_sort: Merge runtimes and profile recorded by a pytest-xdist worker."""
+    workeroutput = getattr(node, "workeroutput", {})
+    for nodeid, recorded_node in workeroutput.get("sort_recorded_times", {}).items():
+        SortConfig.recorded_times.setdefault(nodeid, {}).update(recorded_node)
+    profiling.merge(workeroutput.get("sort_profile", {}))
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config: pytest.Config, log: Any) -> Any:  # noqa: ANN401
+    """pytest_sort: Provide scheduler for pytest-xdist when --sort-dist is used."""
+    if not SortConfig.dist:
+        return None
+
+    from pytest_sort.scheduler import SortScheduling  # noqa: PLC0415
+
+    return SortScheduling(config, log)
+
+
 @pytest.hookimpl
 def pytest_terminal_summary(
     terminalreporter: TerminalReporter,
     exitstatus: int,  # noqa: ARG001
-    config: pytest.Config,  # noqa: ARG001
+    config: pytest.Config,
 ) -> None:
-    """pytest_sort: Store recorded runtimes in database."""
-    if SortConfig.recorded_times:
-        update_test_cases(SortConfig.recorded_times)
+    """pytest_sort: Store recorded runtimes in database, and report the profile.
+
+    pytest-xdist workers leave this to the controller, so the datafile is only written once.
+    The controller reports the phases of all workers added together.
+    """
+    if SortConfig.recorded_times and not is_xdist_worker(config):
+        with profiling.phase("datafile save"):
+            update_test_cases(SortConfig.recorded_times)
 
     if SortConfig.report:
         print_recorded_times_report(terminalreporter)
+
+    if profiling.enabled and not is_xdist_worker(config):
+        terminalreporter.write_sep("-", "pytest-sort profile")
+        for line in profiling.format_report():
+            terminalreporter.write_line(line)
+        if profiling.json_file:
+            profiling.write_json(profiling.json_file)
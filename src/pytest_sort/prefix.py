@@ -0,0 +1,50 @@
+"""Prefix aggregation of values recorded per nodeid."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Any
+
+# Appended to a prefix to get an upper bound for all strings starting with that prefix.
+MAX_CHAR = "\U0010ffff"
+
+
+class PrefixIndex:
+    """Sorted index of values by nodeid.
+
+    Aggregates the values of all nodeids that start with a bucket_id in O(log n) time.
+    """
+
+    def __init__(self, values: dict[str, Any]) -> None:
+        """Sort the nodeids and build the prefix sums and range minimum tables for their values."""
+        self.nodeids = sorted(values)
+        ordered = [values[nodeid] for nodeid in self.nodeids]
+
+        self.sums = [0, *accumulate(ordered)]
+
+        # mins[level][i] is the minimum of ordered[i : i + 2**level]
+        self.mins = [ordered]
+        width = 1
+        while width * 2 <= len(ordered):
+            prev = self.mins[-1]
+            self.mins.append([min(prev[i], prev[i + width]) for i in range(len(prev) - width)])
+            width *= 2
+
+    def _range(self, prefix: str) -> tuple[int, int]:
+        start = bisect_left(self.nodeids, prefix)
+        end = bisect_left(self.nodeids, prefix + MAX_CHAR, start)
+        return (start, end)
+
+    def sum(self, prefix: str) -> Any:  # noqa: ANN401
+        """Sum of values for all nodeids starting with prefix. (0 if not found)."""
+        (start, end) = self._range(prefix)
+        return self.sums[end] - self.sums[start]
+
+    def min(self, prefix: str, default: Any = 0) -> Any:  # noqa: ANN401
+        """Minimum of values for all nodeids starting with prefix, and default."""
+        (start, end) = self._range(prefix)
+        if start == end:
+            return default
+        level = (end - start).bit_length() - 1
+        return min(self.mins[level][start], self.mins[level][end - (1 << level)], default)
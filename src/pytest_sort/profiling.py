@@ -0,0 +1,84 @@
+"""Wall time and memory of the phases of pytest_sort itself, recorded with --sort-profile."""
+
+from __future__ import annotations
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from pytest_sort import database
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+    from pathlib import Path
+
+enabled = False
+
+# Write the phases to this file as JSON at the end of the session, when set.
+json_file: Path | None = None
+
+# Map of phase name to calls, ns, memory and peak. Memory is the net change of traced memory, in bytes.
+phases: dict[str, dict[str, int]] = {}
+
+
+def start() -> None:
+    """Start tracing memory allocations, unless something else already started it."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+@contextmanager
+def phase(name: str) -> Generator[None, None, None]:
+    """Record the wall time and memory of the with block as phase name, when enabled.
+
+    Peak is the highest traced memory during the block, above the traced memory at its start.
+    Phases must not be nested, as each one resets the traced peak.
+    """
+    if not enabled:
+        yield
+        return
+
+    tracing = tracemalloc.is_tracing()
+    start_memory = 0
+    if tracing:
+        start_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        elapsed_ns = time.perf_counter_ns() - start_ns
+        (memory, peak) = tracemalloc.get_traced_memory() if tracing else (start_memory, start_memory)
+        stats = phases.setdefault(name, {"calls": 0, "ns": 0, "memory": 0, "peak": 0})
+        stats["calls"] += 1
+        stats["ns"] += elapsed_ns
+        stats["memory"] += memory - start_memory
+        stats["peak"] = max(stats["peak"], peak - start_memory)
+
+
+def merge(other_phases: dict[str, dict[str, int]]) -> None:
+    """Add phases recorded by a pytest-xdist worker."""
+    for name, other in other_phases.items():
+        stats = phases.setdefault(name, {"calls": 0, "ns": 0, "memory": 0, "peak": 0})
+        stats["calls"] += other["calls"]
+        stats["ns"] += other["ns"]
+        stats["memory"] += other["memory"]
+        stats["peak"] = max(stats["peak"], other["peak"])
+
+
+def format_report() -> list[str]:
+    """Format one line for each phase, in the order they first ran."""
+    lines = [f"{'phase':<20} {'calls':>8} {'time ms':>12} {'memory MiB':>12} {'peak MiB':>12}"]
+    for name, stats in phases.items():
+        lines.append(
+            f"{name:<20} {stats['calls']:>8} {stats['ns'] / 1_000_000:>12.3f}"
+            f" {stats['memory'] / 2**20:>12.3f} {stats['peak'] / 2**20:>12.3f}"
+        )
+    return lines
+
+
+def write_json(path: Path) -> None:
+    """Write the phases to path as JSON, for tracking them over time."""
+    database.write_atomic(path, json.dumps({"phases": phases}, indent=2) + "\n")
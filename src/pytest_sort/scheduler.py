@@ -0,0 +1,85 @@
+"""pytest-xdist scheduler that balances buckets across workers using recorded runtimes.
+
+Only imported from the pytest_xdist_make_scheduler hook, so pytest-xdist is not required otherwise.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+from xdist.scheduler import LoadScopeScheduling
+
+from pytest_sort.config import SortConfig
+from pytest_sort.core import estimate_totals
+from pytest_sort.database import get_all_totals
+
+if TYPE_CHECKING:
+    import pytest
+    from xdist.workermanage import WorkerController
+
+
+def create_bucket_id_from_nodeid(nodeid: str, bucket: str) -> str:
+    """Derive bucket id from a nodeid string, as the controller does not collect any items.
+
+    Sort markers are not available here, so only the configured bucket type is applied.
+    """
+    path = nodeid.split("[", 1)[0]
+    (module, _, rest) = path.partition("::")
+    parent = path.rsplit("::", 1)[0]
+
+    if bucket == "package":
+        return module.rpartition("/")[0]
+    if bucket == "module":
+        return module
+    if bucket == "class":
+        return f"{module}::{rest.split('::', 1)[0]}" if "::" in rest else module
+    if bucket == "parent":
+        return parent
+    if bucket == "grandparent":
+        return parent.rsplit("::", 1)[0] if "::" in parent else module.rpartition("/")[0]
+
+    # session and function buckets do not share fixtures between tests, so each test can go to any worker.
+    return nodeid
+
+
+class SortScheduling(LoadScopeScheduling):
+    """Longest processing time first scheduling of pytest-sort buckets.
+
+    Each bucket is a work unit, so tests sharing module or class scoped fixtures stay on one worker.
+    Work units are handed out by descending total runtime to whichever worker runs out of work first.
+    """
+
+    workqueue: OrderedDict[str, dict[str, bool]]
+
+    def __init__(self, config: pytest.Config, log: Any = None) -> None:  # noqa: ANN401
+        """Create scheduler using the bucket type from SortConfig."""
+        super().__init__(config, log)
+        self.bucket = SortConfig.bucket
+        self.scope_totals: dict[str, int] = {}
+        self.workqueue_sorted = False
+
+    def _split_scope(self, nodeid: str) -> str:
+        return create_bucket_id_from_nodeid(nodeid, self.bucket)
+
+    def _sort_workqueue(self) -> None:
+        if not self.scope_totals:
+            nodeids = [nodeid for work_unit in self.workqueue.values() for nodeid in work_unit]
+            item_totals = estimate_totals(nodeids, get_all_totals())
+            self.scope_totals = {
+                scope: sum(item_totals[nodeid] for nodeid in work_unit) for (scope, work_unit) in self.workqueue.items()
+            }
+
+        ordered = sorted(self.workqueue.items(), key=lambda unit: -self.scope_totals.get(unit[0], 0))
+        self.workqueue = OrderedDict(ordered)
+        self.workqueue_sorted = True
+
+    def _assign_work_unit(self, node: WorkerController) -> None:
+        if not self.workqueue_sorted:
+            self._sort_workqueue()
+        super()._assign_work_unit(node)
+
+    def remove_node(self, node: WorkerController) -> str | None:
+        """Remove node, and re-sort the work units it returns to the queue."""
+        self.workqueue_sorted = False
+        return super().remove_node(node)
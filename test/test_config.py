@@ -7,7 +7,7 @@ from unittest import mock
 import pytest
 from inspect_mate_pp import is_static_method
 
-from pytest_sort import config, database
+from pytest_sort import config, database, diffcov, impact, profiling
 
 
 class TestSortConfig:
@@ -15,9 +15,13 @@ class TestSortConfig:
     def _reset(self):
         importlib.reload(config)
         importlib.reload(database)
+        importlib.reload(impact)
+        importlib.reload(profiling)
         yield
         importlib.reload(config)
         importlib.reload(database)
+        importlib.reload(impact)
+        importlib.reload(profiling)
         sys.modules["random"] = random
 
     class PytestConfig:
@@ -38,6 +42,11 @@ class TestSortConfig:
         assert config.SortConfig.record is None
         assert config.SortConfig.reset is False
         assert config.SortConfig.report is False
+        assert config.SortConfig.dist is False
+        assert config.SortConfig.shard is None
+        assert config.SortConfig.cov_per_second is False
+        assert config.SortConfig.diffcov_select is False
+        assert config.SortConfig.diffcov_deselected == 0
 
         assert config.SortConfig.seed >= 0
         assert config.SortConfig.seed <= 1_000_000
@@ -47,8 +56,19 @@ class TestSortConfig:
         assert config.SortConfig.item_sort_keys == {}
         assert config.SortConfig.item_bucket_id == {}
         assert config.SortConfig.bucket_sort_keys == {}
+        assert config.SortConfig.bucket_item_keys == {}
+        assert config.SortConfig.bucket_index_range == {}
         assert config.SortConfig.diff_cov_scores == {}
         assert config.SortConfig.mut_cov_scores == {}
+        assert config.SortConfig.fail_rates == {}
+        assert config.SortConfig.node_marker_settings == {}
+        assert config.SortConfig.node_bucket_ids == {}
+        assert config.SortConfig.item_totals_index.nodeids == []
+        assert config.SortConfig.diff_cov_index.nodeids == []
+        assert config.SortConfig.mut_cov_index.nodeids == []
+        assert config.SortConfig.fail_rate_index.nodeids == []
+        assert config.SortConfig.loading == {}
+        assert config.SortConfig.loaded is None
 
     def test_create_default_seed(self):
         random = mock.MagicMock()
@@ -93,6 +113,7 @@ class TestSortConfig:
             ({}, {"sort_mode": "fastest"}, "fastest"),
             ({}, {"sort_mode": "diffcov"}, "diffcov"),
             ({}, {"sort_mode": "mutcov"}, "mutcov"),
+            ({}, {"sort_mode": "failfirst"}, "failfirst"),
             ({}, {"sort_mode": "none"}, "ordered"),
             ({}, {}, "ordered"),
         ],
@@ -142,6 +163,7 @@ class TestSortConfig:
             ({}, {"sort_bucket_mode": "fastest"}, "fastest"),
             ({}, {"sort_bucket_mode": "diffcov"}, "diffcov"),
             ({}, {"sort_bucket_mode": "mutcov"}, "mutcov"),
+            ({}, {"sort_bucket_mode": "failfirst"}, "failfirst"),
             ({}, {"sort_bucket_mode": "none"}, "ordered"),
             ({}, {}, "ordered"),
             ({"sort_mode": "md5"}, {"sort_bucket_mode": "sort_mode"}, "md5"),
@@ -171,6 +193,7 @@ class TestSortConfig:
             ({}, {"sort_record_times": True}, True),
             ({}, {"sort_record_times": False}, False),
             ({"sort_mode": "fastest"}, {}, True),
+            ({"sort_mode": "failfirst"}, {}, True),
         ],
     )
     def test_from_pytest_sort_record(self, getoption, getini, expected):
@@ -222,6 +245,180 @@ class TestSortConfig:
         config.SortConfig.from_pytest(pytest_config)
         assert database.database_file.absolute() == expected.absolute()
 
+    @pytest.mark.parametrize(
+        ("getini", "expected"),
+        [
+            ({}, None),
+            ({"sort_datafile_format": "json"}, "json"),
+            ({"sort_datafile_format": "sqlite"}, "sqlite"),
+        ],
+    )
+    def test_from_pytest_datafile_format(self, getini, expected):
+        pytest_config = self.PytestConfig({}, getini)
+        config.SortConfig.from_pytest(pytest_config)
+        assert database.datafile_format == expected
+
+    def test_from_pytest_datafile_format_invalid(self):
+        pytest_config = self.PytestConfig({}, {"sort_datafile_format": "xml"})
+        with pytest.raises(ValueError, match="^Invalid Value for sort_datafile_format='xml'$"):
+            config.SortConfig.from_pytest(pytest_config)
+
+    @pytest.mark.parametrize(
+        ("getoption", "getini", "expected"),
+        [
+            ({}, {}, None),
+            ({"sort_diff_base": "origin/main"}, {"sort_diff_base": "main"}, "origin/main"),
+            ({}, {"sort_diff_base": "main"}, "main"),
+        ],
+    )
+    def test_from_pytest_diff_base(self, getoption, getini, expected, monkeypatch):
+        monkeypatch.setattr(diffcov, "diff_base", "HEAD~1")
+        pytest_config = self.PytestConfig(getoption, getini)
+        config.SortConfig.from_pytest(pytest_config)
+        assert diffcov.diff_base == expected
+
+    @pytest.mark.parametrize(
+        ("getoption", "getini", "expected"),
+        [
+            ({}, {}, {"file": 1, "run": 5, "other": 1}),
+            ({}, {"sort_cov_weights": "run=10"}, {"file": 1, "run": 10, "other": 1}),
+            (
+                {"sort_cov_weights": " file = 0 , other=2,"},
+                {"sort_cov_weights": "run=10"},
+                {"file": 0, "run": 5, "other": 2},
+            ),
+        ],
+    )
+    def test_from_pytest_cov_weights(self, getoption, getini, expected, monkeypatch):
+        monkeypatch.setattr(impact, "weights", {})
+        pytest_config = self.PytestConfig(getoption, getini)
+        config.SortConfig.from_pytest(pytest_config)
+        assert impact.weights == expected
+
+    @pytest.mark.parametrize("cov_weights", ["run", "run=", "run=-1", "run=1.5", "line=1"])
+    def test_from_pytest_cov_weights_invalid(self, cov_weights):
+        pytest_config = self.PytestConfig({"sort_cov_weights": cov_weights}, {})
+        msg = f"^Invalid Value for sort-cov-weights='{cov_weights}' must be name=value for names"
+        with pytest.raises(ValueError, match=msg):
+            config.SortConfig.from_pytest(pytest_config)
+
+    @pytest.mark.parametrize(
+        ("getoption", "getini", "expected"),
+        [
+            ({}, {}, False),
+            ({"sort_cov_per_second": True}, {}, True),
+            ({}, {"sort_cov_per_second": True}, True),
+        ],
+    )
+    def test_from_pytest_cov_per_second(self, getoption, getini, expected):
+        pytest_config = self.PytestConfig(getoption, getini)
+        config.SortConfig.from_pytest(pytest_config)
+        assert config.SortConfig.cov_per_second is expected
+
+    @pytest.mark.parametrize(
+        ("getoption", "getini", "expected"),
+        [
+            ({}, {}, False),
+            ({"sort_diffcov_select": True}, {}, True),
+            ({}, {"sort_diffcov_select": True}, True),
+        ],
+    )
+    def test_from_pytest_diffcov_select(self, getoption, getini, expected):
+        pytest_config = self.PytestConfig(getoption, getini)
+        config.SortConfig.from_pytest(pytest_config)
+        assert config.SortConfig.diffcov_select is expected
+
+    def test_from_pytest_loading(self):
+        config.SortConfig.loading = {print: None}
+        config.SortConfig.loaded = {"print": None}
+        config.SortConfig.from_pytest(self.PytestConfig({}, {}))
+        assert config.SortConfig.loading == {}
+        assert config.SortConfig.loaded is None
+
+    @pytest.mark.parametrize(
+        ("getini", "expected"),
+        [
+            ({"sort_impact_index": True}, True),
+            ({"sort_impact_index": False}, False),
+        ],
+    )
+    def test_from_pytest_impact_index(self, getini, expected, monkeypatch):
+        monkeypatch.setattr(impact, "enabled", "unset")
+        pytest_config = self.PytestConfig({}, getini)
+        config.SortConfig.from_pytest(pytest_config)
+        assert impact.enabled is expected
+
+    @pytest.mark.parametrize(
+        ("getoption", "getini", "expected"),
+        [
+            ({}, {}, "max"),
+            ({"sort_statistic": "ewma"}, {"sort_statistic": "p50"}, "ewma"),
+            ({}, {"sort_statistic": "p50"}, "p50"),
+            ({}, {"sort_statistic": "p95"}, "p95"),
+        ],
+    )
+    def test_from_pytest_statistic(self, getoption, getini, expected):
+        pytest_config = self.PytestConfig(getoption, getini)
+        config.SortConfig.from_pytest(pytest_config)
+        assert database.statistic == expected
+
+    def test_from_pytest_statistic_invalid(self):
+        pytest_config = self.PytestConfig({"sort_statistic": "mean"}, {})
+        with pytest.raises(ValueError, match="^Invalid Value for sort-statistic='mean'$"):
+            config.SortConfig.from_pytest(pytest_config)
+
+    @pytest.mark.parametrize(
+        ("getoption", "getini", "expected"),
+        [
+            ({}, {}, None),
+            ({"sort_shard": "1/2"}, {"sort_shard": "3/4"}, (1, 2)),
+            ({}, {"sort_shard": "3/4"}, (3, 4)),
+            ({}, {"sort_shard": "12/12"}, (12, 12)),
+        ],
+    )
+    def test_from_pytest_shard(self, getoption, getini, expected):
+        pytest_config = self.PytestConfig(getoption, getini)
+        config.SortConfig.from_pytest(pytest_config)
+        assert config.SortConfig.shard == expected
+
+    @pytest.mark.parametrize("shard", ["0/2", "3/2", "1", "a/b", "1/2/3", "-1/2"])
+    def test_from_pytest_shard_invalid(self, shard):
+        pytest_config = self.PytestConfig({"sort_shard": shard}, {})
+        with pytest.raises(ValueError, match=r"^Invalid Value for sort-shard='.*' must be K/N with 1 <= K <= N$"):
+            config.SortConfig.from_pytest(pytest_config)
+
+    @pytest.mark.parametrize(
+        ("getoption", "getini", "expected"),
+        [
+            ({}, {}, False),
+            ({}, {"sort_dist": False}, False),
+            ({}, {"sort_dist": True}, True),
+            ({"sort_dist": True}, {}, True),
+        ],
+    )
+    def test_from_pytest_sort_dist(self, getoption, getini, expected):
+        pytest_config = self.PytestConfig(getoption, getini)
+        config.SortConfig.from_pytest(pytest_config)
+        assert config.SortConfig.dist is expected
+
+    @pytest.mark.parametrize(
+        ("getoption", "getini", "expected_enabled", "expected_json_file"),
+        [
+            ({}, {}, False, None),
+            ({}, {"sort_profile": False}, False, None),
+            ({}, {"sort_profile": True}, True, None),
+            ({"sort_profile": True}, {}, True, None),
+            ({"sort_profile_json": "profile.json"}, {}, True, Path("profile.json")),
+            ({}, {"sort_profile_json": "ini.json"}, True, Path("ini.json")),
+            ({"sort_profile_json": "profile.json"}, {"sort_profile_json": "ini.json"}, True, Path("profile.json")),
+        ],
+    )
+    def test_from_pytest_sort_profile(self, getoption, getini, expected_enabled, expected_json_file):
+        pytest_config = self.PytestConfig(getoption, getini)
+        config.SortConfig.from_pytest(pytest_config)
+        assert profiling.enabled is expected_enabled
+        assert profiling.json_file == expected_json_file
+
     @pytest.mark.parametrize(
         ("getoption", "expected"),
         [
@@ -336,6 +533,77 @@ class TestDict:
             "sort-report-times": True,
         }
 
+    def test_header_dict_dist(self):
+        config.SortConfig.dist = True
+        assert config.SortConfig.header_dict() == {
+            "sort-mode": "ordered",
+            "sort-dist": True,
+        }
+
+    def test_header_dict_statistic(self, monkeypatch):
+        monkeypatch.setattr(database, "statistic", "p95")
+        assert config.SortConfig.header_dict() == {
+            "sort-mode": "ordered",
+            "sort-statistic": "p95",
+        }
+
+    def test_header_dict_diff_base(self, monkeypatch):
+        monkeypatch.setattr(diffcov, "diff_base", "origin/main")
+        assert config.SortConfig.header_dict() == {
+            "sort-mode": "ordered",
+            "sort-diff-base": "origin/main",
+        }
+
+    def test_header_dict_cov_weights(self, monkeypatch):
+        monkeypatch.setattr(impact, "weights", {"file": 0, "run": 5, "other": 2})
+        assert config.SortConfig.header_dict() == {
+            "sort-mode": "ordered",
+            "sort-cov-weights": "file=0,run=5,other=2",
+        }
+
+    def test_header_dict_cov_per_second(self):
+        config.SortConfig.cov_per_second = True
+        assert config.SortConfig.header_dict() == {
+            "sort-mode": "ordered",
+            "sort-cov-per-second": True,
+        }
+
+    def test_header_dict_diffcov_select(self):
+        config.SortConfig.diffcov_select = True
+        assert config.SortConfig.header_dict() == {
+            "sort-mode": "ordered",
+            "sort-diffcov-select": True,
+        }
+
+    def test_header_dict_impact_index(self, monkeypatch):
+        monkeypatch.setattr(impact, "enabled", False)
+        assert config.SortConfig.header_dict() == {
+            "sort-mode": "ordered",
+            "sort-impact-index": False,
+        }
+
+    def test_header_dict_shard(self):
+        config.SortConfig.shard = (2, 12)
+        assert config.SortConfig.header_dict() == {
+            "sort-mode": "ordered",
+            "sort-shard": "2/12",
+        }
+
+    def test_header_dict_profile(self, monkeypatch):
+        monkeypatch.setattr(profiling, "enabled", True)
+        assert config.SortConfig.header_dict() == {
+            "sort-mode": "ordered",
+            "sort-profile": True,
+        }
+
+    def test_header_dict_profile_json(self, monkeypatch):
+        monkeypatch.setattr(profiling, "enabled", True)
+        monkeypatch.setattr(profiling, "json_file", Path("profile.json"))
+        assert config.SortConfig.header_dict() == {
+            "sort-mode": "ordered",
+            "sort-profile": Path("profile.json"),
+        }
+
     def test_header_dict_debug(self):
         config.SortConfig.mode = "fastest"
         config.SortConfig.bucket_mode = "fastest"
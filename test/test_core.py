@@ -1,5 +1,7 @@
 import hashlib
 import importlib
+import random
+from concurrent.futures import Future
 from functools import partial
 from typing import Callable, ClassVar
 from unittest import mock
@@ -7,7 +9,8 @@ from unittest import mock
 import pytest
 from _pytest import nodes as pytest_nodes
 
-from pytest_sort import config, core
+from pytest_sort import config, core, profiling
+from pytest_sort.prefix import PrefixIndex
 
 md5: Callable = partial(hashlib.md5, usedforsecurity=False)  # type: ignore[no-redef]
 
@@ -35,32 +38,38 @@ def mock_objects():
     session = mock.MagicMock(spec=pytest.Session)
     session.parent = None
     session.nodeid = "session"
-    session.iter_markers.return_value = []
+    session.own_markers = []
 
     package = mock.MagicMock(spec=pytest.Package)
     package.parent = session
     package.nodeid = "tests/core/__init__.py"
-    package.iter_markers.return_value = []
+    package.own_markers = []
 
     module = mock.MagicMock(spec=pytest.Module)
     module.parent = package
     module.nodeid = "tests/core/test_core.py"
-    module.iter_markers.return_value = []
+    module.own_markers = []
 
     cls = mock.MagicMock(spec=pytest.Class)
     cls.parent = module
     cls.nodeid = "tests/core/test_core.py::TestCoreStuff"
-    cls.iter_markers.return_value = []
+    cls.own_markers = []
 
     func = mock.MagicMock(spec=pytest.Function)
     func.parent = cls
     func.nodeid = "tests/core/test_core.py::TestCoreStuff::test_init"
-    func.iter_markers.return_value = []
+    func.own_markers = []
 
     return (session, package, module, cls, func)
 
 
 class TestCreateBucketIdForNode:
+    @pytest.fixture(autouse=True)
+    def _reset(self):
+        core.SortConfig.node_bucket_ids = {}
+        yield
+        core.SortConfig.node_bucket_ids = {}
+
     @pytest.mark.parametrize(
         ("node_type", "nodeid", "bucket_id"),
         [
@@ -87,6 +96,7 @@ class TestCreateBucketIdForNode:
         assert core.create_bucket_id_for_package(func) == "tests/core/"
 
         module.parent = None
+        core.SortConfig.node_bucket_ids = {}
         assert core.create_bucket_id_for_package(module) == ""
 
     def test_create_bucket_id_for_module(self, mock_objects):
@@ -99,6 +109,7 @@ class TestCreateBucketIdForNode:
         assert core.create_bucket_id_for_module(func) == "tests/core/test_core.py"
 
         cls.parent = None
+        core.SortConfig.node_bucket_ids = {}
         assert core.create_bucket_id_for_module(cls) == ""
 
     def test_create_bucket_id_for_class(self, mock_objects):
@@ -111,10 +122,65 @@ class TestCreateBucketIdForNode:
         assert core.create_bucket_id_for_class(func) == "tests/core/test_core.py::TestCoreStuff"
 
         func.parent = None
+        core.SortConfig.node_bucket_ids = {}
         assert core.create_bucket_id_for_class(func) == ""
 
 
+class TestNodeBucketIds:
+    @pytest.fixture(autouse=True)
+    def _reset(self):
+        core.SortConfig.node_bucket_ids = {}
+        yield
+        core.SortConfig.node_bucket_ids = {}
+
+    def test_get_node_bucket_ids(self, mock_objects):
+        (session, package, module, cls, func) = mock_objects
+
+        assert core.get_node_bucket_ids(func) == (
+            "tests/core/",
+            "tests/core/test_core.py",
+            "tests/core/test_core.py::TestCoreStuff",
+        )
+        assert core.SortConfig.node_bucket_ids == {
+            package: ("tests/core/", "tests/core/", "tests/core/"),
+            module: ("tests/core/", "tests/core/test_core.py", "tests/core/test_core.py"),
+            cls: ("tests/core/", "tests/core/test_core.py", "tests/core/test_core.py::TestCoreStuff"),
+            func: ("tests/core/", "tests/core/test_core.py", "tests/core/test_core.py::TestCoreStuff"),
+        }
+
+    def test_get_node_bucket_ids_none(self):
+        assert core.get_node_bucket_ids(None) == ("", "", "")
+        assert core.SortConfig.node_bucket_ids == {}
+
+    def test_get_node_bucket_ids_cached(self, mock_objects):
+        (session, package, module, cls, func) = mock_objects
+
+        core.SortConfig.node_bucket_ids[cls] = ("a", "b", "c")
+
+        assert core.get_node_bucket_ids(func) == ("a", "b", "c")
+        assert module not in core.SortConfig.node_bucket_ids
+
+    def test_create_bucket_id_siblings(self, mock_objects):
+        (session, package, module, cls, func) = mock_objects
+
+        sibling = mock.MagicMock(spec=pytest.Function)
+        sibling.parent = cls
+        sibling.nodeid = "tests/core/test_core.py::TestCoreStuff::test_other"
+
+        assert core.create_bucket_id["class"](func) == cls.nodeid
+        assert core.create_bucket_id["module"](sibling) == module.nodeid
+        assert func not in core.SortConfig.node_bucket_ids
+        assert sibling not in core.SortConfig.node_bucket_ids
+        assert cls in core.SortConfig.node_bucket_ids
+
+
 class TestCreateBucketId:
+    @pytest.fixture(autouse=True)
+    def _reset(self):
+        core.SortConfig.node_bucket_ids = {}
+        yield
+        core.SortConfig.node_bucket_ids = {}
+
     def test_create_bucket_id(self, mock_objects):
         (session, package, module, cls, func) = mock_objects
 
@@ -158,6 +224,13 @@ class TestCreateBucketId:
         core.SortConfig.mut_cov_scores = {func.nodeid: -123}
         assert core.create_item_key["mutcov"](func, 5, 20) == -123
 
+    def test_create_item_key_failfirst(self, mock_objects):
+        (session, package, module, cls, func) = mock_objects
+
+        assert core.create_item_key["failfirst"](func, 5, 20) == 0
+        core.SortConfig.fail_rates = {func.nodeid: 0.3}
+        assert core.create_item_key["failfirst"](func, 5, 20) == -0.3
+
     def test_create_bucket_key(self):
         assert core.create_bucket_key["ordered"]("tests", 5, 20) == 6
         assert core.create_bucket_key["reverse"]("tests", 5, 20) == 15
@@ -168,35 +241,53 @@ class TestCreateBucketId:
         assert 0 <= core.create_bucket_key["random"]("tests", 5, 20) < 1
 
     def test_create_bucket_key_fastest(self):
-        core.SortConfig.item_totals = {}
+        core.SortConfig.item_totals_index = PrefixIndex({})
         assert core.create_bucket_key["fastest"]("tests", 5, 20) == 0
-        core.SortConfig.item_totals = {
-            "tests/core.py": 100,
-            "tests/other/core.py": 23,
-            "test/tests/core.py": 1,
-        }
+        core.SortConfig.item_totals_index = PrefixIndex(
+            {
+                "tests/core.py": 100,
+                "tests/other/core.py": 23,
+                "test/tests/core.py": 1,
+            }
+        )
         assert core.create_bucket_key["fastest"]("tests", 5, 20) == 123
 
     def test_create_bucket_key_diffcov(self):
-        core.SortConfig.diff_cov_scores = {}
+        core.SortConfig.diff_cov_index = PrefixIndex({})
         assert core.create_bucket_key["diffcov"]("tests", 5, 20) == 0
-        core.SortConfig.diff_cov_scores = {
-            "tests/core.py": -2,
-            "tests/other/core.py": -20,
-            "test/tests/core.py": -90,
-        }
+        core.SortConfig.diff_cov_index = PrefixIndex(
+            {
+                "tests/core.py": -2,
+                "tests/other/core.py": -20,
+                "test/tests/core.py": -90,
+            }
+        )
         assert core.create_bucket_key["diffcov"]("tests", 5, 20) == -20
 
     def test_create_bucket_key_mutcov(self):
-        core.SortConfig.mut_cov_scores = {}
+        core.SortConfig.mut_cov_index = PrefixIndex({})
         assert core.create_bucket_key["mutcov"]("tests", 5, 20) == 0
-        core.SortConfig.mut_cov_scores = {
-            "tests/core.py": -2,
-            "tests/other/core.py": -20,
-            "test/tests/core.py": -90,
-        }
+        core.SortConfig.mut_cov_index = PrefixIndex(
+            {
+                "tests/core.py": -2,
+                "tests/other/core.py": -20,
+                "test/tests/core.py": -90,
+            }
+        )
         assert core.create_bucket_key["mutcov"]("tests", 5, 20) == -20
 
+    def test_create_bucket_key_failfirst(self):
+        core.SortConfig.fail_rate_index = PrefixIndex({})
+        assert core.create_bucket_key["failfirst"]("tests", 5, 20) == 0
+        core.SortConfig.fail_rate_index = PrefixIndex(
+            {
+                "tests/core.py": -0.3,
+                "tests/other/core.py": -0.51,
+                "test/tests/core.py": -0.9,
+            }
+        )
+        assert core.create_bucket_key["failfirst"]("tests", 5, 20) == -0.51
+
 
 class TestValidateMarker:
     @pytest.mark.parametrize(
@@ -262,117 +353,80 @@ class TestValidateMarker:
         assert not type_error.value.__cause__
 
 
+def mark(name, *args: object):
+    marker = mock.MagicMock(args=list(args), kwargs={})
+    marker.name = name
+    return marker
+
+
 class TestMarkerSettings:
-    def test_get_marker_settings_order_function(self, mock_objects):
+    @pytest.fixture(autouse=True)
+    def _reset(self):
+        core.SortConfig.node_marker_settings = {}
+        yield
+        core.SortConfig.node_marker_settings = {}
+
+    def test_get_own_markers(self, mock_objects):
         (session, package, module, cls, func) = mock_objects
 
-        order_1 = mock.MagicMock()
-        order_1.args = [1]
-        order_1.kwargs = {}
+        order_1 = mark("order", 1)
+        sort_ordered = mark("sort", "ordered")
+        order_2 = mark("order", 2)
+        func.own_markers = [order_1, sort_ordered, order_2]
 
-        func.iter_markers.side_effect = [[order_1], []]
+        assert core.get_own_markers(func, "order") == [order_1, order_2]
+        assert core.get_own_markers(func, "sort") == [sort_ordered]
+        assert core.get_own_markers(cls, "order") == []
 
-        assert core.get_marker_settings(func) == (None, None, None, None, 1)
+    def test_get_marker_settings_order_function(self, mock_objects):
+        (session, package, module, cls, func) = mock_objects
 
-        func.iter_markers.assert_has_calls(
-            [
-                mock.call("order"),
-                mock.call("sort"),
-            ]
-        )
+        func.own_markers = [mark("order", 1)]
+
+        assert core.get_marker_settings(func) == (None, None, None, None, 1)
 
     def test_get_marker_settings_order_cls(self, mock_objects):
         (session, package, module, cls, func) = mock_objects
 
-        order_1 = mock.MagicMock()
-        order_1.args = [1]
-        order_1.kwargs = {}
-
-        order_10 = mock.MagicMock()
-        order_10.args = [10]
-        order_10.kwargs = {}
-
-        cls.iter_markers.side_effect = [[order_10], []]
-        func.iter_markers.side_effect = [[order_1], []]
+        cls.own_markers = [mark("order", 10)]
+        func.own_markers = [mark("order", 1)]
 
         assert core.get_marker_settings(func) == (None, None, cls.nodeid, 10, 1)
 
-        func.iter_markers.assert_has_calls(
-            [
-                mock.call("order"),
-                mock.call("sort"),
-            ]
-        )
-
     def test_get_marker_settings_order_mod(self, mock_objects):
         (session, package, module, cls, func) = mock_objects
 
-        order_1 = mock.MagicMock()
-        order_1.args = [1]
-        order_1.kwargs = {}
-
-        order_10 = mock.MagicMock()
-        order_10.args = [10]
-        order_10.kwargs = {}
-
-        module.iter_markers.side_effect = [[order_10], []]
-        func.iter_markers.side_effect = [[order_1], []]
+        module.own_markers = [mark("order", 10)]
+        func.own_markers = [mark("order", 1)]
 
         assert core.get_marker_settings(func) == (None, None, module.nodeid, 10, 1)
 
-        func.iter_markers.assert_has_calls(
-            [
-                mock.call("order"),
-                mock.call("sort"),
-            ]
-        )
-
-    def test_get_marker_settings_sort_self(self, mock_objects):
+    def test_get_marker_settings_order_nested(self, mock_objects):
         (session, package, module, cls, func) = mock_objects
 
-        order_1 = mock.MagicMock()
-        order_1.args = [1]
-        order_1.kwargs = {}
+        module.own_markers = [mark("order", "my_tests")]
+        cls.own_markers = [mark("order", "test_group_1")]
+        func.own_markers = [mark("order", 1)]
 
-        order_10 = mock.MagicMock()
-        order_10.args = [10]
-        order_10.kwargs = {}
+        assert core.get_marker_settings(func) == (None, None, cls.nodeid, "test_group_1", 1)
+        assert core.get_marker_settings(cls) == (None, None, cls.nodeid, "test_group_1", None)
+        assert core.get_marker_settings(module) == (None, None, module.nodeid, "my_tests", None)
 
-        sort_ordered = mock.MagicMock()
-        sort_ordered.args = ["ordered"]
-        sort_ordered.kwargs = {}
+    def test_get_marker_settings_sort_self(self, mock_objects):
+        (session, package, module, cls, func) = mock_objects
 
-        module.iter_markers.side_effect = [[order_10], []]
-        cls.iter_markers.side_effect = [[], [sort_ordered]]
-        func.iter_markers.side_effect = [[order_1], []]
+        module.own_markers = [mark("order", 10)]
+        cls.own_markers = [mark("sort", "ordered")]
+        func.own_markers = [mark("order", 1)]
 
         assert core.get_marker_settings(func) == ("ordered", None, cls.nodeid, 10, 1)
 
-        func.iter_markers.assert_has_calls(
-            [
-                mock.call("order"),
-                mock.call("sort"),
-            ]
-        )
-
     def test_get_marker_settings_sort_bucket(self, mock_objects):
         (session, package, module, cls, func) = mock_objects
 
-        order_1 = mock.MagicMock()
-        order_1.args = [1]
-        order_1.kwargs = {}
-
-        order_10 = mock.MagicMock()
-        order_10.args = [10]
-        order_10.kwargs = {}
-
-        sort_random = mock.MagicMock()
-        sort_random.args = ["random", "parent"]
-        sort_random.kwargs = {}
-
-        module.iter_markers.side_effect = [[order_10], []]
-        cls.iter_markers.side_effect = [[], [sort_random]]
-        func.iter_markers.side_effect = [[order_1], []]
+        module.own_markers = [mark("order", 10)]
+        cls.own_markers = [mark("sort", "random", "parent")]
+        func.own_markers = [mark("order", 1)]
 
         assert core.get_marker_settings(func) == ("random", "parent", None, None, 1)
 
@@ -384,17 +438,37 @@ class TestMarkerSettings:
     def test_get_marker_settings_error(self, mock_objects):
         (session, package, module, cls, func) = mock_objects
 
-        sort_random = mock.MagicMock()
-        sort_random.args = ["random", "hello"]
-        sort_random.kwargs = {}
-
-        module.iter_markers.side_effect = [[], [sort_random]]
+        module.own_markers = [mark("sort", "random", "hello")]
 
         with pytest.raises(
             ValueError, match=f"^Invalid Value for 'bucket' on 'sort' marker: hello. Target: {module.nodeid}$"
         ):
             core.get_marker_settings(func)
 
+    def test_get_marker_settings_cached(self, mock_objects):
+        (session, package, module, cls, func) = mock_objects
+
+        cls.own_markers = [mark("order", 10)]
+
+        sibling = mock.MagicMock(spec=pytest.Function)
+        sibling.parent = cls
+        sibling.nodeid = "tests/core/test_core.py::TestCoreStuff::test_other"
+        sibling.own_markers = [mark("order", 2)]
+
+        assert core.get_marker_settings(func) == (None, None, cls.nodeid, 10, None)
+
+        cls.own_markers = [mark("order", 99)]
+
+        assert core.get_marker_settings(sibling) == (None, None, cls.nodeid, 10, 2)
+        assert core.SortConfig.node_marker_settings == {
+            session: (None, None, None, None, None),
+            package: (None, None, None, None, None),
+            module: (None, None, None, None, None),
+            cls: (None, None, cls.nodeid, 10, None),
+            func: (None, None, cls.nodeid, 10, None),
+            sibling: (None, None, cls.nodeid, 10, 2),
+        }
+
 
 class TestCreateSortKey:
     @pytest.fixture(autouse=True)
@@ -412,7 +486,10 @@ class TestCreateSortKey:
         config.SortConfig.bucket_mode = "ordered"
         (session, package, module, cls, func) = mock_objects
 
-        core.create_sort_keys(func, 6, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 6, 60)
+        core.create_bucket_sort_keys(60)
 
         get_marker_settings.assert_called_with(func)
 
@@ -426,7 +503,10 @@ class TestCreateSortKey:
         config.SortConfig.bucket_mode = "ordered"
         (session, package, module, cls, func) = mock_objects
 
-        core.create_sort_keys(func, 6, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 6, 60)
+        core.create_bucket_sort_keys(60)
 
         get_marker_settings.assert_called_with(func)
 
@@ -441,7 +521,10 @@ class TestCreateSortKey:
         config.SortConfig.bucket = "module"
         (session, package, module, cls, func) = mock_objects
 
-        core.create_sort_keys(func, 6, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 6, 60)
+        core.create_bucket_sort_keys(60)
 
         get_marker_settings.assert_called_with(func)
 
@@ -456,7 +539,10 @@ class TestCreateSortKey:
         config.SortConfig.bucket_mode = "reverse"
         (session, package, module, cls, func) = mock_objects
 
-        core.create_sort_keys(func, 6, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 6, 60)
+        core.create_bucket_sort_keys(60)
 
         assert config.SortConfig.item_sort_keys == {func.nodeid: 7}
         assert config.SortConfig.item_bucket_id == {func.nodeid: module.nodeid}
@@ -469,7 +555,10 @@ class TestCreateSortKey:
         config.SortConfig.bucket_mode = "ordered"
         (session, package, module, cls, func) = mock_objects
 
-        core.create_sort_keys(func, 6, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 6, 60)
+        core.create_bucket_sort_keys(60)
 
         assert config.SortConfig.item_sort_keys == {func.nodeid: 54}
         assert config.SortConfig.item_bucket_id == {func.nodeid: module.nodeid}
@@ -486,8 +575,12 @@ class TestCreateSortKey:
             func.nodeid: 1.1,
             func.nodeid + "_2": 1.1,
         }
+        config.SortConfig.item_totals_index = PrefixIndex(config.SortConfig.item_totals)
 
-        core.create_sort_keys(func, 6, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 6, 60)
+        core.create_bucket_sort_keys(60)
 
         assert config.SortConfig.item_sort_keys == {func.nodeid: 1.1}
         assert config.SortConfig.item_bucket_id == {func.nodeid: cls.nodeid}
@@ -500,14 +593,36 @@ class TestCreateSortKey:
         config.SortConfig.bucket_mode = "ordered"
         (session, package, module, cls, func) = mock_objects
 
-        core.create_sort_keys(func, 0, 60)
-        core.create_sort_keys(func, 1, 60)
-        core.create_sort_keys(func, 2, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 0, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 1, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 2, 60)
+        core.create_bucket_sort_keys(60)
 
+        assert config.SortConfig.bucket_index_range == {module.nodeid: (0, 2)}
         assert config.SortConfig.bucket_sort_keys == {module.nodeid: 1}
 
+    def test_min_bucket_key_reverse(self, get_marker_settings, mock_objects):
+        get_marker_settings.return_value = (None, None, None, None, None)
+        config.SortConfig.mode = "ordered"
+        config.SortConfig.bucket = "module"
+        config.SortConfig.bucket_mode = "reverse"
+        (session, package, module, cls, func) = mock_objects
+
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 0, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 1, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 2, 60)
+        core.create_bucket_sort_keys(60)
+
+        assert config.SortConfig.bucket_sort_keys == {module.nodeid: 58}
+
     @mock.patch("pytest_sort.core.md5")
-    def test_min_bucket_key_md5(self, md5, get_marker_settings, mock_objects):
+    def test_bucket_key_md5_once(self, md5, get_marker_settings, mock_objects):
         get_marker_settings.return_value = (None, None, None, None, None)
         config.SortConfig.mode = "ordered"
         config.SortConfig.bucket = "module"
@@ -516,11 +631,60 @@ class TestCreateSortKey:
 
         md5.return_value.digest.side_effect = [b"DEF", b"ABC", b"GHI"]
 
-        core.create_sort_keys(func, 0, 60)
-        core.create_sort_keys(func, 1, 60)
-        core.create_sort_keys(func, 2, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 0, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 1, 60)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 2, 60)
+        core.create_bucket_sort_keys(60)
+
+        md5.assert_called_once_with(module.nodeid.encode())
+        assert config.SortConfig.bucket_sort_keys == {module.nodeid: b"DEF"}
+
+    def test_min_bucket_key_marker(self, get_marker_settings, mock_objects):
+        config.SortConfig.mode = "ordered"
+        config.SortConfig.bucket = "module"
+        config.SortConfig.bucket_mode = "ordered"
+        (session, package, module, cls, func) = mock_objects
+
+        get_marker_settings.return_value = (None, None, None, None, None)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 4, 60)
+        get_marker_settings.return_value = (None, None, module.nodeid, 9, None)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 5, 60)
+        get_marker_settings.return_value = (None, None, module.nodeid, 3, None)
+        core.create_item_bucket_id(func)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 6, 60)
+        get_marker_settings.return_value = (None, None, "test/core", 20, None)
+        core.create_item_bucket_id(func)
+        core.create_item_sort_keys(func, 7, 60)
+        core.create_bucket_sort_keys(60)
+
+        assert config.SortConfig.bucket_index_range == {module.nodeid: (4, 4)}
+        assert config.SortConfig.bucket_item_keys == {module.nodeid: 3, "test/core": 20}
+        assert config.SortConfig.bucket_sort_keys == {module.nodeid: 3, "test/core": 20}
+
+    def test_random_draw_order(self, get_marker_settings, mock_objects):
+        config.SortConfig.mode = "random"
+        config.SortConfig.bucket = "module"
+        config.SortConfig.bucket_mode = "random"
+        (session, package, module, cls, func) = mock_objects
+        get_marker_settings.return_value = (None, None, None, None, None)
 
-        assert config.SortConfig.bucket_sort_keys == {module.nodeid: b"ABC"}
+        random.seed(42)
+        for idx in range(2):
+            core.create_item_bucket_id(func)
+            core.create_item_sort_keys(func, idx, 60)
+        core.create_bucket_sort_keys(60)
+
+        # Item and bucket keys are drawn in turn for each item
+        random.seed(42)
+        draws = [random.random() for _ in range(4)]
+        assert config.SortConfig.item_sort_keys == {func.nodeid: draws[2]}
+        assert config.SortConfig.bucket_sort_keys == {module.nodeid: min(draws[1], draws[3])}
 
     def test_get_item_sort_key(self, mock_objects):
         (session, package, module, cls, func) = mock_objects
@@ -555,6 +719,12 @@ class TestSortItems:
             get_mut_test_scores.return_value = self.node_priority
             yield get_mut_test_scores
 
+    @pytest.fixture()
+    def get_all_fail_rates(self):
+        with mock.patch("pytest_sort.core.get_all_fail_rates") as get_all_fail_rates:
+            get_all_fail_rates.return_value = self.node_priority
+            yield get_all_fail_rates
+
     @pytest.fixture()
     def get_all_totals(self):
         with mock.patch("pytest_sort.core.get_all_totals") as get_all_totals:
@@ -563,9 +733,24 @@ class TestSortItems:
 
     @pytest.fixture()
     def create_sort_keys(self):
-        with mock.patch("pytest_sort.core.create_sort_keys") as create_sort_keys:
+        with mock.patch("pytest_sort.core.create_item_sort_keys") as create_sort_keys:
             yield create_sort_keys
 
+    @pytest.fixture(autouse=True)
+    def get_marker_settings(self):
+        with mock.patch("pytest_sort.core.get_marker_settings") as get_marker_settings:
+            yield get_marker_settings
+
+    @pytest.fixture(autouse=True)
+    def create_item_bucket_id(self):
+        with mock.patch("pytest_sort.core.create_item_bucket_id") as create_item_bucket_id:
+            yield create_item_bucket_id
+
+    @pytest.fixture(autouse=True)
+    def create_bucket_sort_keys(self):
+        with mock.patch("pytest_sort.core.create_bucket_sort_keys") as create_bucket_sort_keys:
+            yield create_bucket_sort_keys
+
     @pytest.fixture()
     def get_item_sort_key(self):
         with mock.patch("pytest_sort.core.get_item_sort_key") as get_item_sort_key:
@@ -578,7 +763,16 @@ class TestSortItems:
             yield print_test_case_order
 
     def test_sort_items(
-        self, random, get_diff_test_scores, get_all_totals, create_sort_keys, get_item_sort_key, print_test_case_order
+        self,
+        random,
+        get_diff_test_scores,
+        get_all_totals,
+        get_marker_settings,
+        create_item_bucket_id,
+        create_sort_keys,
+        create_bucket_sort_keys,
+        get_item_sort_key,
+        print_test_case_order,
     ):
         core.SortConfig.mode = "ordered"
         core.SortConfig.bucket_mode = "ordered"
@@ -594,6 +788,8 @@ class TestSortItems:
         random.seed.assert_not_called()
         get_diff_test_scores.assert_not_called()
         get_all_totals.assert_not_called()
+        get_marker_settings.assert_has_calls([mock.call(item) for item in self.items])
+        create_item_bucket_id.assert_has_calls([mock.call(item) for item in self.items])
         create_sort_keys.assert_has_calls(
             [
                 mock.call(self.items[0], 0, 4),
@@ -602,7 +798,10 @@ class TestSortItems:
                 mock.call(self.items[3], 3, 4),
             ]
         )
+        create_bucket_sort_keys.assert_called_once_with(4)
         assert get_item_sort_key.call_count == 4
+        assert core.SortConfig.node_marker_settings == {}
+        assert core.SortConfig.node_bucket_ids == {}
         print_test_case_order.assert_not_called()
 
     @pytest.mark.parametrize(
@@ -639,17 +838,20 @@ class TestSortItems:
         print_test_case_order.assert_not_called()
 
     @pytest.mark.parametrize(
-        ("mode", "bucket_mode"),
+        ("mode", "bucket_mode", "diffcov_select"),
         [
-            ("diffcov", "ordered"),
-            ("ordered", "diffcov"),
-            ("diffcov", "diffcov"),
+            ("diffcov", "ordered", False),
+            ("ordered", "diffcov", False),
+            ("diffcov", "diffcov", False),
+            ("ordered", "ordered", True),
         ],
     )
     def test_sort_items_diffcov(
         self,
         mode,
         bucket_mode,
+        diffcov_select,
+        monkeypatch,
         random,
         get_diff_test_scores,
         get_all_totals,
@@ -661,12 +863,14 @@ class TestSortItems:
         core.SortConfig.bucket_mode = bucket_mode
         core.SortConfig.seed = None
         core.SortConfig.debug = False
+        monkeypatch.setattr(core.SortConfig, "diffcov_select", diffcov_select)
 
         core.sort_items(self.items.copy())
 
         random.seed.assert_not_called()
         get_diff_test_scores.assert_called()
         get_all_totals.assert_not_called()
+        assert core.SortConfig.diff_cov_index.nodeids == ["function_1", "function_2", "function_3", "function_4"]
         assert create_sort_keys.call_count == 4
         assert get_item_sort_key.call_count == 4
         print_test_case_order.assert_not_called()
@@ -700,6 +904,42 @@ class TestSortItems:
         random.seed.assert_not_called()
         get_mut_test_scores.assert_called()
         get_all_totals.assert_not_called()
+        assert core.SortConfig.mut_cov_index.nodeids == ["function_1", "function_2", "function_3", "function_4"]
+        assert create_sort_keys.call_count == 4
+        assert get_item_sort_key.call_count == 4
+        print_test_case_order.assert_not_called()
+
+    @pytest.mark.parametrize(
+        ("mode", "bucket_mode"),
+        [
+            ("failfirst", "ordered"),
+            ("ordered", "failfirst"),
+            ("failfirst", "failfirst"),
+        ],
+    )
+    def test_sort_items_failfirst(
+        self,
+        mode,
+        bucket_mode,
+        random,
+        get_all_fail_rates,
+        get_all_totals,
+        create_sort_keys,
+        get_item_sort_key,
+        print_test_case_order,
+    ):
+        core.SortConfig.mode = mode
+        core.SortConfig.bucket_mode = bucket_mode
+        core.SortConfig.seed = None
+        core.SortConfig.debug = False
+
+        core.sort_items(self.items.copy())
+
+        random.seed.assert_not_called()
+        get_all_fail_rates.assert_called()
+        get_all_totals.assert_not_called()
+        assert core.SortConfig.fail_rates == self.node_priority
+        assert core.SortConfig.fail_rate_index.nodeids == ["function_1", "function_2", "function_3", "function_4"]
         assert create_sort_keys.call_count == 4
         assert get_item_sort_key.call_count == 4
         print_test_case_order.assert_not_called()
@@ -733,19 +973,32 @@ class TestSortItems:
         random.seed.assert_not_called()
         get_diff_test_scores.assert_not_called()
         get_all_totals.assert_called_with()
+        assert core.SortConfig.item_totals_index.sum("function_") == 10
         assert create_sort_keys.call_count == 4
         assert get_item_sort_key.call_count == 4
         print_test_case_order.assert_not_called()
 
+    @mock.patch("builtins.print")
     def test_sort_items_debug(
-        self, random, get_diff_test_scores, get_all_totals, create_sort_keys, get_item_sort_key, print_test_case_order
+        self,
+        mock_print,
+        random,
+        get_diff_test_scores,
+        get_all_totals,
+        create_sort_keys,
+        get_item_sort_key,
+        print_test_case_order,
     ):
         core.SortConfig.mode = "ordered"
         core.SortConfig.bucket_mode = "ordered"
         core.SortConfig.debug = True
 
         items = self.items.copy()
-        core.sort_items(items)
+        with mock.patch("pytest_sort.core.time.perf_counter_ns") as perf_counter_ns:
+            perf_counter_ns.side_effect = [1_000_000, 3_500_000]
+            core.sort_items(items)
+
+        mock_print.assert_called_once_with("\npytest-sort: bucket ids for 4 items derived in 2.500 ms")
 
         random.seed.assert_not_called()
         get_diff_test_scores.assert_not_called()
@@ -754,6 +1007,246 @@ class TestSortItems:
         assert get_item_sort_key.call_count == 4
         print_test_case_order.assert_called_with(items)
 
+    @pytest.mark.usefixtures(
+        "random",
+        "get_diff_test_scores",
+        "get_all_totals",
+        "create_sort_keys",
+        "get_item_sort_key",
+        "print_test_case_order",
+    )
+    def test_sort_items_profile(self, monkeypatch):
+        monkeypatch.setattr(profiling, "enabled", True)
+        monkeypatch.setattr(profiling, "phases", {})
+        core.SortConfig.mode = "fastest"
+        core.SortConfig.bucket_mode = "fastest"
+        core.SortConfig.debug = False
+
+        core.sort_items(self.items.copy())
+
+        assert list(profiling.phases) == ["datafile load", "marker resolution", "bucket ids", "sort keys", "sort"]
+        assert all(phase["calls"] == 1 for phase in profiling.phases.values())
+
+
+class TestLoading:
+    @pytest.fixture(autouse=True)
+    def _reset(self, monkeypatch):
+        monkeypatch.setattr(config.SortConfig, "mode", "ordered")
+        monkeypatch.setattr(config.SortConfig, "bucket_mode", "ordered")
+        monkeypatch.setattr(config.SortConfig, "diffcov_select", False)
+        monkeypatch.setattr(config.SortConfig, "cov_per_second", False)
+        monkeypatch.setattr(config.SortConfig, "shard", None)
+        monkeypatch.setattr(config.SortConfig, "loading", {})
+
+    @pytest.mark.parametrize(
+        ("settings", "expected"),
+        [
+            ({}, []),
+            ({"mode": "diffcov"}, ["get_diff_test_scores"]),
+            ({"bucket_mode": "mutcov"}, ["get_mut_test_scores"]),
+            ({"diffcov_select": True}, ["get_diff_test_scores", "get_covered_tests"]),
+            ({"mode": "failfirst"}, ["get_all_fail_rates"]),
+            ({"bucket_mode": "fastest"}, ["get_all_totals"]),
+            ({"mode": "mutcov", "cov_per_second": True}, ["get_mut_test_scores", "get_all_totals"]),
+            ({"mode": "fastest", "cov_per_second": True}, ["get_all_totals"]),
+            ({"shard": (1, 2)}, ["get_all_totals"]),
+            ({"mode": "fastest", "shard": (1, 2)}, ["get_all_totals"]),
+        ],
+    )
+    def test_get_loaders(self, monkeypatch, settings, expected):
+        for name, value in settings.items():
+            monkeypatch.setattr(config.SortConfig, name, value)
+        assert [loader.__name__ for loader in core.get_loaders()] == expected
+
+    def test_start_loading(self):
+        loader = mock.MagicMock(return_value={"test_a": 1})
+        with mock.patch("pytest_sort.core.get_loaders", return_value=[loader]):
+            core.start_loading()
+
+        assert list(config.SortConfig.loading) == [loader]
+        assert core.load(loader) == {"test_a": 1}
+        assert core.load(loader) == {"test_a": 1}
+        loader.assert_called_once_with()
+
+    def test_start_loading_nothing(self):
+        with mock.patch("pytest_sort.core.ThreadPoolExecutor") as executor:
+            core.start_loading()
+        executor.assert_not_called()
+
+    def test_start_loading_error(self):
+        loader = mock.MagicMock(side_effect=ValueError("bad datafile"))
+        with mock.patch("pytest_sort.core.get_loaders", return_value=[loader]):
+            core.start_loading()
+
+        with pytest.raises(ValueError, match="bad datafile"):
+            core.load(loader)
+
+    def test_load_all(self):
+        loader = mock.MagicMock(__name__="get_all_totals", return_value={"test_a": 1})
+        with mock.patch("pytest_sort.core.get_loaders", return_value=[loader]):
+            assert core.load_all() == {"get_all_totals": {"test_a": 1}}
+
+    def test_use_loaded(self):
+        loaders = [
+            mock.MagicMock(__name__="get_all_totals"),
+            mock.MagicMock(__name__="get_all_fail_rates"),
+        ]
+        with mock.patch("pytest_sort.core.get_loaders", return_value=loaders):
+            core.use_loaded({"get_all_totals": {"test_a": 1}})
+
+        assert list(config.SortConfig.loading) == [loaders[0]]
+        assert core.load(loaders[0]) == {"test_a": 1}
+        loaders[0].assert_not_called()
+
+    def test_load_not_started(self):
+        loader = mock.MagicMock(return_value={"test_a": 1})
+        assert core.load(loader) == {"test_a": 1}
+        loader.assert_called_once_with()
+
+    def test_sort_items_loaded(self, monkeypatch):
+        monkeypatch.setattr(config.SortConfig, "mode", "fastest")
+        monkeypatch.setattr(config.SortConfig, "bucket_mode", "fastest")
+        monkeypatch.setattr(config.SortConfig, "debug", False)
+
+        with mock.patch("pytest_sort.core.get_all_totals", return_value={"test_a": 20}) as get_all_totals:
+            core.start_loading()
+            core.sort_items([])
+
+        get_all_totals.assert_called_once_with()
+        assert config.SortConfig.item_totals == {"test_a": 20}
+
+
+class TestWeighCovScores:
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(core.SortConfig, "cov_per_second", False)
+        scores = {"a": -10}
+        with mock.patch("pytest_sort.core.get_all_totals") as get_all_totals:
+            assert core.weigh_cov_scores(scores) is scores
+        get_all_totals.assert_not_called()
+
+    def test_per_second(self, monkeypatch):
+        monkeypatch.setattr(core.SortConfig, "cov_per_second", True)
+        totals = {"slow": 90_000_000_000, "fast": 5_000_000, "instant": 0, "other": 1_000}
+        scores = {"slow": -6, "fast": -50, "instant": -1, "unknown": -2}
+        with mock.patch("pytest_sort.core.get_all_totals", return_value=totals):
+            assert core.weigh_cov_scores(scores) == {
+                "slow": pytest.approx(-6 / 90),
+                "fast": pytest.approx(-10_000),
+                "instant": -1_000_000_000,
+                # median of the recorded totals of the scored tests
+                "unknown": pytest.approx(-2 / 0.005),
+            }
+
+
+class TestShard:
+    @pytest.mark.parametrize(
+        ("totals", "expected"),
+        [
+            ({"a": 10, "b": 20, "c": 90, "x": 1000}, {"a": 10, "b": 20, "c": 90, "d": 20}),
+            ({}, {"a": 1, "b": 1, "c": 1, "d": 1}),
+        ],
+    )
+    def test_estimate_totals(self, totals, expected):
+        assert core.estimate_totals(["a", "b", "c", "d"], totals) == expected
+
+    @pytest.mark.parametrize(
+        ("count", "expected"),
+        [
+            (1, [["e", "d", "a", "b", "c"]]),
+            (2, [["e", "b"], ["d", "a", "c"]]),
+            (3, [["e"], ["d", "c"], ["a", "b"]]),
+            (6, [["e"], ["d"], ["a"], ["b"], ["c"], []]),
+        ],
+    )
+    def test_create_shards(self, count, expected):
+        units = {"a": 3, "b": 2, "c": 1, "d": 5, "e": 8}
+        assert core.create_shards(units, count) == expected
+
+    @pytest.fixture()
+    def items(self, monkeypatch):
+        bucket_ids = {
+            "mod_a::test_1": "mod_a",
+            "mod_a::test_2": "mod_a",
+            "mod_b::test_1": "mod_b",
+            "mod_c::test_1": "mod_c",
+            "mod_c::test_2": "mod_c",
+        }
+        monkeypatch.setattr(config.SortConfig, "item_bucket_id", bucket_ids)
+        return [mock.MagicMock(nodeid=nodeid) for nodeid in bucket_ids]
+
+    @pytest.fixture()
+    def get_all_totals(self):
+        totals = {"mod_a::test_1": 10, "mod_a::test_2": 10, "mod_b::test_1": 30, "mod_c::test_1": 4}
+        with mock.patch("pytest_sort.core.get_all_totals", return_value=totals) as get_all_totals:
+            yield get_all_totals
+
+    @pytest.mark.parametrize(
+        ("shard", "selected"),
+        [
+            ((1, 2), ["mod_b::test_1"]),
+            ((2, 2), ["mod_a::test_1", "mod_a::test_2", "mod_c::test_1", "mod_c::test_2"]),
+            ((1, 1), ["mod_a::test_1", "mod_a::test_2", "mod_b::test_1", "mod_c::test_1", "mod_c::test_2"]),
+        ],
+    )
+    @pytest.mark.usefixtures("get_all_totals")
+    def test_select_shard(self, items, shard, selected):
+        all_items = list(items)
+
+        deselected = core.select_shard(items, shard)
+
+        assert [item.nodeid for item in items] == selected
+        assert [item.nodeid for item in deselected] == [item.nodeid for item in all_items if item not in items]
+
+    def test_select_shard_loaded(self, items, monkeypatch):
+        loaded: Future = Future()
+        loaded.set_result({"mod_a::test_1": 40, "mod_b::test_1": 1, "mod_c::test_1": 1})
+        with mock.patch("pytest_sort.core.get_all_totals") as get_all_totals:
+            monkeypatch.setattr(config.SortConfig, "loading", {get_all_totals: loaded})
+            core.select_shard(items, (1, 2))
+
+        get_all_totals.assert_not_called()
+        assert [item.nodeid for item in items] == ["mod_a::test_1", "mod_a::test_2"]
+
+    @pytest.mark.usefixtures("get_all_totals")
+    def test_select_shard_session_bucket(self, items):
+        config.SortConfig.item_bucket_id = dict.fromkeys(config.SortConfig.item_bucket_id, "")
+
+        core.select_shard(items, (2, 3))
+
+        assert [item.nodeid for item in items] == ["mod_a::test_1", "mod_c::test_2"]
+
+
+class TestSelectDiffcov:
+    @pytest.fixture()
+    def get_covered_tests(self):
+        covered = {"test_a.py::test_1", "test_a.py::test_2", "test_b.py::test_1", "test_old.py::test_1"}
+        with mock.patch("pytest_sort.core.get_covered_tests", return_value=covered) as get_covered_tests:
+            yield get_covered_tests
+
+    @pytest.mark.usefixtures("get_covered_tests")
+    def test_select_diffcov(self, monkeypatch):
+        monkeypatch.setattr(config.SortConfig, "diff_cov_scores", {"test_a.py::test_2": -6, "test_b.py::test_1": -1})
+        monkeypatch.setattr(config.SortConfig, "diffcov_deselected", 0)
+        nodeids = ["test_a.py::test_1", "test_a.py::test_2", "test_b.py::test_1", "test_new.py::test_1"]
+        items = [mock.MagicMock(nodeid=nodeid) for nodeid in nodeids]
+
+        deselected = core.select_diffcov(items)
+
+        assert [item.nodeid for item in items] == ["test_a.py::test_2", "test_b.py::test_1", "test_new.py::test_1"]
+        assert [item.nodeid for item in deselected] == ["test_a.py::test_1"]
+        assert config.SortConfig.diffcov_deselected == 1
+
+    def test_select_diffcov_no_coverage_data(self, monkeypatch):
+        monkeypatch.setattr(config.SortConfig, "diff_cov_scores", {})
+        monkeypatch.setattr(config.SortConfig, "diffcov_deselected", 0)
+        items = [mock.MagicMock(nodeid="test_a.py::test_1")]
+
+        with mock.patch("pytest_sort.core.get_covered_tests", return_value=set()):
+            assert core.select_diffcov(items) == []
+
+        assert len(items) == 1
+        assert config.SortConfig.diffcov_deselected == 0
+
 
 class TestPrintReports:
     @pytest.fixture()
@@ -1,5 +1,7 @@
 import importlib
 import json
+import os
+import stat
 from unittest import mock
 
 import pytest
@@ -47,6 +49,80 @@ class TestLoadSave:
         database_file.read_text.assert_called_with("utf-8")
         assert database._sort_data == test_data
 
+    def test_load_data_journal(self, database_file, test_data):
+        database_file.exists.return_value = True
+        database_file.read_text.return_value = (
+            json.dumps(test_data)
+            + "\n"
+            + json.dumps({"test/test_core.py::TestClass::test_case[A]": {"setup": 5, "call": 1}})
+            + " 1\n"
+            + json.dumps({"test/test_core.py::test_new": {"call": 7}, "test/test_core.py::TestClass::test_case[A]": {}})
+            + " 2\n"
+        )
+
+        database._load_data()
+
+        assert database._sort_data == {
+            "test/test_core.py::TestClass::test_case[A]": {
+                "setup": 5,
+                "call": 2,
+                "teardown": 3,
+                "total": 10,
+                "count": 1,
+                "ewma": 6,
+                "samples": [6],
+            },
+            "test/test_core.py::TestClass::test_case[B]": {"setup": 11, "call": 21, "teardown": 31, "total": 63},
+            "test/test_core.py::test_new": {
+                "setup": 0,
+                "call": 7,
+                "teardown": 0,
+                "total": 7,
+                "count": 1,
+                "ewma": 7,
+                "samples": [7],
+            },
+        }
+
+    def test_load_data_legacy_journal(self, database_file, test_file):
+        database_file.exists.return_value = True
+        database_file.read_text.return_value = (
+            test_file + json.dumps({"test/test_core.py::test_new": {"call": 7}}) + "\n"
+        )
+
+        database._load_data()
+
+        assert database._sort_data["test/test_core.py::test_new"]["total"] == 7
+        assert database._sort_data["test/test_core.py::TestClass::test_case[B]"]["total"] == 63
+
+    @pytest.mark.parametrize(
+        "partial", ['{"test/test_core.py::test_new": {"ca', '{"test/test_core.py::test_new": {"call": 7}']
+    )
+    def test_load_data_partial_line(self, database_file, test_data, partial):
+        database_file.exists.return_value = True
+        database_file.read_text.return_value = (
+            json.dumps(test_data)
+            + "\n"
+            + partial
+            + "\n"
+            + json.dumps({"test/test_core.py::TestClass::test_case[B]": {"call": 1}})
+            + "\n"
+            + partial
+        )
+
+        database._load_data()
+
+        assert "test/test_core.py::test_new" not in database._sort_data
+        assert database._sort_data["test/test_core.py::TestClass::test_case[B]"]["count"] == 1
+
+    def test_load_data_empty_file(self, database_file):
+        database_file.exists.return_value = True
+        database_file.read_text.return_value = " \n"
+
+        database._load_data()
+
+        assert database._sort_data == {}
+
     def test_load_data_loaded(self, database_file, test_file, test_data):
         database_file.exists.return_value = True
         database_file.read_text.return_value = test_file
@@ -66,12 +142,13 @@ class TestLoadSave:
         database_file.read_text.assert_not_called()
         assert database._sort_data == {}
 
-    def test__save_data(self, database_file, test_file, test_data):
+    def test__save_data(self, database_file, test_data):
         database._sort_data = test_data
 
-        database._save_data()
+        with mock.patch("pytest_sort.database.write_atomic") as write_atomic:
+            database._save_data()
 
-        database_file.write_text.assert_called_with(test_file, "utf-8")
+        write_atomic.assert_called_with(database_file, json.dumps(test_data) + "\n")
 
 
 class TestClearDb:
@@ -90,12 +167,7 @@ class TestClearDb:
 class TestUpdate:
     @pytest.fixture(autouse=True)
     def load_data(self, test_data):
-        def load_test_data():
-            database._sort_data = test_data
-
-        with mock.patch("pytest_sort.database._load_data") as load_data:
-            load_data.side_effect = load_test_data
-            yield load_data
+        database._sort_data = test_data
 
     @pytest.fixture()
     def save_data(self):
@@ -103,54 +175,68 @@ class TestUpdate:
             save_data.side_effect = lambda: save_data.saved(database._sort_data)
             yield save_data
 
-    def test_update_test_cases_update_less(self, save_data):
-        database.update_test_cases(
-            {
-                "test/test_core.py::TestClass::test_case[A]": {"setup": 0, "call": 1, "teardown": 2},
-            }
-        )
+    @pytest.fixture(autouse=True)
+    def append_data(self):
+        with mock.patch("pytest_sort.database._append_data") as append_data:
+            yield append_data
+
+    def test_update_test_cases_update_less(self, append_data):
+        recorded_times = {
+            "test/test_core.py::TestClass::test_case[A]": {"setup": 0, "call": 1, "teardown": 2},
+        }
+        database.update_test_cases(recorded_times)
         assert database._sort_data["test/test_core.py::TestClass::test_case[A]"] == {
             "setup": 1,
             "call": 2,
             "teardown": 3,
             "total": 6,
+            "count": 1,
+            "ewma": 3,
+            "samples": [3],
         }
-        save_data.saved.assert_called_with(database._sort_data)
+        append_data.assert_called_with(recorded_times)
 
-    def test_update_test_cases_update_equal(self, save_data):
-        database.update_test_cases(
-            {"test/test_core.py::TestClass::test_case[A]": {"setup": 1, "call": 2, "teardown": 3}}
-        )
+    def test_update_test_cases_update_equal(self, append_data):
+        recorded_times = {"test/test_core.py::TestClass::test_case[A]": {"setup": 1, "call": 2, "teardown": 3}}
+        database.update_test_cases(recorded_times)
         assert database._sort_data["test/test_core.py::TestClass::test_case[A]"] == {
             "setup": 1,
             "call": 2,
             "teardown": 3,
             "total": 6,
+            "count": 1,
+            "ewma": 6,
+            "samples": [6],
         }
-        save_data.saved.assert_called_with(database._sort_data)
-
-    def test_update_test_cases_update_greater(self, save_data):
-        database.update_test_cases(
-            {
-                "test/test_core.py::TestClass::test_case[A]": {"setup": 2, "call": 3, "teardown": 4},
-                "test/test_core.py::TestClass::test_case[B]": {"setup": 11, "call": 22, "teardown": 31},
-            }
-        )
+        append_data.assert_called_with(recorded_times)
+
+    def test_update_test_cases_update_greater(self, append_data):
+        recorded_times = {
+            "test/test_core.py::TestClass::test_case[A]": {"setup": 2, "call": 3, "teardown": 4},
+            "test/test_core.py::TestClass::test_case[B]": {"setup": 11, "call": 22, "teardown": 31},
+        }
+        database.update_test_cases(recorded_times)
         assert database._sort_data["test/test_core.py::TestClass::test_case[A]"] == {
             "setup": 2,
             "call": 3,
             "teardown": 4,
             "total": 9,
+            "count": 1,
+            "ewma": 9,
+            "samples": [9],
         }
         assert database._sort_data["test/test_core.py::TestClass::test_case[B]"] == {
             "setup": 11,
             "call": 22,
             "teardown": 31,
             "total": 64,
+            "count": 1,
+            "ewma": 64,
+            "samples": [64],
         }
-        save_data.saved.assert_called_with(database._sort_data)
+        append_data.assert_called_with(recorded_times)
 
-    def test_update_test_cases_update_defaults(self, save_data):
+    def test_update_test_cases_update_defaults(self, append_data):
         database.update_test_cases({"test/test_core.py::test_default": {}})
         assert database._sort_data["test/test_core.py::test_default"] == {
             "setup": 0,
@@ -158,9 +244,8 @@ class TestUpdate:
             "teardown": 0,
             "total": 0,
         }
-        save_data.saved.assert_called_with(database._sort_data)
+        append_data.assert_called_with({"test/test_core.py::test_default": {}})
 
-    @pytest.mark.usefixtures("save_data")
     def test_update_test_cases_update_mock(self, test_data):
         setup = mock.MagicMock()
         call = mock.MagicMock()
@@ -189,6 +274,179 @@ class TestUpdate:
         teardown.lt.assert_called_with(3)
         assert node_data["total"] == 6
 
+    def test_update_test_cases_not_loaded(self, append_data, save_data):
+        database._sort_data = {}
+        recorded_times = {"test/test_core.py::test_default": {"call": 5}}
+
+        database.update_test_cases(recorded_times)
+
+        assert database._sort_data == {}
+        append_data.assert_called_with(recorded_times)
+        save_data.assert_not_called()
+
+
+class TestDatafile:
+    @pytest.fixture(autouse=True)
+    def database_file(self, tmp_path):
+        importlib.reload(database)
+        with mock.patch("pytest_sort.database.database_file", tmp_path / ".pytest_sort_data") as database_file:
+            yield database_file
+
+    def reload(self):
+        database._sort_data = {}
+        database._load_data()
+
+    def test_round_trip(self, database_file):
+        database.update_test_cases({"test_a": {"setup": 1, "call": 2, "teardown": 3}})
+        database.update_test_cases({"test_a": {"call": 5}, "test_b": {"call": 4}})
+
+        assert len(database_file.read_text("utf-8").splitlines()) == 3
+
+        self.reload()
+        assert database.get_all_totals() == {"test_a": 9, "test_b": 4}
+
+    def test_failed_without_durations(self):
+        database.update_test_cases({"test_a": {"call": 5}})
+        database.update_test_cases({"test_a": {"failed": 1700000000}, "test_b": {"failed": 1700000000}})
+
+        self.reload()
+        assert database.get_stats("test_a")["samples"] == [5]
+        database.statistic = "p95"
+        assert database.get_all_totals() == {"test_a": 5, "test_b": 0}
+        assert database.get_all_fail_rates() == {"test_a": 0.3, "test_b": 0.3}
+
+    @pytest.mark.parametrize(
+        ("content", "written"),
+        [
+            (None, b'{}\n{"test_new": {"call": 7}} 1\n'),
+            (b"", b'{}\n{"test_new": {"call": 7}} 1\n'),
+            (b" \n", b' \n{}\n{"test_new": {"call": 7}} 1\n'),
+            (b"{}\n", b'{}\n{"test_new": {"call": 7}} 1\n'),
+            (b'{}\n{"test_a": {}} 1\n', b'{}\n{"test_a": {}} 1\n{"test_new": {"call": 7}} 2\n'),
+            (b'{}\n{"test_a": {}}\n', b'{}\n{"test_a": {}}\n{"test_new": {"call": 7}} 1\n'),
+        ],
+    )
+    def test__append_data(self, database_file, content, written):
+        if content is not None:
+            database_file.write_bytes(content)
+
+        with mock.patch("pytest_sort.database._save_data") as save_data:
+            database._append_data({"test_new": {"call": 7}})
+
+        save_data.assert_not_called()
+        assert database_file.read_bytes() == written
+
+    def test__append_data_reads_tail(self, database_file):
+        snapshot = json.dumps({f"test_{idx}": {"call": idx} for idx in range(100)}) + "\n"
+        database_file.write_text(snapshot + '{"test_a": {"call": 1}} 7\n', "utf-8")
+
+        with mock.patch("pathlib.Path.read_bytes") as read_bytes, mock.patch("pathlib.Path.read_text") as read_text:
+            database._append_data({"test_new": {"call": 7}})
+
+        read_bytes.assert_not_called()
+        read_text.assert_not_called()
+        assert database_file.read_text("utf-8").endswith('{"test_new": {"call": 7}} 8\n')
+
+    def test_compaction(self, database_file):
+        database.compact_after = 3
+        for call in range(1, 3):
+            database.update_test_cases({"test_a": {"call": call}})
+        assert len(database_file.read_text("utf-8").splitlines()) == 3
+
+        self.reload()
+        database.update_test_cases({"test_a": {"call": 10}})
+
+        assert json.loads(database_file.read_text("utf-8")) == {
+            "test_a": {
+                "setup": 0,
+                "call": 10,
+                "teardown": 0,
+                "total": 10,
+                "count": 3,
+                "ewma": 3,
+                "samples": [1, 2, 10],
+            },
+        }
+        assert len(database_file.read_text("utf-8").splitlines()) == 1
+
+        self.reload()
+        assert database.get_all_totals() == {"test_a": 10}
+
+    def test_compaction_not_loaded(self, database_file):
+        for call in range(1, 31):
+            database.update_test_cases({"test_a": {"call": call}})
+
+        assert len(database_file.read_text("utf-8").splitlines()) <= database.compact_after
+
+        self.reload()
+        assert database._sort_data["test_a"]["count"] == 30
+        assert database.get_all_totals() == {"test_a": 30}
+
+    def test_partial_line(self, database_file):
+        database.update_test_cases({"test_a": {"call": 1}})
+        with database_file.open("a", encoding="utf-8") as datafile:
+            datafile.write('{"test_a": {"ca')
+        database.update_test_cases({"test_b": {"call": 2}})
+
+        assert json.loads(database_file.read_text("utf-8")).keys() == {"test_a", "test_b"}
+
+        self.reload()
+        assert database.get_all_totals() == {"test_a": 1, "test_b": 2}
+
+    @pytest.mark.parametrize(
+        ("statistic", "expected"),
+        [
+            ("max", 1000),
+            ("ewma", 293),
+            ("p50", 100),
+            ("p95", 1000),
+        ],
+    )
+    def test_statistic(self, statistic, expected):
+        for call in (100, 200, 100, 1000):
+            database.update_test_cases({"test_a": {"call": call}})
+
+        database.statistic = statistic
+        self.reload()
+        assert database.get_all_totals() == {"test_a": expected}
+        assert database.get_bucket_total("test_") == expected
+
+    def test_write_atomic(self, database_file, tmp_path):
+        database_file.write_text("old", "utf-8")
+
+        database.write_atomic(database_file, "new")
+
+        assert database_file.read_text("utf-8") == "new"
+        assert list(tmp_path.iterdir()) == [database_file]
+
+    @pytest.mark.skipif(os.name == "nt", reason="Permission bits are not supported on Windows")
+    def test_write_atomic_keeps_mode(self, database_file):
+        database_file.write_text("old", "utf-8")
+        database_file.chmod(0o640)
+
+        database.write_atomic(database_file, "new")
+
+        assert stat.S_IMODE(database_file.stat().st_mode) == 0o640
+
+    @pytest.mark.skipif(os.name == "nt", reason="Permission bits are not supported on Windows")
+    def test_write_atomic_new_file_mode(self, database_file):
+        umask = os.umask(0o027)
+        try:
+            database.write_atomic(database_file, "new")
+        finally:
+            os.umask(umask)
+
+        assert stat.S_IMODE(database_file.stat().st_mode) == 0o640
+
+    def test_write_atomic_error(self, database_file, tmp_path):
+        database_file.write_text("old", "utf-8")
+
+        with mock.patch("os.replace", side_effect=OSError("disk full")), pytest.raises(OSError, match="disk full"):
+            database.write_atomic(database_file, "new")
+
+        assert database_file.read_text("utf-8") == "old"
+        assert list(tmp_path.iterdir()) == [database_file]
+
 
 class TestGet:
     @pytest.fixture(autouse=True)
@@ -222,3 +480,94 @@ class TestGet:
 
     def test_get_stats_not_found(self):
         assert database.get_stats("test/test_core.py::test_other") == {"setup": 0, "call": 0, "teardown": 0, "total": 0}
+
+    def test_get_all_fail_rates(self, test_data):
+        test_data["test/test_core.py::TestClass::test_case[B]"]["fail_rate"] = 0.51
+        assert database.get_all_fail_rates() == {"test/test_core.py::TestClass::test_case[B]": 0.51}
+
+
+class TestSqlite:
+    @pytest.fixture(autouse=True)
+    def database_file(self, tmp_path):
+        importlib.reload(database)
+        with mock.patch("pytest_sort.database.database_file", tmp_path / "sort.sqlite") as database_file:
+            yield database_file
+        database.database_sqlite.close()
+
+    def test_update_and_get(self):
+        database.update_test_cases({"test_a": {"setup": 1, "call": 2, "teardown": 3}})
+        database.update_test_cases({"test_a": {"call": 5}, "test_b": {"call": 4}})
+
+        assert database.get_all_totals() == {"test_a": 9, "test_b": 4}
+        assert database.get_bucket_total("test_") == 13
+        assert database.get_stats("test_a") == {
+            "setup": 1,
+            "call": 5,
+            "teardown": 3,
+            "total": 9,
+            "count": 2,
+            "ewma": 6,
+            "samples": [6, 5],
+        }
+        assert database.get_stats("test_c") == {"setup": 0, "call": 0, "teardown": 0, "total": 0}
+        assert database._sort_data == {}
+
+    def test_fail_rates(self):
+        database.update_test_cases({"test_a": {"call": 5, "failed": 1700000000}, "test_b": {"call": 4}})
+        database.update_test_cases({"test_a": {"call": 5}, "test_b": {"call": 4}})
+
+        assert database.get_all_fail_rates() == {"test_a": 0.21}
+        assert database.get_stats("test_a")["last_failed"] == 1700000000
+
+    def test_failed_without_durations(self):
+        database.update_test_cases({"test_a": {"call": 5}})
+        database.update_test_cases({"test_a": {"failed": 1700000000}, "test_b": {"failed": 1700000000}})
+
+        assert database.get_stats("test_a")["samples"] == [5]
+        assert database.get_all_totals() == {"test_a": 5, "test_b": 0}
+        database.statistic = "p95"
+        assert database.get_all_totals() == {"test_a": 5, "test_b": 0}
+        assert database.get_all_fail_rates() == {"test_a": 0.3, "test_b": 0.3}
+
+    def test_clear_db(self):
+        database.update_test_cases({"test_a": {"call": 5}})
+        database.clear_db()
+        assert database.get_all_totals() == {}
+
+    def test_datafile_format(self, tmp_path):
+        database.datafile_format = "sqlite"
+        with mock.patch("pytest_sort.database.database_file", tmp_path / ".pytest_sort_data"):
+            database.update_test_cases({"test_a": {"call": 5}})
+            assert database.get_all_totals() == {"test_a": 5}
+
+        database.datafile_format = "json"
+        assert not database._use_sqlite()
+
+    def test_import_export(self, test_data, tmp_path):
+        json_file = tmp_path / ".pytest_sort_data"
+        json_file.write_text(json.dumps(test_data) + "\n" + '{"test_c": {"call": 7}}\n', "utf-8")
+
+        database.import_data(json_file)
+        assert database.get_all_totals() == {
+            "test/test_core.py::TestClass::test_case[A]": 6,
+            "test/test_core.py::TestClass::test_case[B]": 63,
+            "test_c": 7,
+        }
+
+        json_file.unlink()
+        database.export_data(json_file)
+        exported = json.loads(json_file.read_text("utf-8"))
+        assert (
+            exported["test/test_core.py::TestClass::test_case[B]"]
+            == test_data["test/test_core.py::TestClass::test_case[B]"]
+        )
+        assert exported["test_c"]["total"] == 7
+
+        database.export_data(tmp_path / "copy.db")
+        assert database.database_sqlite.get_all_totals(tmp_path / "copy.db") == database.get_all_totals()
+
+    def test_import_into_json(self, test_data, tmp_path):
+        database.database_sqlite.save_records(tmp_path / "sort.sqlite", test_data)
+        with mock.patch("pytest_sort.database.database_file", tmp_path / ".pytest_sort_data") as json_file:
+            database.import_data(tmp_path / "sort.sqlite")
+            assert json.loads(json_file.read_text("utf-8")) == test_data
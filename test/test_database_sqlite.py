@@ -0,0 +1,145 @@
+import sqlite3
+
+import pytest
+
+from pytest_sort import database_sqlite
+
+
+@pytest.fixture(autouse=True)
+def database_file(tmp_path):
+    yield tmp_path / "sort.sqlite"
+    database_sqlite.close()
+
+
+@pytest.fixture()
+def test_data():
+    return {
+        "test/test_core.py::TestClass::test_case[A]": {"setup": 1, "call": 2, "teardown": 3, "total": 6},
+        "test/test_core.py::TestClass::test_case[B]": {"setup": 11, "call": 21, "teardown": 31, "total": 63},
+        "test/test_core.py::test_case": {"setup": 0, "call": 100, "teardown": 0, "total": 100},
+    }
+
+
+@pytest.fixture()
+def saved(database_file, test_data):
+    database_sqlite.save_records(database_file, test_data)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 500])
+def test_select_in(monkeypatch, chunk_size):
+    monkeypatch.setattr(database_sqlite, "CHUNK_SIZE", chunk_size)
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE t (a INTEGER, b INTEGER)")
+    con.executemany("INSERT INTO t VALUES (?, ?)", [(1, 10), (1, 11), (1, 12), (2, 11)])
+
+    rows = database_sqlite.select_in(con, "SELECT b FROM t WHERE a = ? AND b IN ({})", [10, 11, 12], (1,))
+
+    assert sorted(rows) == [(10,), (11,), (12,)]
+    assert list(database_sqlite.select_in(con, "SELECT b FROM t WHERE b IN ({})", [])) == []
+
+
+@pytest.mark.usefixtures("saved")
+class TestGet:
+    def test_get_records(self, database_file, test_data):
+        nodeid = "test/test_core.py::TestClass::test_case[A]"
+        assert database_sqlite.get_records(database_file, [nodeid, "not_found"]) == {nodeid: test_data[nodeid]}
+
+    def test_get_records_chunked(self, database_file, test_data, monkeypatch):
+        monkeypatch.setattr(database_sqlite, "CHUNK_SIZE", 2)
+        assert database_sqlite.get_records(database_file, list(test_data)) == test_data
+
+    def test_get_all_records(self, database_file, test_data):
+        assert database_sqlite.get_all_records(database_file) == test_data
+
+    def test_get_all_totals(self, database_file):
+        assert database_sqlite.get_all_totals(database_file) == {
+            "test/test_core.py::TestClass::test_case[A]": 6,
+            "test/test_core.py::TestClass::test_case[B]": 63,
+            "test/test_core.py::test_case": 100,
+        }
+
+    @pytest.mark.parametrize(
+        ("bucket_id", "expected"),
+        [
+            ("test/test_core.py::TestClass", 69),
+            ("test/test_core.py", 169),
+            ("test/test_core.py::test_case", 100),
+            ("test/test_config.py", 0),
+        ],
+    )
+    def test_get_bucket_total(self, database_file, bucket_id, expected):
+        assert database_sqlite.get_bucket_total(database_file, bucket_id) == expected
+
+    def test_get_record(self, database_file, test_data):
+        nodeid = "test/test_core.py::test_case"
+        assert database_sqlite.get_record(database_file, nodeid) == test_data[nodeid]
+        assert database_sqlite.get_record(database_file, "not_found") is None
+
+
+@pytest.mark.usefixtures("saved")
+class TestSave:
+    def test_save_records_replace(self, database_file):
+        nodeid = "test/test_core.py::test_case"
+        database_sqlite.save_records(database_file, {nodeid: {"setup": 0, "call": 1, "teardown": 0, "total": 1}})
+        assert database_sqlite.get_all_totals(database_file)[nodeid] == 1
+
+    def test_clear(self, database_file):
+        database_sqlite.clear(database_file)
+        assert database_sqlite.get_all_records(database_file) == {}
+
+    def test_persisted(self, database_file, test_data):
+        database_sqlite.close()
+        assert database_sqlite.get_all_records(database_file) == test_data
+
+    def test_connect_other_file(self, tmp_path):
+        assert database_sqlite.get_all_records(tmp_path / "other.db") == {}
+        assert database_sqlite._connection_path == tmp_path / "other.db"
+
+
+class TestStatistic:
+    @pytest.fixture(autouse=True)
+    def saved(self, database_file):
+        records = {
+            "mod_a::test_1": {"total": 100, "ewma": 40, "samples": [10, 20, 100]},
+            "mod_a::test_2": {"total": 10},
+        }
+        database_sqlite.save_records(database_file, records)
+
+    @pytest.mark.parametrize(
+        ("statistic", "expected"),
+        [
+            ("max", {"mod_a::test_1": 100, "mod_a::test_2": 10}),
+            ("ewma", {"mod_a::test_1": 40, "mod_a::test_2": 10}),
+            ("p50", {"mod_a::test_1": 20, "mod_a::test_2": 10}),
+            ("p95", {"mod_a::test_1": 100, "mod_a::test_2": 10}),
+        ],
+    )
+    def test_get_all_totals(self, database_file, statistic, expected):
+        assert database_sqlite.get_all_totals(database_file, statistic) == expected
+        assert database_sqlite.get_bucket_total(database_file, "mod_a", statistic) == sum(expected.values())
+
+
+def test_add_statistic_columns(database_file):
+    con = sqlite3.connect(database_file)
+    con.execute("CREATE TABLE test_data (nodeid TEXT PRIMARY KEY, total INTEGER NOT NULL, record TEXT NOT NULL)")
+    con.execute("""INSERT INTO test_data VALUES ('test_a', 6, '{"total": 6}')""")
+    con.commit()
+    con.close()
+
+    assert database_sqlite.get_all_totals(database_file, "p95") == {"test_a": 6}
+
+    database_sqlite.save_records(database_file, {"test_b": {"total": 9, "samples": [1, 9]}})
+    assert database_sqlite.get_all_totals(database_file, "p50") == {"test_a": 6, "test_b": 1}
+    assert database_sqlite.get_all_fail_rates(database_file) == {}
+
+
+def test_get_all_fail_rates(database_file):
+    database_sqlite.save_records(
+        database_file,
+        {
+            "test_a": {"total": 1, "fail_rate": 0.3, "failures": 1, "last_failed": 1700000000},
+            "test_b": {"total": 1, "fail_rate": 0.0, "failures": 1, "last_failed": 1600000000},
+            "test_c": {"total": 1},
+        },
+    )
+    assert database_sqlite.get_all_fail_rates(database_file) == {"test_a": 0.3}
@@ -1,11 +1,17 @@
 import importlib
+import json
+import shutil
+import sqlite3
+import subprocess
 from pathlib import Path
+from subprocess import CalledProcessError
 from unittest import mock
 
 import pytest
-from whatthepatch import patch as wtp
+from coverage.numbits import nums_to_numbits
+from coverage.sqldata import CoverageData
 
-from pytest_sort import diffcov
+from pytest_sort import database_sqlite, diffcov, impact
 
 
 class TestParseTestContext:
@@ -62,11 +68,34 @@ class TestGitPatch:
             yield subprocess
 
     @pytest.fixture()
-    def whatthepatch(self):
-        with mock.patch("pytest_sort.diffcov.whatthepatch") as whatthepatch:
-            yield whatthepatch
+    def git_env(self, monkeypatch):
+        monkeypatch.delenv("GIT_DIR", raising=False)
+        monkeypatch.delenv("GIT_WORK_TREE", raising=False)
+
+    @pytest.mark.usefixtures("git_env")
+    def test_get_git_toplevel_folder(self, subprocess, tmp_path, monkeypatch):
+        (tmp_path / ".git").mkdir()
+        (tmp_path / "src" / "pkg").mkdir(parents=True)
+        monkeypatch.chdir(tmp_path / "src" / "pkg")
+
+        assert diffcov.get_git_toplevel_folder() == str(tmp_path)
+        subprocess.run.assert_not_called()
+
+    @pytest.mark.usefixtures("git_env")
+    def test_get_git_toplevel_folder_worktree(self, subprocess, tmp_path, monkeypatch):
+        (tmp_path / ".git").write_text("gitdir: ../main/.git/worktrees/branch")
+        monkeypatch.chdir(tmp_path)
+
+        assert diffcov.get_git_toplevel_folder() == str(tmp_path)
+        subprocess.run.assert_not_called()
+
+    @pytest.mark.parametrize("env", ["GIT_DIR", "GIT_WORK_TREE"])
+    @pytest.mark.usefixtures("git_env")
+    def test_get_git_toplevel_folder_env(self, subprocess, tmp_path, monkeypatch, env):
+        (tmp_path / ".git").mkdir()
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv(env, "somewhere")
 
-    def test_get_git_toplevel_folder(self, subprocess):
         out = diffcov.get_git_toplevel_folder()
 
         subprocess.run.assert_called_with(["git", "rev-parse", "--show-toplevel"], capture_output=True, check=True)
@@ -74,91 +103,296 @@ class TestGitPatch:
 
         assert output.stdout.decode.return_value.strip.return_value == out
 
-    def test_get_git_diff_patch(self, subprocess):
-        out = diffcov.get_git_diff_patch()
+    def test_get_git_diff_lines(self, subprocess):
+        process = subprocess.Popen.return_value.__enter__.return_value
+        process.stdout = [b"diff --git a/x.py b/x.py\n", b"+ caf\xc3\xa9\n"]
+        process.returncode = 0
 
-        subprocess.run.assert_called_with(["git", "diff", "-U0"], capture_output=True, check=True)
-        output = subprocess.run.return_value
+        assert list(diffcov.get_git_diff_lines()) == ["diff --git a/x.py b/x.py\n", "+ caf\u00e9\n"]
+
+        subprocess.Popen.assert_called_with(["git", "diff", "-U0"], stdout=subprocess.PIPE, stderr=mock.ANY)
+
+    def test_get_git_diff_lines_base(self, subprocess):
+        process = subprocess.Popen.return_value.__enter__.return_value
+        process.stdout = []
+        process.returncode = 0
+
+        assert list(diffcov.get_git_diff_lines("abc123")) == []
+
+        subprocess.Popen.assert_called_with(["git", "diff", "-U0", "abc123"], stdout=subprocess.PIPE, stderr=mock.ANY)
+
+    def test_get_git_merge_base(self, subprocess):
+        subprocess.run.return_value.stdout = b"abc123\n"
+
+        assert diffcov.get_git_merge_base("origin/main") == "abc123"
+
+        subprocess.run.assert_called_with(["git", "merge-base", "origin/main", "HEAD"], capture_output=True, check=True)
 
-        assert output.stdout.decode.return_value == out
+    def test_get_git_diff_lines_error(self, subprocess):
+        subprocess.CalledProcessError = CalledProcessError
+        process = subprocess.Popen.return_value.__enter__.return_value
+        process.stdout = []
+        process.returncode = 128
+
+        def popen(_command, stdout, stderr):  # noqa: ARG001
+            stderr.write(b"fatal: not a git repository")
+            return mock.DEFAULT
+
+        subprocess.Popen.side_effect = popen
+
+        with pytest.raises(CalledProcessError) as exc_info:
+            list(diffcov.get_git_diff_lines())
+
+        assert exc_info.value.returncode == 128
+        assert exc_info.value.stderr == b"fatal: not a git repository"
+
+    @pytest.mark.parametrize(
+        ("path", "expected"),
+        [
+            ("a/module1.py", "a/module1.py"),
+            ('"a/\\303\\251.py"', "a/\u00e9.py"),
+            ('"a/tab\\there \\"quoted\\" back\\\\slash.py"', 'a/tab\there "quoted" back\\slash.py'),
+            ('"', '"'),
+        ],
+    )
+    def test_unquote_git_path(self, path, expected):
+        assert diffcov.unquote_git_path(path) == expected
 
     def test_get_diff_changed_lines(self):
-        assert diffcov.get_diff_changed_lines("C:/dev", GIT_DIFF) == {
+        assert diffcov.get_diff_changed_lines("C:/dev", GIT_DIFF.splitlines(keepends=True)) == {
             Path("C:/dev/pytest_sort/module1.py").resolve(): {20, 24, 30}
         }
 
-    def test_get_diff_changed_lines_mock(self, whatthepatch):
-        whatthepatch.parse_patch.return_value = [
-            wtp.diffobj(
-                header=wtp.header(
-                    old_path="pytest_sort/module1.py",
-                    index_path=None,
-                    old_version=None,
-                    new_path="",
-                    new_version=None,
-                ),
-                changes=[
-                    wtp.Change(old=2, new=2, line=None, hunk=0),
-                    wtp.Change(old=3, new=None, line=None, hunk=0),
-                    wtp.Change(old=None, new=4, line=None, hunk=0),
-                    wtp.Change(old=None, new=None, line=None, hunk=0),
-                ],
-                text="",
-            ),
-            wtp.diffobj(
-                header=wtp.header(
-                    old_path="pytest_sort/module2.py",
-                    index_path=None,
-                    old_version=None,
-                    new_path="",
-                    new_version=None,
-                ),
-                changes=[
-                    wtp.Change(old=20, new=2, line=None, hunk=0),
-                ],
-                text="",
-            ),
+    def test_get_diff_changed_lines_files(self):
+        git_diff = [
+            "diff --git a/module1.py b/module1.py\n",
+            "index 404ce22..5f2ed85 100644\n",
+            "--- a/module1.py\n",
+            "+++ b/module1.py\n",
+            "@@ -2,3 +2,2 @@ def function():\n",
+            "--- a/not_a_header.py\n",
+            "-    pass\n",
+            "-    pass\n",
+            "+    return\n",
+            "+    return\n",
+            "@@ -10,0 +9,2 @@\n",
+            "+\n",
+            "+\n",
+            "\\ No newline at end of file\n",
+            "diff --git a/new.py b/new.py\n",
+            "new file mode 100644\n",
+            "--- /dev/null\n",
+            "+++ b/new.py\n",
+            "@@ -0,0 +1 @@\n",
+            "+print()\n",
+            "diff --git a/deleted.py b/deleted.py\n",
+            "deleted file mode 100644\n",
+            "--- a/deleted.py\n",
+            "+++ /dev/null\n",
+            "@@ -1,2 +0,0 @@\n",
+            "-print()\n",
+            "-print()\n",
+            "diff --git a/image.png b/image.png\n",
+            "Binary files a/image.png and b/image.png differ\n",
+            "diff --git a/script.sh b/script.sh\n",
+            "old mode 100644\n",
+            "new mode 100755\n",
         ]
 
-        assert diffcov.get_diff_changed_lines("C:/dev", GIT_DIFF) == {
-            Path("C:/dev/pytest_sort/module1.py").resolve(): {0, 2, 3, 4},
-            Path("C:/dev/pytest_sort/module2.py").resolve(): {20},
+        assert diffcov.get_diff_changed_lines("C:/dev", git_diff) == {
+            Path("C:/dev/module1.py").resolve(): {2, 3, 4, 10},
+            Path("C:/dev/new.py").resolve(): {1},
+            Path("C:/dev/deleted.py").resolve(): {1, 2},
         }
 
-        whatthepatch.parse_patch.assert_called_with(GIT_DIFF)
-
-    def test_get_diff_changed_lines_no_header(self, whatthepatch):
-        whatthepatch.parse_patch.return_value = [
-            wtp.diffobj(
-                header=None,
-                changes=[
-                    wtp.Change(old=2, new=2, line=None, hunk=0),
-                    wtp.Change(old=3, new=None, line=None, hunk=0),
-                    wtp.Change(old=None, new=4, line=None, hunk=0),
-                    wtp.Change(old=None, new=None, line=None, hunk=0),
-                ],
-                text="",
-            ),
+    def test_get_diff_changed_lines_moved(self):
+        git_diff = [
+            "diff --git a/module1.py b/module1.py\n",
+            "--- a/module1.py\n",
+            "+++ b/module1.py\n",
+            "@@ -3,0 +4,5 @@\n",
+            "@@ -40 +45 @@\n",
+            "@@ -50,2 +54,0 @@\n",
         ]
 
-        assert diffcov.get_diff_changed_lines("C:/dev", GIT_DIFF) == {}
-
-    def test_get_diff_changed_lines_no_changes(self, whatthepatch):
-        whatthepatch.parse_patch.return_value = [
-            wtp.diffobj(
-                header=wtp.header(
-                    old_path="pytest_sort/module1.py",
-                    index_path=None,
-                    old_version=None,
-                    new_path="",
-                    new_version=None,
-                ),
-                changes=None,
-                text="",
-            )
-        ]
+        # Line numbers coverage recorded before the changes: after line 3, line 40, and lines 50, 51
+        assert diffcov.get_diff_changed_lines("C:/dev", git_diff) == {
+            Path("C:/dev/module1.py").resolve(): {3, 40, 49, 50, 51},
+        }
+
+    def test_get_diff_hunks(self):
+        assert diffcov.get_diff_hunks("C:/dev", GIT_DIFF.splitlines(keepends=True)) == {
+            Path("C:/dev/pytest_sort/module1.py").resolve(): [(20, 1, 20, 1), (24, 1, 24, 0), (30, 0, 30, 1)]
+        }
+
+    def test_get_diff_changed_lines_no_header(self):
+        assert diffcov.get_diff_changed_lines("C:/dev", ["@@ -1 +1 @@\n", "-a\n", "+b\n"]) == {}
+
+    def test_get_diff_changed_lines_empty(self):
+        assert diffcov.get_diff_changed_lines("C:/dev", []) == {}
+
+
+class TestLineOffsetMap:
+    @pytest.fixture()
+    def offset_map(self):
+        # Insert 2 lines after line 3, replace lines 10-11 with 3 lines, delete lines 20-23
+        return diffcov.LineOffsetMap([(10, 2, 12, 3), (3, 0, 4, 2), (20, 4, 22, 0)])
+
+    @pytest.mark.parametrize(
+        ("lineno", "expected"),
+        [
+            (1, 1),
+            (2, 2),
+            (3, 4),
+            (4, 6),
+            (9, 11),
+            (10, 12),
+            (11, 12),
+            (12, 15),
+            (19, 22),
+            (20, 22),
+            (23, 22),
+            (24, 23),
+            (100, 99),
+        ],
+    )
+    def test_translate(self, offset_map, lineno, expected):
+        assert offset_map.translate(lineno) == expected
+
+    def test_no_hunks(self):
+        offset_map = diffcov.LineOffsetMap([])
+        assert offset_map.translate(10) == 10
+        assert offset_map.changed_lines() == set()
+        assert offset_map.original_lines({10}) == {10}
+
+    def test_changed_lines(self, offset_map):
+        assert offset_map.changed_lines() == {4, 5, 12, 13, 14, 22}
+
+    def test_original_lines(self, offset_map):
+        assert offset_map.original_lines(offset_map.changed_lines()) == {3, 10, 11, 19, 20, 21, 22, 23}
+
+    def test_original_lines_unchanged(self, offset_map):
+        assert offset_map.original_lines({1, 6, 11, 15, 23, 99}) == {1, 4, 9, 12, 24, 100}
+
+    def test_original_lines_consistent(self, offset_map):
+        for lineno in range(1, 100):
+            assert lineno in offset_map.original_lines({offset_map.translate(lineno)})
+
+    def test_insert_at_top(self):
+        offset_map = diffcov.LineOffsetMap([(0, 0, 1, 2)])
+        assert offset_map.changed_lines() == {1, 2}
+        assert offset_map.original_lines({1, 2}) == {1}
+        assert offset_map.translate(2) == 4
+
+    def test_delete_at_top(self):
+        offset_map = diffcov.LineOffsetMap([(1, 2, 0, 0)])
+        assert offset_map.original_lines(offset_map.changed_lines()) == {1, 2}
+        assert offset_map.translate(3) == 1
+
+
+def git(*args: str):
+    return subprocess.run(["git", *args], capture_output=True, check=True).stdout.decode().strip()  # noqa: S603, S607
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+class TestGitChangedLines:
+    @pytest.fixture()
+    def repo(self, tmp_path, monkeypatch):
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        monkeypatch.chdir(repo)
+        monkeypatch.delenv("GIT_DIR", raising=False)
+        monkeypatch.delenv("GIT_WORK_TREE", raising=False)
+        monkeypatch.setattr(diffcov, "diff_base", None)
+        git("init", "-q")
+        git("config", "user.email", "dev@example.com")
+        git("config", "user.name", "dev")
+        (repo / "module1.py").write_text("a\nb\nc\n")
+        git("add", "module1.py")
+        git("commit", "-q", "-m", "one")
+        git("branch", "base")
+        (repo / "module1.py").write_text("a\nB\nc\nd\n")
+        git("commit", "-q", "-a", "-m", "two")
+        (repo / "module1.py").write_text("A\nB\nc\nd\n")
+        return repo.resolve()
+
+    def test_get_git_changed_lines(self, repo):
+        with mock.patch("pytest_sort.diffcov.get_git_state") as get_git_state:
+            assert diffcov.get_git_changed_lines() == {repo / "module1.py": {1}}
+        get_git_state.assert_not_called()
+        assert not (repo.parent / ".pytest_sort_diff").exists()
+
+    def test_get_git_changed_lines_quoted_path(self, repo):
+        (repo / "caf\u00e9.py").write_text("a\n")
+        git("add", "caf\u00e9.py")
+        git("commit", "-q", "-m", "three")
+        (repo / "caf\u00e9.py").write_text("A\n")
+
+        assert diffcov.get_git_changed_lines() == {repo / "module1.py": {1}, repo / "caf\u00e9.py": {1}}
+
+    def test_get_git_changed_lines_base(self, repo, monkeypatch):
+        monkeypatch.setattr(diffcov, "diff_base", "base")
+        assert diffcov.get_git_changed_lines() == {repo / "module1.py": {1, 2, 3}}
+        assert json.loads((repo.parent / ".pytest_sort_diff").read_text())["changed_lines"] == {
+            str(repo / "module1.py"): [1, 2, 3]
+        }
+
+    def test_get_git_changed_lines_cached(self, repo, monkeypatch):
+        monkeypatch.setattr(diffcov, "diff_base", "base")
+        diffcov.get_git_changed_lines()
+        with mock.patch("pytest_sort.diffcov.get_git_diff_lines") as get_git_diff_lines:
+            assert diffcov.get_git_changed_lines() == {repo / "module1.py": {1, 2, 3}}
+        get_git_diff_lines.assert_not_called()
+
+    def test_get_git_state(self, repo, monkeypatch):
+        state = diffcov.get_git_state(str(repo))
+        assert state == diffcov.get_git_state(str(repo))
+
+        monkeypatch.setattr(diffcov, "diff_base", "base")
+        assert diffcov.get_git_state(str(repo)) not in (None, state)
+
+    def test_get_git_state_edited(self, repo):
+        state = diffcov.get_git_state(str(repo))
+        (repo / "module1.py").write_text("A\nB\nC\nd\n")
+        assert diffcov.get_git_state(str(repo)) not in (None, state)
+
+    def test_get_git_state_staged(self, repo):
+        state = diffcov.get_git_state(str(repo))
+        git("add", "module1.py")
+        assert diffcov.get_git_state(str(repo)) not in (None, state)
+
+    def test_get_git_state_renamed(self, repo):
+        git("mv", "module1.py", "module2.py")
+        assert diffcov.get_git_state(str(repo)) is not None
+
+    def test_get_git_state_committed(self, repo):
+        state = diffcov.get_git_state(str(repo))
+        git("commit", "-q", "-a", "-m", "three")
+        assert diffcov.get_git_state(str(repo)) not in (None, state)
+
+    def test_get_git_state_error(self, repo, monkeypatch):
+        monkeypatch.setattr(diffcov, "diff_base", "no-such-ref")
+        assert diffcov.get_git_state(str(repo)) is None
+
+    def test_get_git_changed_lines_no_state(self, repo, monkeypatch):
+        monkeypatch.setattr(diffcov, "diff_base", "base")
+        with mock.patch("pytest_sort.diffcov.get_git_state", return_value=None):
+            assert diffcov.get_git_changed_lines() == {repo / "module1.py": {1, 2, 3}}
+        assert not (repo.parent / ".pytest_sort_diff").exists()
+
 
-        assert diffcov.get_diff_changed_lines("C:/dev", GIT_DIFF) == {}
+class TestChangedLinesCache:
+    def test_write_read(self):
+        diffcov.write_changed_lines_cache("state1", {Path("/src/module1.py"): {3, 1}})
+        assert diffcov.read_changed_lines_cache("state1") == {Path("/src/module1.py"): {1, 3}}
+        assert diffcov.read_changed_lines_cache("state2") is None
+
+    def test_read_missing(self):
+        assert diffcov.read_changed_lines_cache("state1") is None
+
+    def test_read_invalid(self):
+        diffcov.get_cache_file().write_text("{")
+        assert diffcov.read_changed_lines_cache("state1") is None
 
 
 class TestMutChangedLines:
@@ -197,163 +431,299 @@ class TestMutChangedLines:
         with mock.patch.dict("pytest_sort.diffcov.os.environ", os_environ, clear=True):
             assert diffcov.get_mut_changed_lines() == {}
 
+    def test_get_mutant_lines(self):
+        assert diffcov.get_mutant_lines("pytest_sort/module1.py", 20, 22) == {
+            Path("pytest_sort/module1.py").resolve(): {20, 21, 22},
+        }
+        assert diffcov.get_mutant_lines(Path("pytest_sort/module1.py"), 20) == {
+            Path("pytest_sort/module1.py").resolve(): {20},
+        }
 
-class TestCoverage:
-    @pytest.fixture()
-    def CoverageData(self):
-        with mock.patch("pytest_sort.diffcov.CoverageData") as CoverageData:  # noqa: N806
-            yield CoverageData
-
-    def test_get_line_coverage(self, CoverageData):
-        cov = CoverageData.return_value
-        cov.measured_files.return_value = ["pytest_sort/module1.py", "pytest_sort/module2.py"]
-        cov.contexts_by_lineno.side_effect = [
-            {
-                1: [
-                    "test_diffcov.py::test_get_line_coverage_1|setup",
-                    "test_diffcov.py::test_get_line_coverage_2|setup",
-                ],
-                11: ["test_diffcov.py::test_get_line_coverage_1|run"],
-                22: ["test_diffcov.py::test_get_line_coverage_2|run"],
-                100: ["test_diffcov.py::test_get_line_coverage_1|teardown"],
-            },
-            {
-                1: ["test_diffcov.py::test_get_line_coverage_1|run"],
-                2: ["test_diffcov.py::test_get_line_coverage_1"],
-            },
-        ]
-
-        line_coverage = diffcov.get_line_coverage()
 
-        assert next(line_coverage) == (
-            Path("pytest_sort/module1.py").resolve(),
-            "test_diffcov.py::test_get_line_coverage_1",
-            "setup",
-            1,
+class TestPathIndex:
+    def test_lookup(self, tmp_path):
+        index = diffcov.PathIndex(
+            [str(tmp_path / "module1.py"), "pytest_sort/module2.py", str(tmp_path / "module3.py")]
         )
-        assert next(line_coverage) == (
-            Path("pytest_sort/module1.py").resolve(),
-            "test_diffcov.py::test_get_line_coverage_2",
-            "setup",
-            1,
-        )
-        assert next(line_coverage) == (
-            Path("pytest_sort/module1.py").resolve(),
-            "test_diffcov.py::test_get_line_coverage_1",
-            "run",
-            11,
-        )
-        assert next(line_coverage) == (
-            Path("pytest_sort/module1.py").resolve(),
-            "test_diffcov.py::test_get_line_coverage_2",
-            "run",
-            22,
-        )
-        assert next(line_coverage) == (
-            Path("pytest_sort/module1.py").resolve(),
-            "test_diffcov.py::test_get_line_coverage_1",
-            "teardown",
-            100,
-        )
-        assert next(line_coverage) == (
-            Path("pytest_sort/module2.py").resolve(),
-            "test_diffcov.py::test_get_line_coverage_1",
-            "run",
-            1,
-        )
-        with pytest.raises(StopIteration):
-            next(line_coverage)
 
+        assert index.lookup([(tmp_path / "module1.py").resolve(), Path("pytest_sort/module2.py").resolve()]) == {
+            str(tmp_path / "module1.py"): (tmp_path / "module1.py").resolve(),
+            "pytest_sort/module2.py": Path("pytest_sort/module2.py").resolve(),
+        }
 
-class TestGetScores:
-    @pytest.fixture()
-    def get_git_toplevel_folder(self):
-        with mock.patch("pytest_sort.diffcov.get_git_toplevel_folder") as get_git_toplevel_folder:
-            yield get_git_toplevel_folder
+    def test_lookup_not_found(self, tmp_path):
+        index = diffcov.PathIndex([str(tmp_path / "module1.py")])
 
-    @pytest.fixture()
-    def get_git_diff_patch(self):
-        with mock.patch("pytest_sort.diffcov.get_git_diff_patch") as get_git_diff_patch:
-            yield get_git_diff_patch
+        with mock.patch("pytest_sort.diffcov.Path.resolve") as resolve:
+            assert index.lookup([tmp_path / "module2.py"]) == {}
+        resolve.assert_not_called()
+
+    def test_lookup_symlink(self, tmp_path):
+        (tmp_path / "real").mkdir()
+        (tmp_path / "real" / "module1.py").write_text("")
+        try:
+            (tmp_path / "link").symlink_to(tmp_path / "real", target_is_directory=True)
+        except OSError:
+            pytest.skip("symlinks not supported")
+
+        index = diffcov.PathIndex([str(tmp_path / "link" / "module1.py"), str(tmp_path / "link" / "module2.py")])
+        rpath = (tmp_path / "real" / "module1.py").resolve()
+
+        assert index.lookup([rpath]) == {str(tmp_path / "link" / "module1.py"): rpath}
+
+
+@pytest.fixture()
+def coverage_file(tmp_path):
+    coverage_file = tmp_path / ".coverage"
+    with mock.patch("coverage.sqldata.CoverageData") as CoverageData:  # noqa: N806
+        CoverageData.return_value.data_filename.return_value = str(coverage_file)
+        yield coverage_file
+
+
+@pytest.fixture(autouse=True)
+def database_file(tmp_path):
+    with mock.patch("pytest_sort.database.database_file", tmp_path / ".pytest_sort_data") as database_file:
+        yield database_file
+
+
+@pytest.fixture(autouse=True)
+def _impact_enabled(monkeypatch):
+    monkeypatch.setattr(impact, "enabled", True)
+
+
+def write_coverage(coverage_file, line_coverage, *, arcs):
+    cov = CoverageData(basename=str(coverage_file))
+    contexts = {}
+    for path, context, line in line_coverage:
+        contexts.setdefault(context, {}).setdefault(str(path), []).append(line)
+    for context, lines in contexts.items():
+        cov.set_context(context)
+        if arcs:
+            cov.add_arcs({path: [(-1, line) for line in file_lines] for path, file_lines in lines.items()})
+        else:
+            cov.add_lines(lines)
+    cov.write()
 
-    @pytest.fixture()
-    def get_diff_changed_lines(self):
-        with mock.patch("pytest_sort.diffcov.get_diff_changed_lines") as get_diff_changed_lines:
-            yield get_diff_changed_lines
 
+class TestGetScores:
     @pytest.fixture()
     def get_mut_changed_lines(self):
         with mock.patch("pytest_sort.diffcov.get_mut_changed_lines") as get_mut_changed_lines:
             yield get_mut_changed_lines
 
-    @pytest.fixture()
-    def get_line_coverage(self):
-        with mock.patch("pytest_sort.diffcov.get_line_coverage") as get_line_coverage:
-            yield get_line_coverage
-
-    @pytest.fixture()
-    def get_test_scores(self):
-        with mock.patch("pytest_sort.diffcov.get_test_scores") as get_test_scores:
-            yield get_test_scores
-
-    def test_get_test_scores(self, get_line_coverage):
-        rpath_m1 = Path("pytest_sort/module1.py").resolve()
-        rpath_m2 = Path("pytest_sort/module2.py").resolve()
-        rpath_m3 = Path("pytest_sort/module3.py").resolve()
+    @pytest.mark.parametrize("arcs", [False, True])
+    @pytest.mark.parametrize("enabled", [False, True])
+    def test_get_test_scores(self, coverage_file, tmp_path, monkeypatch, arcs, enabled):
+        monkeypatch.setattr(impact, "enabled", enabled)
+        rpath_m1 = (tmp_path / "module1.py").resolve()
+        rpath_m2 = (tmp_path / "module2.py").resolve()
+        rpath_m3 = (tmp_path / "module3.py").resolve()
 
         changed_lines = {
             rpath_m1: {1, 2, 3, 4, 5, 6, 7, 8, 9},
             rpath_m2: {1, 2, 3, 4, 5, 6, 7, 8, 9},
         }
 
-        get_line_coverage.return_value = [
-            (rpath_m1, "test_diffcov.py::covers_changes", "setup", 1),
-            (rpath_m1, "test_diffcov.py::covers_changes", "setup", 2),
-            (rpath_m1, "test_diffcov.py::covers_changes", "run", 3),
-            (rpath_m1, "test_diffcov.py::covers_changes", "run", 4),
-            (rpath_m1, "test_diffcov.py::covers_changes", "teardown", 5),
-            (rpath_m1, "test_diffcov.py::covers_changes", "teardown", 6),
-            # Covers other module only
-            (rpath_m3, "test_diffcov.py::no_cov", "run", 1),
-            # Covers module, but no Coverage on changed lines
-            (rpath_m2, "test_diffcov.py::cov_mod_not_line", "setup", 100),
-            (rpath_m2, "test_diffcov.py::cov_mod_not_line", "run", 100),
-            (rpath_m2, "test_diffcov.py::cov_mod_not_line", "teardown", 100),
-            # Only covers change in setup
-            (rpath_m2, "test_diffcov.py::cov_setup", "setup", 1),
-            # Only covers change in run
-            (rpath_m2, "test_diffcov.py::cov_run", "run", 1),
-            # Only covers change in teardown
-            (rpath_m2, "test_diffcov.py::cov_teardown", "teardown", 1),
-        ]
+        write_coverage(
+            coverage_file,
+            [
+                (rpath_m1, "test_diffcov.py::covers_changes|setup", 1),
+                (rpath_m1, "test_diffcov.py::covers_changes|setup", 2),
+                (rpath_m1, "test_diffcov.py::covers_changes|run", 3),
+                (rpath_m1, "test_diffcov.py::covers_changes|run", 4),
+                (rpath_m1, "test_diffcov.py::covers_changes|teardown", 5),
+                (rpath_m1, "test_diffcov.py::covers_changes|teardown", 6),
+                # Covers other module only
+                (rpath_m3, "test_diffcov.py::no_cov|run", 1),
+                # Covers module, but no Coverage on changed lines
+                (rpath_m2, "test_diffcov.py::cov_mod_not_line|setup", 100),
+                (rpath_m2, "test_diffcov.py::cov_mod_not_line|run", 100),
+                (rpath_m2, "test_diffcov.py::cov_mod_not_line|teardown", 100),
+                # Only covers change in setup
+                (rpath_m2, "test_diffcov.py::cov_setup|setup", 1),
+                # Only covers change in run
+                (rpath_m2, "test_diffcov.py::cov_run|run", 1),
+                # Only covers change in teardown
+                (rpath_m2, "test_diffcov.py::cov_teardown|teardown", 1),
+                # Not a test context
+                (rpath_m1, "test_diffcov.py::not_a_test", 1),
+            ],
+            arcs=arcs,
+        )
 
-        assert diffcov.get_test_scores(changed_lines) == {
+        assert diffcov.get_changed_test_scores(changed_lines) == {
             "test_diffcov.py::covers_changes": -15,
             "test_diffcov.py::cov_mod_not_line": -1,
             "test_diffcov.py::cov_setup": -2,
             "test_diffcov.py::cov_run": -6,
             "test_diffcov.py::cov_teardown": -2,
         }
+        assert (tmp_path / ".pytest_sort_impact").exists() is enabled
+
+    @pytest.mark.parametrize("enabled", [False, True])
+    def test_get_test_scores_weights(self, coverage_file, tmp_path, monkeypatch, enabled):
+        monkeypatch.setattr(impact, "enabled", enabled)
+        monkeypatch.setattr(impact, "weights", {"file": 100, "run": 10, "other": 0})
+        rpath = (tmp_path / "module1.py").resolve()
+        write_coverage(
+            coverage_file,
+            [
+                (rpath, "test_a|run", 1),
+                (rpath, "test_a|run", 2),
+                (rpath, "test_a|setup", 2),
+                (rpath, "test_b|teardown", 1),
+            ],
+            arcs=False,
+        )
+
+        assert diffcov.get_changed_test_scores({rpath: {1, 2}}) == {"test_a": -120, "test_b": -100}
+
+    def test_get_test_scores_no_changed_files(self, coverage_file, tmp_path):
+        write_coverage(coverage_file, [(tmp_path / "module1.py", "test_a|run", 1)], arcs=False)
+
+        assert diffcov.get_test_scores({(tmp_path / "module2.py").resolve(): {1}}) == {}
 
-    def test_get_diff_test_scores(
-        self,
-        get_test_scores,
-        get_git_toplevel_folder,
-        get_git_diff_patch,
-        get_diff_changed_lines,
-    ):
-        assert diffcov.get_diff_test_scores() == get_test_scores.return_value
-        get_git_toplevel_folder.assert_called_once()
-        get_git_diff_patch.assert_called_once()
-        get_diff_changed_lines.assert_called_once_with(
-            get_git_toplevel_folder.return_value,
-            get_git_diff_patch.return_value,
+    @pytest.mark.usefixtures("coverage_file")
+    def test_get_test_scores_no_coverage_file(self, tmp_path):
+        assert diffcov.get_test_scores({(tmp_path / "module1.py").resolve(): {1}}) == {}
+
+    def test_get_test_contexts_chunked(self, coverage_file, tmp_path, monkeypatch):
+        monkeypatch.setattr(database_sqlite, "CHUNK_SIZE", 2)
+        write_coverage(
+            coverage_file,
+            [(tmp_path / "module1.py", f"test_{idx}|run", 1) for idx in range(5)],
+            arcs=False,
         )
 
-    def test_get_mut_test_scores(
-        self,
-        get_test_scores,
-        get_mut_changed_lines,
-    ):
-        assert diffcov.get_mut_test_scores() == get_test_scores.return_value
+        con = diffcov.connect_coverage_data()
+        contexts = diffcov.get_test_contexts(con, {1, 2, 3, 4, 5})
+        con.close()
+
+        assert sorted(contexts.values()) == [(f"test_{idx}", "run") for idx in range(5)]
+
+    def test_connect_coverage_data_read_only(self, coverage_file, tmp_path):
+        write_coverage(coverage_file, [(tmp_path / "module1.py", "test_a|run", 1)], arcs=False)
+
+        con = diffcov.connect_coverage_data()
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            con.execute("DELETE FROM file")
+        con.close()
+
+    @pytest.fixture()
+    def get_changed_test_scores(self):
+        with mock.patch("pytest_sort.diffcov.get_changed_test_scores") as get_changed_test_scores:
+            yield get_changed_test_scores
+
+    def test_get_diff_test_scores(self, get_changed_test_scores):
+        with mock.patch("pytest_sort.diffcov.get_git_changed_lines") as get_git_changed_lines:
+            assert diffcov.get_diff_test_scores() == get_changed_test_scores.return_value
+        get_changed_test_scores.assert_called_once_with(get_git_changed_lines.return_value)
+        get_git_changed_lines.assert_called_once_with()
+
+    def test_get_mut_test_scores(self, get_changed_test_scores, get_mut_changed_lines):
+        assert diffcov.get_mut_test_scores() == get_changed_test_scores.return_value
+        get_changed_test_scores.assert_called_once_with(get_mut_changed_lines.return_value)
         get_mut_changed_lines.assert_called_once()
+
+
+class TestImpactScores:
+    def test_get_changed_test_scores_rebuild(self, coverage_file, tmp_path):
+        rpath = (tmp_path / "module1.py").resolve()
+        write_coverage(coverage_file, [(rpath, "test_a|run", 1)], arcs=False)
+        assert diffcov.get_changed_test_scores({rpath: {1}}) == {"test_a": -6}
+
+        with mock.patch("pytest_sort.diffcov.get_coverage_numbits") as get_coverage_numbits:
+            assert diffcov.get_changed_test_scores({rpath: {1}}) == {"test_a": -6}
+        get_coverage_numbits.assert_not_called()
+
+        coverage_file.unlink()
+        write_coverage(coverage_file, [(rpath, "test_b|setup", 1)], arcs=False)
+        assert diffcov.get_changed_test_scores({rpath: {1}}) == {"test_b": -2}
+
+    @pytest.mark.parametrize("enabled", [True, False])
+    def test_get_current_index_file(self, coverage_file, tmp_path, monkeypatch, enabled):
+        monkeypatch.setattr(impact, "enabled", enabled)
+        write_coverage(coverage_file, [(tmp_path / "module1.py", "test_a|run", 1)], arcs=False)
+
+        index_file = diffcov.get_current_index_file()
+
+        assert (index_file == tmp_path / ".pytest_sort_impact") is enabled
+        assert (tmp_path / ".pytest_sort_impact").exists() is enabled
+
+    def test_get_current_index_file_current(self, coverage_file, tmp_path):
+        write_coverage(coverage_file, [(tmp_path / "module1.py", "test_a|run", 1)], arcs=False)
+        diffcov.get_current_index_file()
+
+        with mock.patch("pytest_sort.impact.build_index") as build_index:
+            assert diffcov.get_current_index_file() == tmp_path / ".pytest_sort_impact"
+        build_index.assert_not_called()
+
+    @pytest.mark.usefixtures("coverage_file")
+    def test_get_current_index_file_no_coverage_file(self, tmp_path):
+        assert diffcov.get_current_index_file() is None
+        assert not (tmp_path / ".pytest_sort_impact").exists()
+
+    @pytest.mark.parametrize("arcs", [False, True])
+    def test_get_coverage_numbits(self, coverage_file, tmp_path, arcs):
+        write_coverage(
+            coverage_file,
+            [
+                (tmp_path / "module1.py", "test_a|run", 1),
+                (tmp_path / "module1.py", "test_a|run", 3),
+                (tmp_path / "module2.py", "test_a|run", 4),
+                (tmp_path / "module1.py", "test_b|setup", 2),
+                (tmp_path / "module1.py", "not_a_test", 2),
+            ],
+            arcs=arcs,
+        )
+
+        con = diffcov.connect_coverage_data()
+        coverage_numbits = sorted(diffcov.get_coverage_numbits(con))
+        con.close()
+
+        assert coverage_numbits == [
+            ((tmp_path / "module1.py").resolve(), "test_a", "run", nums_to_numbits([1, 3])),
+            ((tmp_path / "module1.py").resolve(), "test_b", "setup", nums_to_numbits([2])),
+            ((tmp_path / "module2.py").resolve(), "test_a", "run", nums_to_numbits([4])),
+        ]
+
+    @pytest.mark.parametrize("enabled", [None, True, False])
+    def test_get_covered_tests(self, coverage_file, tmp_path, monkeypatch, enabled):
+        monkeypatch.setattr(impact, "enabled", enabled)
+        write_coverage(
+            coverage_file,
+            [
+                (tmp_path / "module1.py", "test_a|run", 1),
+                (tmp_path / "module2.py", "test_b|setup", 2),
+                (tmp_path / "module1.py", "not_a_test", 2),
+            ],
+            arcs=False,
+        )
+
+        assert diffcov.get_covered_tests() == {"test_a", "test_b"}
+
+    @pytest.mark.parametrize("enabled", [None, True, False])
+    @pytest.mark.usefixtures("coverage_file")
+    def test_get_covered_tests_no_coverage_file(self, monkeypatch, enabled):
+        monkeypatch.setattr(impact, "enabled", enabled)
+        assert diffcov.get_covered_tests() == set()
+
+    @pytest.mark.parametrize("enabled", [None, True, False])
+    def test_get_mut_test_order(self, coverage_file, tmp_path, monkeypatch, enabled):
+        monkeypatch.setattr(impact, "enabled", enabled)
+        rpath = (tmp_path / "module1.py").resolve()
+        write_coverage(
+            coverage_file,
+            [
+                (rpath, "test_c|run", 9),
+                (rpath, "test_b|setup", 2),
+                (rpath, "test_a|setup", 3),
+                (rpath, "test_d|run", 2),
+                (rpath, "test_d|run", 3),
+                (tmp_path / "module2.py", "test_e|run", 2),
+            ],
+            arcs=False,
+        )
+
+        assert diffcov.get_mut_test_order(tmp_path / "module1.py", 2, 3) == ["test_d", "test_a", "test_b", "test_c"]
+        assert diffcov.get_mut_test_order(tmp_path / "module3.py", 2) == []
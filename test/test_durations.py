@@ -0,0 +1,136 @@
+import pytest
+
+from pytest_sort import durations
+
+
+class TestAddOutcome:
+    def test_passed(self):
+        record = {"total": 6}
+        assert durations.add_outcome(record, None) == {"total": 6}
+
+    def test_failed(self):
+        record = durations.add_outcome({}, 1700000000)
+        assert record == {"failures": 1, "last_failed": 1700000000, "fail_rate": 0.3}
+
+        durations.add_outcome(record, 1700000100)
+        assert record == {"failures": 2, "last_failed": 1700000100, "fail_rate": 0.51}
+
+    def test_decay(self):
+        record = durations.add_outcome({}, 1700000000)
+        durations.add_outcome(record, None)
+        durations.add_outcome(record, None)
+        assert record == {"failures": 1, "last_failed": 1700000000, "fail_rate": 0.147}
+
+    def test_add_sample_failed(self):
+        record = durations.add_sample({}, {"call": 2, "failed": 1700000000})
+        assert record["failures"] == 1
+        assert record["last_failed"] == 1700000000
+        assert record["fail_rate"] == 0.3
+
+    def test_add_sample_failed_no_durations(self):
+        record = durations.add_sample({}, {"call": 2})
+        durations.add_sample(record, {"failed": 1700000000})
+        assert record == {
+            "setup": 0,
+            "call": 2,
+            "teardown": 0,
+            "total": 2,
+            "count": 1,
+            "ewma": 2,
+            "samples": [2],
+            "failures": 1,
+            "last_failed": 1700000000,
+            "fail_rate": 0.3,
+        }
+
+    def test_add_sample_failed_new_record(self):
+        record = durations.add_sample({}, {"failed": 1700000000})
+        assert record == {
+            "setup": 0,
+            "call": 0,
+            "teardown": 0,
+            "total": 0,
+            "failures": 1,
+            "last_failed": 1700000000,
+            "fail_rate": 0.3,
+        }
+        assert durations.get_statistic(record, "p95") == 0
+
+
+class TestAddSample:
+    def test_first_sample(self):
+        record = durations.add_sample({}, {"setup": 1, "call": 2, "teardown": 3})
+        assert record == {
+            "setup": 1,
+            "call": 2,
+            "teardown": 3,
+            "total": 6,
+            "count": 1,
+            "ewma": 6,
+            "samples": [6],
+        }
+
+    def test_legacy_record(self):
+        record = {"setup": 10, "call": 20, "teardown": 30, "total": 60}
+        durations.add_sample(record, {"call": 5})
+        assert record == {
+            "setup": 10,
+            "call": 20,
+            "teardown": 30,
+            "total": 60,
+            "count": 1,
+            "ewma": 5,
+            "samples": [5],
+        }
+
+    def test_ewma(self):
+        record = {}
+        for sample in (100, 200, 100, 1000):
+            durations.add_sample(record, {"call": sample})
+
+        # ewma: 100 -> 120 -> 116 -> 293
+        assert record["total"] == 1000
+        assert record["count"] == 4
+        assert record["ewma"] == 293
+        assert record["samples"] == [100, 200, 100, 1000]
+
+    def test_sample_size(self, monkeypatch):
+        monkeypatch.setattr(durations, "sample_size", 3)
+        record = {}
+        for sample in range(1, 6):
+            durations.add_sample(record, {"call": sample})
+
+        assert record["samples"] == [3, 4, 5]
+        assert record["count"] == 5
+
+
+@pytest.mark.parametrize(
+    ("percent", "expected"),
+    [
+        (0, 1),
+        (50, 5),
+        (95, 10),
+        (100, 10),
+    ],
+)
+def test_percentile(percent, expected):
+    assert durations.percentile([10, 1, 9, 2, 8, 3, 7, 4, 6, 5], percent) == expected
+
+
+@pytest.mark.parametrize(
+    ("statistic", "expected"),
+    [
+        ("max", 1000),
+        ("ewma", 293),
+        ("p50", 100),
+        ("p95", 1000),
+    ],
+)
+def test_get_statistic(statistic, expected):
+    record = {"total": 1000, "ewma": 293, "samples": [100, 200, 100, 1000]}
+    assert durations.get_statistic(record, statistic) == expected
+
+
+@pytest.mark.parametrize("statistic", durations.statistics)
+def test_get_statistic_legacy(statistic):
+    assert durations.get_statistic({"setup": 1, "call": 2, "teardown": 3, "total": 6}, statistic) == 6
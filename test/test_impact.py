@@ -0,0 +1,177 @@
+import sqlite3
+from contextlib import closing
+from unittest import mock
+
+import pytest
+from coverage.numbits import nums_to_numbits
+
+from pytest_sort import impact
+
+
+@pytest.fixture()
+def coverage_file(tmp_path):
+    coverage_file = tmp_path / ".coverage"
+    coverage_file.write_bytes(b"coverage data")
+    return coverage_file
+
+
+@pytest.fixture()
+def index_file(tmp_path):
+    return tmp_path / ".pytest_sort_impact"
+
+
+def read_meta(index_file):
+    with closing(sqlite3.connect(index_file)) as con:
+        return dict(con.execute("SELECT key, value FROM meta"))
+
+
+def test_get_index_file(tmp_path):
+    with mock.patch("pytest_sort.database.database_file", tmp_path / ".pytest_sort_data"):
+        assert impact.get_index_file() == tmp_path / ".pytest_sort_impact"
+
+
+class TestIsCurrent:
+    def test_missing_index(self, index_file, coverage_file):
+        assert not impact.is_current(index_file, coverage_file)
+
+    def test_not_an_index(self, index_file, coverage_file):
+        index_file.write_text("not sqlite")
+        assert not impact.is_current(index_file, coverage_file)
+
+    def test_same_stat(self, index_file, coverage_file):
+        impact.build_index(index_file, coverage_file, [])
+        with mock.patch("pytest_sort.impact.get_file_hash") as get_file_hash:
+            assert impact.is_current(index_file, coverage_file)
+        get_file_hash.assert_not_called()
+
+    def test_other_version(self, index_file, coverage_file):
+        with mock.patch("pytest_sort.impact.VERSION", "1"):
+            impact.build_index(index_file, coverage_file, [])
+        assert not impact.is_current(index_file, coverage_file)
+
+    def test_different_coverage_file(self, index_file, coverage_file, tmp_path):
+        impact.build_index(index_file, coverage_file, [])
+        other_file = tmp_path / "other.coverage"
+        other_file.write_bytes(b"coverage data")
+        assert not impact.is_current(index_file, other_file)
+
+    def test_touched(self, index_file, coverage_file):
+        impact.build_index(index_file, coverage_file, [])
+        coverage_file.write_bytes(b"coverage data")
+        stat = impact.get_file_stat(coverage_file)
+        with mock.patch("pytest_sort.impact.get_file_stat", return_value={**stat, "mtime_ns": "1"}):
+            impact.build_index(index_file, coverage_file, [])
+
+        assert impact.is_current(index_file, coverage_file)
+        assert read_meta(index_file)["mtime_ns"] == stat["mtime_ns"]
+
+    def test_changed(self, index_file, coverage_file):
+        impact.build_index(index_file, coverage_file, [])
+        coverage_file.write_bytes(b"changed coverage data")
+        assert not impact.is_current(index_file, coverage_file)
+
+
+class TestBuildIndex:
+    def test_build_index(self, index_file, coverage_file, tmp_path):
+        index_file.write_text("old index")
+        coverage_numbits = [
+            (tmp_path / "a.py", "test_a.py::test_1", "run", nums_to_numbits([1, 2])),
+            (tmp_path / "a.py", "test_a.py::test_1", "setup", nums_to_numbits([2])),
+            (tmp_path / "b.py", "test_a.py::test_2", "teardown", nums_to_numbits([3])),
+            (tmp_path / "b.py", "test_a.py::test_2", "teardown", nums_to_numbits([5])),
+        ]
+
+        impact.build_index(index_file, coverage_file, coverage_numbits)
+
+        with closing(sqlite3.connect(index_file)) as con:
+            assert con.execute("SELECT * FROM test").fetchall() == [(1, "test_a.py::test_1"), (2, "test_a.py::test_2")]
+            assert con.execute("SELECT * FROM file").fetchall() == [
+                (1, str(tmp_path / "a.py")),
+                (2, str(tmp_path / "b.py")),
+            ]
+            assert con.execute("SELECT * FROM line_bits").fetchall() == [
+                (1, 1, "run", nums_to_numbits([1, 2])),
+                (1, 1, "setup", nums_to_numbits([2])),
+                (2, 2, "teardown", nums_to_numbits([3, 5])),
+            ]
+        assert read_meta(index_file)["sha256"] == impact.get_file_hash(coverage_file)
+        assert list(tmp_path.glob("*.tmp")) == []
+
+    def test_build_index_error(self, index_file, coverage_file, tmp_path):
+        index_file.write_text("old index")
+
+        def coverage_numbits():
+            yield (tmp_path / "a.py", "test_a.py::test_1", "run", nums_to_numbits([1]))
+            raise sqlite3.DatabaseError
+
+        with pytest.raises(sqlite3.DatabaseError):
+            impact.build_index(index_file, coverage_file, coverage_numbits())
+
+        assert index_file.read_text() == "old index"
+        assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_get_test_scores(index_file, coverage_file, tmp_path):
+    coverage_numbits = [
+        (tmp_path / "a.py", "test_a.py::run", "run", nums_to_numbits([1, 2])),
+        (tmp_path / "a.py", "test_a.py::setup", "setup", nums_to_numbits([1])),
+        (tmp_path / "a.py", "test_a.py::all", "setup", nums_to_numbits([2])),
+        (tmp_path / "a.py", "test_a.py::all", "run", nums_to_numbits([2])),
+        (tmp_path / "a.py", "test_a.py::all", "teardown", nums_to_numbits([2])),
+        (tmp_path / "a.py", "test_a.py::file", "run", nums_to_numbits([9])),
+        (tmp_path / "b.py", "test_b.py::other", "run", nums_to_numbits([1])),
+    ]
+    impact.build_index(index_file, coverage_file, coverage_numbits)
+
+    changed_lines = {tmp_path / "a.py": {1, 2}, tmp_path / "c.py": {1}}
+    assert impact.get_test_scores(index_file, changed_lines) == {
+        "test_a.py::run": -11,
+        "test_a.py::setup": -2,
+        "test_a.py::all": -8,
+        "test_a.py::file": -1,
+    }
+
+
+def test_get_test_scores_weights(index_file, coverage_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(impact, "weights", {"file": 100, "run": 10, "other": 0})
+    coverage_numbits = [
+        (tmp_path / "a.py", "test_a.py::run", "run", nums_to_numbits([1, 2])),
+        (tmp_path / "a.py", "test_a.py::setup", "setup", nums_to_numbits([1])),
+    ]
+    impact.build_index(index_file, coverage_file, coverage_numbits)
+
+    assert impact.get_test_scores(index_file, {tmp_path / "a.py": {1, 2}}) == {
+        "test_a.py::run": -120,
+        "test_a.py::setup": -100,
+    }
+
+
+def test_get_test_scores_chunks(index_file, coverage_file, tmp_path):
+    coverage_numbits = [
+        (tmp_path / "a.py", f"test_a.py::test_{idx}", "run", nums_to_numbits([idx])) for idx in range(5)
+    ]
+    impact.build_index(index_file, coverage_file, coverage_numbits)
+
+    with mock.patch("pytest_sort.database_sqlite.CHUNK_SIZE", 2):
+        assert impact.get_test_scores(index_file, {tmp_path / "a.py": {1, 2, 3}}) == {
+            f"test_a.py::test_{idx}": -6 if idx in {1, 2, 3} else -1 for idx in range(5)
+        }
+
+
+def test_get_nodeids(index_file, coverage_file, tmp_path):
+    coverage_numbits = [
+        (tmp_path / "a.py", "test_a.py::run", "run", nums_to_numbits([1])),
+        (tmp_path / "b.py", "test_b.py::setup", "setup", nums_to_numbits([1])),
+        (tmp_path / "b.py", "test_a.py::run", "run", nums_to_numbits([2])),
+    ]
+    impact.build_index(index_file, coverage_file, coverage_numbits)
+
+    assert impact.get_nodeids(index_file) == {"test_a.py::run", "test_b.py::setup"}
+
+
+def test_connect_read_only(index_file, coverage_file):
+    impact.build_index(index_file, coverage_file, [])
+    with closing(impact._connect_read_only(index_file)) as con:
+        assert con.execute("PRAGMA mmap_size").fetchone() == (impact.MMAP_SIZE,)
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            con.execute("DELETE FROM meta")
@@ -1,5 +1,9 @@
 import argparse
 import importlib
+import os
+import subprocess
+import sys
+from pathlib import Path
 from unittest import mock
 
 import pytest
@@ -12,12 +16,26 @@ def test_plugin():
     importlib.reload(plugin)
 
 
+def test_plugin_import_defers_coverage():
+    # pytest-cov starts coverage in subprocesses through these variables
+    env = {key: value for key, value in os.environ.items() if not key.startswith(("COV_CORE_", "COVERAGE_"))}
+    env["PYTHONPATH"] = str(Path(plugin.__file__).parents[1])
+    code = "import sys, pytest_sort.plugin; print(sorted(name for name in sys.modules if name.startswith('coverage')))"
+
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, env=env, text=True)  # noqa: S603
+
+    assert output.stdout.strip() == "[]"
+
+
 class TestConfig:
-    def test_pytest_addoption(self):
+    @pytest.fixture()
+    def parser(self):
         parser = mock.MagicMock()
-        group = parser.getgroup.return_value
-
         plugin.pytest_addoption(parser)
+        return parser
+
+    def test_pytest_addoption(self, parser):
+        group = parser.getgroup.return_value
 
         parser.getgroup.assert_called_with("pytest-sort")
 
@@ -44,6 +62,80 @@ class TestConfig:
         group.addoption.assert_any_call("--sort_seed", action="store", dest="sort_seed", help=argparse.SUPPRESS)
         parser.addini.assert_any_call("sort_seed", help=help_text)
 
+        help_text = "Distribute buckets to pytest-xdist workers by recorded runtimes, longest first."
+        group.addoption.assert_any_call("--sort-dist", action="store_true", dest="sort_dist", help=help_text)
+        group.addoption.assert_any_call("--sort_dist", action="store_true", dest="sort_dist", help=argparse.SUPPRESS)
+        parser.addini.assert_any_call("sort_dist", help=help_text, type="bool")
+
+        help_text = "Run only shard K of N, with shards balanced by recorded runtimes."
+        group.addoption.assert_any_call(
+            "--sort-shard", action="store", dest="sort_shard", metavar="K/N", help=help_text
+        )
+        group.addoption.assert_any_call("--sort_shard", action="store", dest="sort_shard", help=argparse.SUPPRESS)
+        parser.addini.assert_any_call("sort_shard", help=help_text)
+
+        help_text = "Report the time and memory used by each phase of pytest-sort."
+        group.addoption.assert_any_call("--sort-profile", action="store_true", dest="sort_profile", help=help_text)
+        group.addoption.assert_any_call(
+            "--sort_profile", action="store_true", dest="sort_profile", help=argparse.SUPPRESS
+        )
+        parser.addini.assert_any_call("sort_profile", help=help_text, type="bool")
+
+        help_text = "Also write the time and memory used by each phase of pytest-sort to this JSON file."
+        group.addoption.assert_any_call(
+            "--sort-profile-json", action="store", dest="sort_profile_json", metavar="PATH", help=help_text
+        )
+        group.addoption.assert_any_call(
+            "--sort_profile_json", action="store", dest="sort_profile_json", help=argparse.SUPPRESS
+        )
+        parser.addini.assert_any_call("sort_profile_json", help=help_text)
+
+        group.addoption.assert_any_call("--sort-debug", action="store_true", dest="sort_debug", help=argparse.SUPPRESS)
+        group.addoption.assert_any_call("--sort_debug", action="store_true", dest="sort_debug", help=argparse.SUPPRESS)
+
+    def test_pytest_addoption_cov(self, parser):
+        group = parser.getgroup.return_value
+
+        help_text = "Git ref to compare with in diffcov mode, from where HEAD branched off it. (default: the index)"
+        group.addoption.assert_any_call(
+            "--sort-diff-base", action="store", dest="sort_diff_base", metavar="REF", help=help_text
+        )
+        group.addoption.assert_any_call(
+            "--sort_diff_base", action="store", dest="sort_diff_base", help=argparse.SUPPRESS
+        )
+        parser.addini.assert_any_call("sort_diff_base", help=help_text)
+
+        help_text = "Weights of diffcov and mutcov scores. (default: file=1,run=5,other=1)"
+        group.addoption.assert_any_call("--sort-cov-weights", action="store", dest="sort_cov_weights", help=help_text)
+        group.addoption.assert_any_call(
+            "--sort_cov_weights", action="store", dest="sort_cov_weights", help=argparse.SUPPRESS
+        )
+        parser.addini.assert_any_call("sort_cov_weights", help=help_text)
+
+        help_text = "Divide diffcov and mutcov scores by recorded runtimes, to run cheap tests covering changes first."
+        group.addoption.assert_any_call(
+            "--sort-cov-per-second", action="store_true", dest="sort_cov_per_second", help=help_text
+        )
+        group.addoption.assert_any_call(
+            "--sort_cov_per_second", action="store_true", dest="sort_cov_per_second", help=argparse.SUPPRESS
+        )
+        parser.addini.assert_any_call("sort_cov_per_second", help=help_text, type="bool")
+
+        help_text = "Deselect tests with no coverage of the diff. Tests missing from the coverage data still run."
+        group.addoption.assert_any_call(
+            "--sort-diffcov-select", action="store_true", dest="sort_diffcov_select", help=help_text
+        )
+        group.addoption.assert_any_call(
+            "--sort_diffcov_select", action="store_true", dest="sort_diffcov_select", help=argparse.SUPPRESS
+        )
+        parser.addini.assert_any_call("sort_diffcov_select", help=help_text, type="bool")
+
+        help_text = "Keep an index of coverage data next to the datafile for diffcov and mutcov. (default: true)"
+        parser.addini.assert_any_call("sort_impact_index", help=help_text, type="bool", default=True)
+
+    def test_pytest_addoption_times(self, parser):
+        group = parser.getgroup.return_value
+
         help_text = "Records runtimes. Activated by default when sort-mode=fastest"
         group.addoption.assert_any_call("--sort-record-times", action="store_true", dest="sort_record", help=help_text)
         group.addoption.assert_any_call(
@@ -55,7 +147,7 @@ class TestConfig:
         group.addoption.assert_any_call(
             "--sort_no_record_times", action="store_true", dest="sort_no_record", help=argparse.SUPPRESS
         )
-        parser.addini.assert_any_call("sort_record_times", help=help_text, type="bool")
+        parser.addini.assert_any_call("sort_record_times", help=help_text, type="bool", default=None)
 
         help_text = "Clear the recorded runtimes before sorting."
         group.addoption.assert_any_call(
@@ -77,9 +169,15 @@ class TestConfig:
         group.addoption.assert_any_call("--sort-datafile", action="store", dest="sort_datafile", help=help_text)
         group.addoption.assert_any_call("--sort_datafile", action="store", dest="sort_datafile", help=argparse.SUPPRESS)
         parser.addini.assert_any_call("sort_datafile", help=help_text)
+        parser.addini.assert_any_call("sort_datafile_format", help="['json', 'sqlite']")
 
-        group.addoption.assert_any_call("--sort-debug", action="store_true", dest="sort_debug", help=argparse.SUPPRESS)
-        group.addoption.assert_any_call("--sort_debug", action="store_true", dest="sort_debug", help=argparse.SUPPRESS)
+        group.addoption.assert_any_call(
+            "--sort-statistic", action="store", dest="sort_statistic", help="['max', 'ewma', 'p50', 'p95']"
+        )
+        group.addoption.assert_any_call(
+            "--sort_statistic", action="store", dest="sort_statistic", help=argparse.SUPPRESS
+        )
+        parser.addini.assert_any_call("sort_statistic", help="['max', 'ewma', 'p50', 'p95']")
 
     @mock.patch("pytest_sort.plugin.SortConfig")
     def test_pytest_configure(self, SortConfig):
@@ -98,6 +196,16 @@ class TestConfig:
 
         SortConfig.from_pytest.assert_called_with(config)
 
+    @pytest.mark.parametrize("enabled", [True, False])
+    @mock.patch("pytest_sort.plugin.profiling")
+    def test_pytest_configure_profile(self, profiling, enabled):
+        profiling.enabled = enabled
+
+        with mock.patch("pytest_sort.plugin.SortConfig"):
+            plugin.pytest_configure(mock.MagicMock())
+
+        assert profiling.start.called is enabled
+
     @mock.patch("pytest_sort.plugin.SortConfig")
     def test_pytest_report_header(self, SortConfig):
         config = mock.MagicMock()
@@ -112,6 +220,70 @@ class TestConfig:
 
 
 class TestExecute:
+    @pytest.mark.parametrize(
+        ("reset", "controller", "workerinput", "started"),
+        [
+            (False, False, None, True),
+            (True, False, None, False),
+            (False, True, None, False),
+            (False, False, {}, True),
+        ],
+    )
+    @mock.patch("pytest_sort.plugin.use_loaded")
+    @mock.patch("pytest_sort.plugin.start_loading")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_sessionstart(self, SortConfig, start_loading, use_loaded, reset, controller, workerinput, started):
+        SortConfig.reset = reset
+        session = mock.MagicMock()
+        session.config = mock.MagicMock(spec=pytest.Config)
+        session.config.pluginmanager = mock.MagicMock()
+        session.config.pluginmanager.has_plugin.return_value = controller
+        if workerinput is not None:
+            session.config.workerinput = workerinput
+
+        plugin.pytest_sessionstart(session)
+
+        assert start_loading.called is started
+        use_loaded.assert_not_called()
+
+    @mock.patch("pytest_sort.plugin.profiling")
+    @mock.patch("pytest_sort.plugin.start_loading")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_sessionstart_profile(self, SortConfig, start_loading, profiling):
+        SortConfig.reset = False
+        profiling.enabled = True
+        session = mock.MagicMock()
+        session.config = mock.MagicMock(spec=pytest.Config)
+        session.config.pluginmanager = mock.MagicMock()
+        session.config.pluginmanager.has_plugin.return_value = False
+
+        plugin.pytest_sessionstart(session)
+
+        start_loading.assert_not_called()
+
+    @mock.patch("pytest_sort.plugin.use_loaded")
+    @mock.patch("pytest_sort.plugin.start_loading")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_sessionstart_xdist_worker(self, SortConfig, start_loading, use_loaded):
+        SortConfig.reset = False
+        session = mock.MagicMock()
+        session.config = mock.MagicMock(spec=pytest.Config)
+        session.config.pluginmanager = mock.MagicMock()
+        session.config.pluginmanager.has_plugin.return_value = False
+        session.config.workerinput = {"sort_loaded": {"get_all_totals": {"test_a": 1}}}
+
+        plugin.pytest_sessionstart(session)
+
+        use_loaded.assert_called_with({"get_all_totals": {"test_a": 1}})
+        start_loading.assert_not_called()
+
+    def test_is_xdist_controller(self):
+        config = mock.MagicMock(spec=pytest.Config)
+        config.pluginmanager = mock.MagicMock()
+        config.pluginmanager.has_plugin.return_value = True
+        assert plugin.is_xdist_controller(config) is True
+        config.pluginmanager.has_plugin.assert_called_with("dsession")
+
     @mock.patch("pytest_sort.plugin.sort_items")
     @mock.patch("pytest_sort.plugin.clear_db")
     @mock.patch("pytest_sort.plugin.SortConfig")
@@ -121,6 +293,8 @@ class TestExecute:
         items = mock.MagicMock()
 
         SortConfig.reset = False
+        SortConfig.shard = None
+        SortConfig.diffcov_select = False
 
         plugin.pytest_collection_modifyitems(session, config, items)
         clear_db.assert_not_called()
@@ -135,11 +309,86 @@ class TestExecute:
         items = mock.MagicMock()
 
         SortConfig.reset = True
+        SortConfig.shard = None
+        SortConfig.diffcov_select = False
 
         plugin.pytest_collection_modifyitems(session, config, items)
         clear_db.assert_called()
         sort_items.assert_called_with(items)
 
+    @pytest.mark.parametrize(
+        ("deselected", "hook_called"),
+        [
+            ([mock.sentinel.item], True),
+            ([], False),
+        ],
+    )
+    @mock.patch("pytest_sort.plugin.select_shard")
+    @mock.patch("pytest_sort.plugin.sort_items")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_collection_modifyitems_shard(self, SortConfig, sort_items, select_shard, deselected, hook_called):
+        session = mock.MagicMock()
+        config = mock.MagicMock()
+        items = mock.MagicMock()
+
+        SortConfig.reset = False
+        SortConfig.shard = (2, 3)
+        SortConfig.diffcov_select = False
+        select_shard.return_value = deselected
+
+        plugin.pytest_collection_modifyitems(session, config, items)
+        sort_items.assert_called_with(items)
+        select_shard.assert_called_with(items, (2, 3))
+        if hook_called:
+            config.hook.pytest_deselected.assert_called_with(items=deselected)
+        else:
+            config.hook.pytest_deselected.assert_not_called()
+
+    @pytest.mark.parametrize(
+        ("deselected", "hook_called"),
+        [
+            ([mock.sentinel.item], True),
+            ([], False),
+        ],
+    )
+    @mock.patch("pytest_sort.plugin.select_diffcov")
+    @mock.patch("pytest_sort.plugin.sort_items")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_collection_modifyitems_diffcov_select(
+        self, SortConfig, sort_items, select_diffcov, deselected, hook_called
+    ):
+        session = mock.MagicMock()
+        config = mock.MagicMock()
+        items = mock.MagicMock()
+
+        SortConfig.reset = False
+        SortConfig.shard = None
+        SortConfig.diffcov_select = True
+        select_diffcov.return_value = deselected
+
+        plugin.pytest_collection_modifyitems(session, config, items)
+        sort_items.assert_called_with(items)
+        select_diffcov.assert_called_with(items)
+        if hook_called:
+            config.hook.pytest_deselected.assert_called_with(items=deselected)
+        else:
+            config.hook.pytest_deselected.assert_not_called()
+
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_report_collectionfinish(self, SortConfig):
+        SortConfig.diffcov_select = True
+        SortConfig.diffcov_deselected = 12
+
+        report = plugin.pytest_report_collectionfinish(mock.MagicMock())
+
+        assert report == "pytest-sort: deselected 12 tests with no coverage of the diff"
+
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_report_collectionfinish_disabled(self, SortConfig):
+        SortConfig.diffcov_select = False
+
+        assert plugin.pytest_report_collectionfinish(mock.MagicMock()) is None
+
     @pytest.mark.parametrize(
         ("record", "recorded_times", "when", "out_recorded_times"),
         [
@@ -164,6 +413,37 @@ class TestExecute:
 
         assert SortConfig.recorded_times == out_recorded_times
 
+    @mock.patch("pytest_sort.plugin.profiling")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_runtest_makereport_profile(self, SortConfig, profiling):
+        SortConfig.record = True
+        SortConfig.recorded_times = {}
+
+        for _ in plugin.pytest_runtest_makereport(mock.MagicMock(nodeid="test_item_1"), mock.MagicMock(when="call")):
+            pass
+
+        profiling.phase.assert_called_with("recording")
+
+    @pytest.mark.parametrize(
+        ("record", "recorded_times", "failed", "out_recorded_times"),
+        [
+            (True, {}, True, {"test_item_1": {"failed": 1_700_000_000}}),
+            (True, {"test_item_1": {"setup": 5}}, True, {"test_item_1": {"setup": 5, "failed": 1_700_000_000}}),
+            (True, {}, False, {}),
+            (False, {}, True, {}),
+        ],
+    )
+    @mock.patch("pytest_sort.plugin.time.time", return_value=1_700_000_000.5)
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_runtest_logreport(self, SortConfig, time, record, recorded_times, failed, out_recorded_times):
+        SortConfig.record = record
+        SortConfig.recorded_times = recorded_times
+
+        plugin.pytest_runtest_logreport(mock.MagicMock(nodeid="test_item_1", failed=failed))
+
+        assert SortConfig.recorded_times == out_recorded_times
+        assert time.called is (record and failed)
+
     @mock.patch("pytest_sort.plugin.print_recorded_times_report")
     @mock.patch("pytest_sort.plugin.update_test_cases")
     @mock.patch("pytest_sort.plugin.SortConfig")
@@ -174,7 +454,7 @@ class TestExecute:
         }
         terminalreporter = mock.MagicMock()
         exitstatus = mock.MagicMock()
-        config = mock.MagicMock()
+        config = mock.MagicMock(spec=pytest.Config)
 
         SortConfig.report = True
 
@@ -190,7 +470,7 @@ class TestExecute:
         SortConfig.recorded_times = {}
         terminalreporter = mock.MagicMock()
         exitstatus = mock.MagicMock()
-        config = mock.MagicMock()
+        config = mock.MagicMock(spec=pytest.Config)
 
         SortConfig.report = False
 
@@ -198,3 +478,175 @@ class TestExecute:
 
         update_test_cases.assert_not_called()
         print_recorded_times_report.assert_not_called()
+
+    @mock.patch("pytest_sort.plugin.print_recorded_times_report")
+    @mock.patch("pytest_sort.plugin.update_test_cases")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_terminal_summary_xdist_worker(self, SortConfig, update_test_cases, print_recorded_times_report):
+        SortConfig.recorded_times = {"test_item_1": {"setup": 1}}
+        config = mock.MagicMock(spec=pytest.Config)
+        config.workerinput = {}
+
+        SortConfig.report = False
+
+        plugin.pytest_terminal_summary(mock.MagicMock(), mock.MagicMock(), config)
+
+        update_test_cases.assert_not_called()
+        print_recorded_times_report.assert_not_called()
+
+    @mock.patch("pytest_sort.plugin.profiling")
+    @mock.patch("pytest_sort.plugin.update_test_cases")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_terminal_summary_profile(self, SortConfig, update_test_cases, profiling):
+        SortConfig.recorded_times = {"test_item_1": {"setup": 1}}
+        SortConfig.report = False
+        profiling.enabled = True
+        profiling.json_file = Path("profile.json")
+        profiling.format_report.return_value = ["header", "sort"]
+        terminalreporter = mock.MagicMock()
+        config = mock.MagicMock(spec=pytest.Config)
+
+        plugin.pytest_terminal_summary(terminalreporter, mock.MagicMock(), config)
+
+        profiling.phase.assert_called_with("datafile save")
+        update_test_cases.assert_called_with(SortConfig.recorded_times)
+        terminalreporter.write_sep.assert_called_with("-", "pytest-sort profile")
+        terminalreporter.write_line.assert_has_calls([mock.call("header"), mock.call("sort")])
+        profiling.write_json.assert_called_with(Path("profile.json"))
+
+    @pytest.mark.parametrize(("enabled", "workerinput"), [(False, None), (True, {})])
+    @mock.patch("pytest_sort.plugin.profiling")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_terminal_summary_no_profile(self, SortConfig, profiling, enabled, workerinput):
+        SortConfig.recorded_times = {}
+        SortConfig.report = False
+        profiling.enabled = enabled
+        terminalreporter = mock.MagicMock()
+        config = mock.MagicMock(spec=pytest.Config)
+        if workerinput is not None:
+            config.workerinput = workerinput
+
+        plugin.pytest_terminal_summary(terminalreporter, mock.MagicMock(), config)
+
+        terminalreporter.write_sep.assert_not_called()
+        profiling.write_json.assert_not_called()
+
+
+class TestXdist:
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_sessionfinish_worker(self, SortConfig):
+        SortConfig.recorded_times = {"test_item_1": {"setup": 1}}
+        session = mock.MagicMock()
+        session.config = mock.MagicMock(spec=pytest.Config)
+        session.config.workerinput = {}
+        session.config.workeroutput = {}
+
+        plugin.pytest_sessionfinish(session)
+
+        assert session.config.workeroutput == {"sort_recorded_times": {"test_item_1": {"setup": 1}}}
+
+    @mock.patch("pytest_sort.plugin.profiling")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_sessionfinish_worker_profile(self, SortConfig, profiling):
+        SortConfig.recorded_times = {}
+        profiling.phases = {"sort": {"calls": 1, "ns": 10, "memory": 0, "peak": 0}}
+        session = mock.MagicMock()
+        session.config = mock.MagicMock(spec=pytest.Config)
+        session.config.workerinput = {}
+        session.config.workeroutput = {}
+
+        plugin.pytest_sessionfinish(session)
+
+        assert session.config.workeroutput == {"sort_profile": {"sort": {"calls": 1, "ns": 10, "memory": 0, "peak": 0}}}
+
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_sessionfinish_controller(self, SortConfig):
+        SortConfig.recorded_times = {"test_item_1": {"setup": 1}}
+        session = mock.MagicMock()
+        session.config = mock.MagicMock(spec=pytest.Config)
+
+        plugin.pytest_sessionfinish(session)
+
+        assert not hasattr(session.config, "workeroutput")
+
+    @mock.patch("pytest_sort.plugin.load_all")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_configure_node(self, SortConfig, load_all):
+        SortConfig.reset = False
+        SortConfig.loaded = None
+        load_all.return_value = {"get_all_totals": {"test_a": 1}}
+        nodes = [mock.MagicMock(workerinput={}), mock.MagicMock(workerinput={})]
+
+        for node in nodes:
+            plugin.pytest_configure_node(node)
+
+        load_all.assert_called_once_with()
+        for node in nodes:
+            assert node.workerinput == {"sort_loaded": {"get_all_totals": {"test_a": 1}}}
+
+    @mock.patch("pytest_sort.plugin.profiling")
+    @mock.patch("pytest_sort.plugin.load_all")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_configure_node_profile(self, SortConfig, load_all, profiling):
+        SortConfig.reset = False
+        SortConfig.loaded = None
+
+        plugin.pytest_configure_node(mock.MagicMock(workerinput={}))
+
+        profiling.phase.assert_called_once_with("load")
+        assert SortConfig.loaded == load_all.return_value
+
+    @mock.patch("pytest_sort.plugin.load_all")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_configure_node_reset(self, SortConfig, load_all):
+        SortConfig.reset = True
+        node = mock.MagicMock(workerinput={})
+
+        plugin.pytest_configure_node(node)
+
+        load_all.assert_not_called()
+        assert node.workerinput == {}
+
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_testnodedown(self, SortConfig):
+        SortConfig.recorded_times = {"test_item_1": {"setup": 1}}
+        node_1 = mock.MagicMock(workeroutput={"sort_recorded_times": {"test_item_1": {"call": 2}}})
+        node_2 = mock.MagicMock(workeroutput={"sort_recorded_times": {"test_item_2": {"setup": 3}}})
+        node_3 = mock.MagicMock(workeroutput={})
+        node_4 = mock.MagicMock(spec=[])
+
+        for node in (node_1, node_2, node_3, node_4):
+            plugin.pytest_testnodedown(node, None)
+
+        assert SortConfig.recorded_times == {
+            "test_item_1": {"setup": 1, "call": 2},
+            "test_item_2": {"setup": 3},
+        }
+
+    @mock.patch("pytest_sort.plugin.profiling")
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_testnodedown_profile(self, SortConfig, profiling):
+        SortConfig.recorded_times = {}
+        node = mock.MagicMock(workeroutput={"sort_profile": {"sort": {"calls": 1, "ns": 10, "memory": 0, "peak": 0}}})
+
+        plugin.pytest_testnodedown(node, None)
+
+        profiling.merge.assert_called_with({"sort": {"calls": 1, "ns": 10, "memory": 0, "peak": 0}})
+
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_xdist_make_scheduler_disabled(self, SortConfig):
+        SortConfig.dist = False
+
+        assert plugin.pytest_xdist_make_scheduler(mock.MagicMock(), mock.MagicMock()) is None
+
+    @mock.patch("pytest_sort.plugin.SortConfig")
+    def test_pytest_xdist_make_scheduler(self, SortConfig):
+        SortConfig.dist = True
+        config = mock.MagicMock()
+        log = mock.MagicMock()
+
+        with mock.patch("pytest_sort.scheduler.SortScheduling") as sort_scheduling:
+            sched = plugin.pytest_xdist_make_scheduler(config, log)
+
+        sort_scheduling.assert_called_with(config, log)
+        assert sched == sort_scheduling.return_value
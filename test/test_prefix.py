@@ -0,0 +1,69 @@
+import pytest
+
+from pytest_sort.prefix import PrefixIndex
+
+
+@pytest.fixture()
+def values():
+    return {
+        "tests/core.py::test_b": 20,
+        "tests/core.py::test_a": -5,
+        "tests/other/core.py::test_c": 3,
+        "tests/other/core.py::test_d": -1,
+        "test/tests/core.py::test_e": -90,
+    }
+
+
+class TestPrefixIndex:
+    def test_nodeids_sorted(self, values):
+        index = PrefixIndex(values)
+        assert index.nodeids == sorted(values)
+
+    @pytest.mark.parametrize(
+        ("prefix", "total"),
+        [
+            ("", -73),
+            ("tests", 17),
+            ("tests/core.py", 15),
+            ("tests/core.py::test_a", -5),
+            ("tests/other/", 2),
+            ("test/", -90),
+            ("missing", 0),
+            ("z", 0),
+        ],
+    )
+    def test_sum(self, values, prefix, total):
+        assert PrefixIndex(values).sum(prefix) == total
+
+    @pytest.mark.parametrize(
+        ("prefix", "minimum"),
+        [
+            ("", -90),
+            ("tests", -5),
+            ("tests/core.py", -5),
+            ("tests/core.py::test_b", 0),
+            ("tests/other/", -1),
+            ("test/", -90),
+            ("missing", 0),
+        ],
+    )
+    def test_min(self, values, prefix, minimum):
+        assert PrefixIndex(values).min(prefix) == minimum
+
+    def test_min_default(self, values):
+        index = PrefixIndex(values)
+        assert index.min("tests/core.py::test_b", default=100) == 20
+        assert index.min("missing", default=None) is None
+
+    def test_empty(self):
+        index = PrefixIndex({})
+        assert index.sum("") == 0
+        assert index.min("") == 0
+
+    def test_matches_scan(self):
+        values = {f"test_{i % 7}/mod_{i % 13}.py::test_{i}": (i * 37) % 101 - 50 for i in range(500)}
+        index = PrefixIndex(values)
+        for prefix in ["", "test_1", "test_3/mod_4.py", "test_6/mod_12.py::test_", "test_2/mod_5.py::test_1"]:
+            matched = [value for nodeid, value in values.items() if nodeid.startswith(prefix)]
+            assert index.sum(prefix) == sum(matched)
+            assert index.min(prefix) == min([*matched, 0])
@@ -0,0 +1,120 @@
+import importlib
+import json
+import tracemalloc
+from unittest import mock
+
+import pytest
+
+from pytest_sort import profiling
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    importlib.reload(profiling)
+    yield
+    importlib.reload(profiling)
+
+
+def test_defaults():
+    assert profiling.enabled is False
+    assert profiling.json_file is None
+    assert profiling.phases == {}
+
+
+def test_start():
+    was_tracing = tracemalloc.is_tracing()
+    try:
+        profiling.start()
+        assert tracemalloc.is_tracing()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+
+@mock.patch("pytest_sort.profiling.tracemalloc.start")
+@mock.patch("pytest_sort.profiling.tracemalloc.is_tracing", return_value=True)
+def test_start_already_tracing(is_tracing, start):
+    profiling.start()
+    is_tracing.assert_called_once_with()
+    start.assert_not_called()
+
+
+def test_phase_disabled():
+    with profiling.phase("sort"):
+        pass
+
+    assert profiling.phases == {}
+
+
+@mock.patch("pytest_sort.profiling.tracemalloc")
+@mock.patch("pytest_sort.profiling.time.perf_counter_ns", side_effect=[100, 350, 1_000, 1_500])
+def test_phase(perf_counter_ns, tracemalloc):
+    profiling.enabled = True
+    tracemalloc.is_tracing.return_value = True
+    tracemalloc.get_traced_memory.side_effect = [(1_000, 0), (1_200, 5_000), (1_200, 0), (1_100, 1_400)]
+
+    with profiling.phase("sort"):
+        pass
+    with profiling.phase("sort"):
+        pass
+
+    assert profiling.phases == {"sort": {"calls": 2, "ns": 750, "memory": 100, "peak": 4_000}}
+    assert perf_counter_ns.call_count == 4
+    assert tracemalloc.reset_peak.call_count == 2
+
+
+@mock.patch("pytest_sort.profiling.tracemalloc")
+@mock.patch("pytest_sort.profiling.time.perf_counter_ns", side_effect=[100, 350])
+def test_phase_not_tracing(perf_counter_ns, tracemalloc):
+    profiling.enabled = True
+    tracemalloc.is_tracing.return_value = False
+
+    with profiling.phase("sort"):
+        pass
+
+    assert profiling.phases == {"sort": {"calls": 1, "ns": 250, "memory": 0, "peak": 0}}
+    assert perf_counter_ns.call_count == 2
+    tracemalloc.get_traced_memory.assert_not_called()
+
+
+def test_phase_exception():
+    profiling.enabled = True
+
+    with pytest.raises(ValueError, match="failed"), profiling.phase("sort"):
+        raise ValueError("failed")
+
+    assert profiling.phases["sort"]["calls"] == 1
+
+
+def test_merge():
+    profiling.phases = {"sort": {"calls": 1, "ns": 10, "memory": 100, "peak": 500}}
+
+    profiling.merge({"sort": {"calls": 2, "ns": 20, "memory": 200, "peak": 300}})
+    profiling.merge({"recording": {"calls": 3, "ns": 30, "memory": 0, "peak": 64}})
+
+    assert profiling.phases == {
+        "sort": {"calls": 3, "ns": 30, "memory": 300, "peak": 500},
+        "recording": {"calls": 3, "ns": 30, "memory": 0, "peak": 64},
+    }
+
+
+def test_format_report():
+    profiling.phases = {
+        "marker resolution": {"calls": 1, "ns": 1_500_000, "memory": 2**20, "peak": 2**21},
+        "recording": {"calls": 30, "ns": 250_000, "memory": 0, "peak": 2**19},
+    }
+
+    assert profiling.format_report() == [
+        "phase                   calls      time ms   memory MiB     peak MiB",
+        "marker resolution           1        1.500        1.000        2.000",
+        "recording                  30        0.250        0.000        0.500",
+    ]
+
+
+def test_write_json(tmp_path):
+    profiling.phases = {"sort": {"calls": 1, "ns": 10, "memory": 100, "peak": 500}}
+    json_file = tmp_path / "profile.json"
+
+    profiling.write_json(json_file)
+
+    assert json.loads(json_file.read_text()) == {"phases": {"sort": {"calls": 1, "ns": 10, "memory": 100, "peak": 500}}}
@@ -0,0 +1,100 @@
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("xdist")
+
+from pytest_sort import scheduler
+from pytest_sort.config import SortConfig
+
+
+@pytest.mark.parametrize(
+    ("bucket", "expected"),
+    [
+        ("session", "test/sub/test_mod.py::TestClass::test_case[a::b]"),
+        ("function", "test/sub/test_mod.py::TestClass::test_case[a::b]"),
+        ("package", "test/sub"),
+        ("module", "test/sub/test_mod.py"),
+        ("class", "test/sub/test_mod.py::TestClass"),
+        ("parent", "test/sub/test_mod.py::TestClass"),
+        ("grandparent", "test/sub/test_mod.py"),
+    ],
+)
+def test_create_bucket_id_from_nodeid_class(bucket, expected):
+    nodeid = "test/sub/test_mod.py::TestClass::test_case[a::b]"
+    assert scheduler.create_bucket_id_from_nodeid(nodeid, bucket) == expected
+
+
+@pytest.mark.parametrize(
+    ("bucket", "expected"),
+    [
+        ("package", "test/sub"),
+        ("module", "test/sub/test_mod.py"),
+        ("class", "test/sub/test_mod.py"),
+        ("parent", "test/sub/test_mod.py"),
+        ("grandparent", "test/sub"),
+    ],
+)
+def test_create_bucket_id_from_nodeid_function(bucket, expected):
+    nodeid = "test/sub/test_mod.py::test_case"
+    assert scheduler.create_bucket_id_from_nodeid(nodeid, bucket) == expected
+
+
+class TestSortScheduling:
+    @pytest.fixture()
+    def config(self):
+        config = mock.MagicMock()
+        config.getvalue.return_value = ["2*popen"]
+        config.option.loadscopereorder = False
+        return config
+
+    @pytest.fixture(autouse=True)
+    def get_all_totals(self):
+        totals = {
+            "test_a.py::test_1": 1,
+            "test_b.py::test_1": 50,
+            "test_b.py::test_2": 50,
+            "test_c.py::TestClass::test_1": 30,
+            "test_c.py::test_2": 5,
+        }
+        with mock.patch("pytest_sort.scheduler.get_all_totals", return_value=totals) as get_all_totals:
+            yield get_all_totals
+
+    def create_node(self):
+        node = mock.MagicMock(shutting_down=False)
+        node.sent = []
+        node.send_runtest_some.side_effect = node.sent.extend
+        return node
+
+    def test_schedule(self, config, monkeypatch):
+        monkeypatch.setattr(SortConfig, "bucket", "module")
+        sched = scheduler.SortScheduling(config)
+        collection = [
+            "test_a.py::test_1",
+            "test_b.py::test_1",
+            "test_b.py::test_2",
+            "test_c.py::TestClass::test_1",
+            "test_c.py::test_2",
+        ]
+        nodes = [self.create_node(), self.create_node()]
+        for node in nodes:
+            sched.add_node(node)
+            sched.add_node_collection(node, collection)
+
+        sched.schedule()
+
+        assert sched.scope_totals == {"test_a.py": 1, "test_b.py": 100, "test_c.py": 35}
+        # Heaviest modules go out first, one per node, then the rest as nodes need more work.
+        assert nodes[0].sent[:2] == [1, 2]
+        assert nodes[1].sent[:2] == [3, 4]
+        assert sorted(nodes[0].sent + nodes[1].sent) == [0, 1, 2, 3, 4]
+
+    def test_remove_node(self, config, monkeypatch):
+        monkeypatch.setattr(SortConfig, "bucket", "parent")
+        sched = scheduler.SortScheduling(config)
+        sched.workqueue_sorted = True
+        node = self.create_node()
+        sched.add_node(node)
+
+        assert sched.remove_node(node) is None
+        assert not sched.workqueue_sorted